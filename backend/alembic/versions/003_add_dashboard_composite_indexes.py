@@ -0,0 +1,57 @@
+"""Add composite indexes for dashboard and support queries
+
+Revision ID: 003_dashboard_indexes
+Revises: 002_add_user
+Create Date: 2024-01-15 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003_dashboard_indexes'
+down_revision = '002_add_user'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns)
+INDEXES = [
+    ('idx_invoices_user_created', 'invoices', ['user_id', 'created_at']),
+    ('idx_support_messages_ticket_internal_created', 'support_messages', ['ticket_id', 'is_internal', 'created_at']),
+    ('idx_feedback_email_created', 'feedback', ['user_email', 'created_at']),
+    ('idx_bookings_email_created', 'bookings', ['user_email', 'created_at']),
+    ('idx_payments_status_booking', 'payments', ['status', 'booking_id']),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing_tables = set(sa.inspect(bind).get_table_names())
+    
+    if bind.dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                if table in existing_tables:
+                    op.execute(
+                        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+                    )
+    else:
+        for name, table, columns in INDEXES:
+            if table in existing_tables:
+                op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    
+    if bind.dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, _, _ in INDEXES:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    else:
+        existing_tables = set(sa.inspect(bind).get_table_names())
+        for name, table, _ in INDEXES:
+            if table in existing_tables:
+                op.drop_index(name, table_name=table)
@@ -0,0 +1,122 @@
+"""Add user_analytics_mv materialized view for the usage analytics dashboard
+
+Revision ID: 004_user_analytics_mv
+Revises: 003_dashboard_indexes
+Create Date: 2024-01-20 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_user_analytics_mv'
+down_revision = '003_dashboard_indexes'
+branch_labels = None
+depends_on = None
+
+
+# One pre-aggregated row per booking email; refreshed hourly by the scheduler service
+USER_ANALYTICS_MV = """
+CREATE MATERIALIZED VIEW IF NOT EXISTS user_analytics_mv AS
+WITH totals AS (
+    SELECT b.user_email,
+           COUNT(DISTINCT b.id) AS total_bookings,
+           COALESCE(SUM(p.amount) FILTER (WHERE p.status = 'completed'), 0) AS total_spent
+    FROM bookings b
+    LEFT JOIN payments p ON p.booking_id = b.id
+    WHERE b.user_email IS NOT NULL
+    GROUP BY b.user_email
+),
+destinations AS (
+    SELECT user_email,
+           jsonb_agg(jsonb_build_object('location', location, 'count', cnt) ORDER BY cnt DESC, location) AS favorite_destinations
+    FROM (
+        SELECT b.user_email, t.location, COUNT(*) AS cnt,
+               ROW_NUMBER() OVER (PARTITION BY b.user_email ORDER BY COUNT(*) DESC, t.location) AS rn
+        FROM bookings b
+        JOIN tours t ON t.id = b.tour_id
+        WHERE b.user_email IS NOT NULL AND t.location IS NOT NULL
+        GROUP BY b.user_email, t.location
+    ) ranked
+    WHERE rn <= 5
+    GROUP BY user_email
+),
+trends AS (
+    SELECT user_email, jsonb_object_agg(month, cnt) AS booking_trends
+    FROM (
+        SELECT user_email, to_char(created_at, 'YYYY-MM') AS month, COUNT(*) AS cnt
+        FROM bookings
+        WHERE user_email IS NOT NULL AND created_at >= now() - interval '180 days'
+        GROUP BY user_email, to_char(created_at, 'YYYY-MM')
+    ) monthly
+    GROUP BY user_email
+),
+methods AS (
+    SELECT user_email, jsonb_object_agg(payment_method, cnt) AS payment_methods_used
+    FROM (
+        SELECT b.user_email, p.payment_method::text AS payment_method, COUNT(*) AS cnt
+        FROM payments p
+        JOIN bookings b ON b.id = p.booking_id
+        WHERE b.user_email IS NOT NULL AND p.status = 'completed'
+        GROUP BY b.user_email, p.payment_method
+    ) used
+    GROUP BY user_email
+),
+recent AS (
+    SELECT user_email,
+           jsonb_agg(jsonb_build_object(
+               'type', 'booking',
+               'description', COALESCE('Booked ' || tour_name, 'Made a booking'),
+               'date', to_char(created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US')
+           ) ORDER BY created_at DESC NULLS LAST) AS recent_activity
+    FROM (
+        SELECT b.user_email, b.created_at, t.name AS tour_name,
+               ROW_NUMBER() OVER (PARTITION BY b.user_email ORDER BY b.created_at DESC NULLS LAST) AS rn
+        FROM bookings b
+        LEFT JOIN tours t ON t.id = b.tour_id
+        WHERE b.user_email IS NOT NULL
+    ) latest
+    WHERE rn <= 10
+    GROUP BY user_email
+)
+SELECT totals.user_email,
+       totals.total_bookings,
+       totals.total_spent,
+       COALESCE(destinations.favorite_destinations, '[]'::jsonb) AS favorite_destinations,
+       COALESCE(trends.booking_trends, '{}'::jsonb) AS booking_trends,
+       COALESCE(methods.payment_methods_used, '{}'::jsonb) AS payment_methods_used,
+       COALESCE(recent.recent_activity, '[]'::jsonb) AS recent_activity,
+       now() AS refreshed_at
+FROM totals
+LEFT JOIN destinations USING (user_email)
+LEFT JOIN trends USING (user_email)
+LEFT JOIN methods USING (user_email)
+LEFT JOIN recent USING (user_email)
+"""
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Materialized views are Postgres-only; SQLite keeps computing analytics live
+    if bind.dialect.name != 'postgresql':
+        return
+
+    existing_tables = set(sa.inspect(bind).get_table_names())
+    if not {'bookings', 'payments', 'tours'} <= existing_tables:
+        return
+
+    op.execute(USER_ANALYTICS_MV)
+    # REFRESH ... CONCURRENTLY requires a unique index on the view
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_user_analytics_mv_user_email ON user_analytics_mv (user_email)"
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS user_analytics_mv")
@@ -0,0 +1,58 @@
+"""Add indexes for admin analytics, billing and audit log filters
+
+Revision ID: 005_admin_indexes
+Revises: 004_user_analytics_mv
+Create Date: 2024-01-22 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005_admin_indexes'
+down_revision = '004_user_analytics_mv'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns, partial index predicate)
+INDEXES = [
+    ('idx_payments_status_created', 'payments', ['status', 'created_at'], None),
+    ('idx_payments_completed_created', 'payments', ['created_at'], "status = 'completed'"),
+    ('idx_bookings_user_status', 'bookings', ['user_id', 'status'], None),
+    ('idx_audit_created_user_resource', 'audit_logs', ['created_at', 'user_id', 'resource_type'], None),
+    ('idx_users_last_login', 'users', ['last_login'], None),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing_tables = set(sa.inspect(bind).get_table_names())
+    
+    if bind.dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        with op.get_context().autocommit_block():
+            for name, table, columns, where in INDEXES:
+                if table in existing_tables:
+                    predicate = f" WHERE {where}" if where else ""
+                    op.execute(
+                        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)}){predicate}"
+                    )
+    else:
+        for name, table, columns, _ in INDEXES:
+            if table in existing_tables:
+                op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    
+    if bind.dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, _, _, _ in INDEXES:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    else:
+        existing_tables = set(sa.inspect(bind).get_table_names())
+        for name, table, _, _ in INDEXES:
+            if table in existing_tables:
+                op.drop_index(name, table_name=table)
@@ -0,0 +1,54 @@
+"""Add pg_trgm GIN indexes for admin user search
+
+Revision ID: 006_user_search_trgm
+Revises: 005_admin_indexes
+Create Date: 2024-01-24 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006_user_search_trgm'
+down_revision = '005_admin_indexes'
+branch_labels = None
+depends_on = None
+
+
+# (index name, column) - backs the leading-wildcard ILIKE in GET /admin/users?search=
+INDEXES = [
+    ('idx_users_email_trgm', 'email'),
+    ('idx_users_username_trgm', 'username'),
+    ('idx_users_full_name_trgm', 'full_name'),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Trigram indexes are Postgres-only; SQLite keeps scanning for ILIKE searches
+    if bind.dialect.name != 'postgresql':
+        return
+
+    if 'users' not in set(sa.inspect(bind).get_table_names()):
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, column in INDEXES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON users USING gin ({column} gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+
+    if bind.dialect.name != 'postgresql':
+        return
+
+    # The pg_trgm extension is left installed; other objects may depend on it
+    with op.get_context().autocommit_block():
+        for name, _ in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
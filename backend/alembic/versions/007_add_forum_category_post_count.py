@@ -0,0 +1,48 @@
+"""Add denormalized post_count to forum_categories
+
+Revision ID: 007_forum_post_count
+Revises: 006_user_search_trgm
+Create Date: 2024-01-26 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007_forum_post_count'
+down_revision = '006_user_search_trgm'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing_tables = set(sa.inspect(bind).get_table_names())
+
+    if 'forum_categories' not in existing_tables:
+        return
+
+    op.add_column(
+        'forum_categories',
+        sa.Column('post_count', sa.Integer(), nullable=False, server_default='0')
+    )
+
+    # Back-fill from existing posts; create_forum_post keeps it current afterwards
+    if 'forum_posts' in existing_tables:
+        op.execute(
+            """
+            UPDATE forum_categories
+            SET post_count = (
+                SELECT COUNT(*) FROM forum_posts WHERE forum_posts.category_id = forum_categories.id
+            )
+            """
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+
+    if 'forum_categories' in set(sa.inspect(bind).get_table_names()):
+        # batch mode so the column can also be dropped on SQLite
+        with op.batch_alter_table('forum_categories') as batch_op:
+            batch_op.drop_column('post_count')
@@ -0,0 +1,50 @@
+"""Replace the forum post category index with one that matches the listing sort
+
+Revision ID: 008_forum_listing_index
+Revises: 007_forum_post_count
+Create Date: 2024-01-28 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008_forum_listing_index'
+down_revision = '007_forum_post_count'
+branch_labels = None
+depends_on = None
+
+
+NEW_INDEX = ('idx_forum_post_category_pinned_created', ['category_id', 'is_pinned', 'created_at'])
+OLD_INDEX = ('idx_forum_post_category_created', ['category_id', 'created_at'])
+
+
+def _swap(bind, create, drop) -> None:
+    create_name, create_columns = create
+    drop_name, _ = drop
+
+    if bind.dialect.name == 'postgresql':
+        # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block
+        with op.get_context().autocommit_block():
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {create_name} ON forum_posts ({', '.join(create_columns)})"
+            )
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {drop_name}")
+    else:
+        existing_indexes = {index['name'] for index in sa.inspect(bind).get_indexes('forum_posts')}
+        if create_name not in existing_indexes:
+            op.create_index(create_name, 'forum_posts', create_columns)
+        if drop_name in existing_indexes:
+            op.drop_index(drop_name, table_name='forum_posts')
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if 'forum_posts' in set(sa.inspect(bind).get_table_names()):
+        _swap(bind, NEW_INDEX, OLD_INDEX)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if 'forum_posts' in set(sa.inspect(bind).get_table_names()):
+        _swap(bind, OLD_INDEX, NEW_INDEX)
@@ -0,0 +1,41 @@
+"""Back-fill forum_posts.reply_count and last_reply_at from forum_replies
+
+Revision ID: 009_forum_reply_counts
+Revises: 008_forum_listing_index
+Create Date: 2024-01-30 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009_forum_reply_counts'
+down_revision = '008_forum_listing_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing_tables = set(sa.inspect(bind).get_table_names())
+
+    if not {'forum_posts', 'forum_replies'} <= existing_tables:
+        return
+
+    # create_forum_reply maintains both columns incrementally from here on
+    op.execute(
+        """
+        UPDATE forum_posts
+        SET reply_count = (
+                SELECT COUNT(*) FROM forum_replies WHERE forum_replies.post_id = forum_posts.id
+            ),
+            last_reply_at = (
+                SELECT MAX(created_at) FROM forum_replies WHERE forum_replies.post_id = forum_posts.id
+            )
+        """
+    )
+
+
+def downgrade() -> None:
+    # Data-only migration; the back-filled values remain correct
+    pass
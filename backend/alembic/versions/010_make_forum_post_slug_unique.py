@@ -0,0 +1,60 @@
+"""Make forum_posts.slug unique
+
+Revision ID: 010_forum_post_slug_unique
+Revises: 009_forum_reply_counts
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010_forum_post_slug_unique'
+down_revision = '009_forum_reply_counts'
+branch_labels = None
+depends_on = None
+
+
+# Same name SQLAlchemy gives the column's index=True index, so models.py and the migration agree
+INDEX_NAME = 'ix_forum_posts_slug'
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    if 'forum_posts' not in set(sa.inspect(bind).get_table_names()):
+        return
+
+    # Keep the oldest post's slug and suffix later duplicates with their id
+    op.execute(
+        """
+        UPDATE forum_posts
+        SET slug = slug || '-' || CAST(id AS VARCHAR)
+        WHERE slug IS NOT NULL
+          AND id NOT IN (SELECT MIN(id) FROM forum_posts WHERE slug IS NOT NULL GROUP BY slug)
+        """
+    )
+
+    if bind.dialect.name == 'postgresql':
+        # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block
+        with op.get_context().autocommit_block():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+            op.execute(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} ON forum_posts (slug)")
+    else:
+        op.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+        op.create_index(INDEX_NAME, 'forum_posts', ['slug'], unique=True)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+
+    if 'forum_posts' not in set(sa.inspect(bind).get_table_names()):
+        return
+
+    if bind.dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} ON forum_posts (slug)")
+    else:
+        op.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+        op.create_index(INDEX_NAME, 'forum_posts', ['slug'])
@@ -0,0 +1,55 @@
+"""Add a lower(email) index for case-insensitive login and a latest-payment index
+
+Revision ID: 011_hot_path_indexes
+Revises: 010_forum_post_slug_unique
+Create Date: 2024-02-02 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '011_hot_path_indexes'
+down_revision = '010_forum_post_slug_unique'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, expressions)
+INDEXES = [
+    # Login looks users up by lower(email)
+    ('idx_users_email_lower', 'users', ['lower(email)']),
+    # GET /bookings ranks payments per booking by id DESC to pick the latest one
+    ('idx_payments_booking_id_desc', 'payments', ['booking_id', 'id DESC']),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing_tables = set(sa.inspect(bind).get_table_names())
+    indexes = [index for index in INDEXES if index[1] in existing_tables]
+
+    if bind.dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        with op.get_context().autocommit_block():
+            for name, table, expressions in indexes:
+                op.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(expressions)})"
+                )
+    else:
+        for name, table, expressions in indexes:
+            existing_indexes = {index['name'] for index in sa.inspect(bind).get_indexes(table)}
+            if name not in existing_indexes:
+                op.create_index(name, table, [sa.text(expression) for expression in expressions])
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+
+    if bind.dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, _, _ in INDEXES:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    else:
+        for name, _, _ in INDEXES:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
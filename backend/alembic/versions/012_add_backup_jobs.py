@@ -0,0 +1,33 @@
+"""Add backup_jobs table so backup status is visible from every worker
+
+Revision ID: 012_backup_jobs
+Revises: 011_hot_path_indexes
+Create Date: 2024-02-03 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '012_backup_jobs'
+down_revision = '011_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'backup_jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False, server_default='running'),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_backup_jobs_started_at', 'backup_jobs', ['started_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_backup_jobs_started_at', table_name='backup_jobs')
+    op.drop_table('backup_jobs')
@@ -3,15 +3,18 @@ Authentication and Authorization Utilities
 
 Provides JWT token management, password hashing, and authentication dependencies.
 """
+import asyncio
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from database import get_db
+from database import get_async_db, get_db
 from models import User, UserRole
 
 # Password hashing
@@ -19,6 +22,8 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+# Same scheme for endpoints where signing in is optional: no token yields None instead of a 401
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 # JWT Configuration
 import os
@@ -42,9 +47,23 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# bcrypt takes ~100ms of CPU per call; async callers run it in the default thread pool
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash without blocking the event loop"""
+    return await asyncio.to_thread(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await asyncio.to_thread(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
+    # RFC 7519 "sub" is a string; python-jose rejects tokens whose subject is not
+    if "sub" in to_encode:
+        to_encode["sub"] = str(to_encode["sub"])
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
@@ -64,28 +83,82 @@ def decode_access_token(token: str) -> Optional[dict]:
         return None
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get the current authenticated user from JWT token"""
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    """401 raised when a bearer token or its user cannot be validated"""
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+class TokenUser(NamedTuple):
+    """Caller identity for endpoints that only need the user's id and email"""
+    id: int
+    email: Optional[str]
+
+
+async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    """Get the authenticated user's id from the JWT without loading the user"""
     payload = decode_access_token(token)
     if payload is None:
-        raise credentials_exception
+        raise credentials_exception()
     
-    user_id: Optional[int] = payload.get("sub")
-    if user_id is None:
-        raise credentials_exception
+    try:
+        return int(payload["sub"])
+    except (KeyError, TypeError, ValueError):
+        raise credentials_exception()
+
+
+async def get_token_user(
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+) -> TokenUser:
+    """
+    Get the caller's id and email without loading the full user row.
+    Access tokens live for days, so deleted or deactivated accounts are still
+    rejected here and the email comes from the database, not the token.
+    """
+    row = (await db.execute(
+        select(User.email, User.is_active).where(User.id == user_id)
+    )).first()
+    if row is None:
+        raise credentials_exception()
+    if not row.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is inactive"
+        )
+    return TokenUser(id=user_id, email=row.email)
+
+
+async def get_current_user(
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+) -> User:
+    """Get the current authenticated user from JWT token"""
+    # Identity-map lookup: free if the user is already loaded in this request's session
+    user = db.get(User, user_id)
+    if user is None:
+        raise credentials_exception()
+    
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is inactive"
+        )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    return user
+
+
+async def get_current_user_async(
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """get_current_user for AsyncSession endpoints; shares the request's async session"""
+    user = await db.get(User, user_id)
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     
     if not user.is_active:
         raise HTTPException(
@@ -115,8 +188,20 @@ async def get_current_admin_user(
     return current_user
 
 
+async def get_current_admin_user_async(
+    current_user: User = Depends(get_current_user_async)
+) -> User:
+    """get_current_admin_user for AsyncSession endpoints"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return current_user
+
+
 async def get_optional_user(
-    token: Optional[str] = Depends(oauth2_scheme),
+    token: Optional[str] = Depends(optional_oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> Optional[User]:
     """Get current user if token is provided, otherwise return None"""
@@ -128,12 +213,35 @@ async def get_optional_user(
         if payload is None:
             return None
         
-        user_id: Optional[int] = payload.get("sub")
+        user_id = payload.get("sub")
         if user_id is None:
             return None
         
-        user = db.query(User).filter(User.id == user_id).first()
+        user = db.get(User, int(user_id))
         return user if user and user.is_active else None
     except Exception:
         return None
 
+
+
+async def get_optional_user_async(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> Optional[User]:
+    """get_optional_user for AsyncSession endpoints"""
+    if token is None:
+        return None
+    
+    try:
+        payload = decode_access_token(token)
+        if payload is None:
+            return None
+        
+        user_id = payload.get("sub")
+        if user_id is None:
+            return None
+        
+        user = await db.get(User, int(user_id))
+        return user if user and user.is_active else None
+    except Exception:
+        return None
@@ -422,6 +422,35 @@ class DatabaseManager:
                 "message": f"Database optimization failed: {str(e)}"
             }
 
+    def refresh_analytics_views(self) -> Dict[str, any]:
+        """
+        Refresh the user_analytics_mv materialized view (PostgreSQL only).
+
+        Returns:
+            Dictionary with refresh results
+        """
+        if engine.dialect.name != "postgresql":
+            return {
+                "success": False,
+                "message": "Materialized views are only supported for PostgreSQL databases"
+            }
+
+        try:
+            # CONCURRENTLY keeps the view readable during the refresh but cannot run in a transaction
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY user_analytics_mv"))
+
+            return {
+                "success": True,
+                "message": "Analytics views refreshed successfully"
+            }
+        except Exception as e:
+            logger.error(f"Analytics view refresh failed: {e}")
+            return {
+                "success": False,
+                "message": f"Analytics view refresh failed: {str(e)}"
+            }
+
     def get_connection_pool_stats(self) -> Dict[str, any]:
         """
         Get connection pool statistics.
@@ -0,0 +1,46 @@
+"""
+Gunicorn configuration for production deployments.
+
+Runs the ASGI app in several Uvicorn worker processes so request handling
+scales across CPU cores:
+
+    gunicorn main:app -c gunicorn_conf.py
+"""
+import os
+
+from uvicorn.workers import UvicornWorker
+
+
+class UvloopWorker(UvicornWorker):
+    """Uvicorn worker pinned to uvloop + httptools rather than 'auto' detection"""
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
+
+
+cpu_count = os.cpu_count() or 1
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(max(2, 2 * cpu_count + 1))))
+worker_class = "gunicorn_conf.UvloopWorker"
+worker_connections = 1000
+keepalive = 5
+graceful_timeout = 30
+accesslog = "-"
+
+# Every worker opens its own sync and async pools, so split one connection budget
+# across workers instead of letting each claim the full default pool (20 + 40 sync
+# plus the async pool would exceed Postgres' default max_connections of 100 with
+# only a couple of workers). DB_MAX_CONNECTIONS defaults to 80, leaving headroom for
+# migrations and psql; one connection of the budget is reserved for the scheduler's
+# leader lock. Each worker needs at least one sync and one async connection, so the
+# worker count is reduced when the budget cannot cover it. Variables already exported
+# in the environment still win; .env is only loaded later, inside each worker, so it
+# does not override these.
+max_db_connections = int(os.getenv("DB_MAX_CONNECTIONS", "80"))
+pool_budget = max(2, max_db_connections - 1)
+if pool_budget // workers < 2:
+    workers = max(1, pool_budget // 2)
+per_worker = pool_budget // workers
+os.environ.setdefault("DB_POOL_SIZE", str(per_worker // 2))
+os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+os.environ.setdefault("DB_ASYNC_POOL_SIZE", str(per_worker - per_worker // 2))
+os.environ.setdefault("DB_ASYNC_MAX_OVERFLOW", "0")
@@ -1,26 +1,47 @@
-from fastapi import FastAPI, HTTPException, Depends, Request, Header
+from fastapi import FastAPI, HTTPException, Depends, Request, Header, BackgroundTasks, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, RedirectResponse, Response, StreamingResponse
+from starlette.datastructures import MutableHeaders
+from sqlalchemy.orm import Session, selectinload, raiseload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, case, cast, select, update, delete, text, Text
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.exc import OperationalError, ProgrammingError
 from typing import List, Optional
+from datetime import datetime, timedelta
+from collections import defaultdict
 from fastapi import Query
 import os
+import asyncio
 import logging
-import json
+import orjson
+import httpx
+import hashlib
+import time
+import uuid
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from cachetools import TTLCache
 from dotenv import load_dotenv
+from pydantic import TypeAdapter
 
 logger = logging.getLogger(__name__)
 
-from database import SessionLocal, engine, Base
+from database import (
+    SessionLocal, AsyncSessionLocal, engine, Base, get_db, get_async_db,
+    check_database_connection, get_database_info, ping_database,
+    month_key, day_key, request_query_count
+)
+from db_utils import health_check_db, DatabaseManager
 from models import (
-    Tour, Booking, Payment, User, Invoice, Feedback, DataConsent, DataRetentionLog, BackupRecord, AuditLog,
-    ForumPost, ForumReply, SupportTicket, SupportMessage, FAQ, SupportAgent, Tutorial, LocalSupport,
+    Tour, Booking, Payment, User, Invoice, Feedback, DataConsent, DataRetentionLog, BackupRecord, BackupJob, AuditLog,
+    InvitationStatus, ForumPost, ForumReply, SupportTicket, SupportMessage, FAQ, SupportAgent, Tutorial, LocalSupport,
     AISupportConversation, AISupportMessage, ServiceProvider, Review, MarketingCampaign, CustomerBehavior, ProviderAnalytics
 )
 from schemas import (
-    TourSchema, BookingSchema, PaymentSchema, PaymentRequest,
-    PaymentIntentRequest, PaymentIntentResponse, CryptoPaymentRequest,
+    TourSchema, BookingSchema, BookingListItem, PaymentSchema, PaymentRequest,
+    PaymentIntentRequest, PaymentIntentResponse, CryptoPaymentRequest, CryptoStatusQuery,
     PaymentAddressRequest, PaymentAddressResponse, RefundRequest,
     TourCreateSchema, TourUpdateSchema, BookingUpdateSchema, ContactFormSchema,
     UserRegisterSchema, UserLoginSchema, UserSchema, TokenResponse,
@@ -32,8 +53,6 @@ from schemas import (
     MFASetupRequest, MFAVerifyRequest, MFADisableRequest, BackupCodeVerifyRequest,
     RefreshTokenRequest, SessionRevokeRequest,
     InvitationCreateRequest, InvitationAcceptRequest,
-    SAMLInitiateRequest, OIDCInitiateRequest,
-    PermissionGrantRequest, PermissionRevokeRequest, PermissionCreateRequest,
     AdminAnalyticsResponse, UserUpdateRequest, UserListResponse,
     BillingSummaryResponse, UsageReportRequest, SystemHealthResponse,
     AuditLogResponse, AuditLogFilterRequest,
@@ -49,21 +68,25 @@ from schemas import (
     AISupportRequest, AISupportResponse, SupportTicketSearchRequest
 )
 from services.payment_service import PaymentService
-from services.solana_service import SolanaService
+from services.solana_service import SIGNATURE_STATUSES_LIMIT, SolanaService
 from services.crypto_service import CryptoService
 from services.auth_service import AuthService
 from services.compliance_service import ComplianceService
 from services.retention_service import RetentionService, RetentionPolicy
 from services.encryption_service import get_encryption_service
-from services.mfa_service import MFAService
-from services.session_service import SessionService
-from services.invitation_service import InvitationService
-from services.saml_service import SAMLService
-from services.oidc_service import OIDCService
-from services.rbac_service import RBACService
+from services.mfa_service import MFAService, serialize_mfa_device
+from services.session_service import SessionService, serialize_session
+from services.invitation_service import InvitationService, serialize_invitation
 from services.communication_service import CommunicationService
 from services.support_service import SupportService
-from auth import get_current_user, get_current_active_user, get_current_admin_user, get_optional_user
+from services.scheduler_service import get_scheduler_service
+from services.audit_service import get_audit_log_service
+from routers import rbac, sso
+from auth import (
+    TokenUser, credentials_exception, get_current_user, get_current_user_id, get_token_user,
+    get_current_active_user, get_current_admin_user, get_optional_user, create_access_token,
+    get_current_admin_user_async, get_optional_user_async
+)
 from models import User, UserRole
 
 load_dotenv()
@@ -72,7 +95,27 @@ load_dotenv()
 # Run: alembic upgrade head
 # Or use: python db_cli.py init
 
-app = FastAPI(title="Tourist App API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background services on startup and stop them on shutdown"""
+    # One pooled HTTP client for the OAuth/OIDC provider calls, kept alive between requests
+    app.state.http = httpx.AsyncClient(
+        timeout=httpx.Timeout(10.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+    )
+    get_audit_log_service().start()
+    # Blocking initialisation runs in a thread so the loop stays free
+    await asyncio.to_thread(get_scheduler_service().start)
+    logger.info("Application startup: Scheduler service initialized")
+    yield
+    await asyncio.to_thread(get_scheduler_service().stop)
+    logger.info("Application shutdown: Scheduler service stopped")
+    await get_audit_log_service().stop()
+    if get_crypto_service.cache_info().currsize:
+        await get_crypto_service().close()
+    await app.state.http.aclose()
+
+app = FastAPI(title="Tourist App API", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -81,15 +124,94 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Query-Count", "X-Total-Count"],
 )
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Compress list/export payloads for clients that accept gzip; tiny bodies aren't worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+QUERY_COUNT_WARNING_THRESHOLD = int(os.getenv("QUERY_COUNT_WARNING_THRESHOLD", "20"))
+
+class QueryCountMiddleware:
+    """
+    Report the number of SQL statements a request issued, to surface N+1 regressions.
+    Pure ASGI so it adds no per-request task or body buffering; the X-Query-Count header
+    carries the count when headers go out, and the threshold check runs once the response
+    body (including streamed bodies) has been fully sent.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        counter = [0]
+        
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Query-Count"] = str(counter[0])
+            await send(message)
+        
+        token = request_query_count.set(counter)
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            request_query_count.reset(token)
+            if counter[0] > QUERY_COUNT_WARNING_THRESHOLD:
+                logger.warning(f"{scope['method']} {scope['path']} issued {counter[0]} SQL statements")
+
+app.add_middleware(QueryCountMiddleware)
+
+# Shared service instances: they hold only configuration and RPC/HTTP clients, so one per process is safe to reuse
+@lru_cache(maxsize=1)
+def get_auth_service() -> AuthService:
+    return AuthService(http_client=app.state.http)
+
+@lru_cache(maxsize=1)
+def get_mfa_service() -> MFAService:
+    return MFAService()
+
+@lru_cache(maxsize=1)
+def get_session_service() -> SessionService:
+    return SessionService()
+
+@lru_cache(maxsize=1)
+def get_invitation_service() -> InvitationService:
+    return InvitationService()
+
+@lru_cache(maxsize=1)
+def get_payment_service() -> PaymentService:
+    return PaymentService()
+
+@lru_cache(maxsize=1)
+def get_solana_service() -> SolanaService:
+    return SolanaService()
+
+@lru_cache(maxsize=1)
+def get_crypto_service() -> CryptoService:
+    return CryptoService()
+
+@lru_cache(maxsize=1)
+def get_support_service() -> SupportService:
+    return SupportService()
+
+@lru_cache(maxsize=1)
+def get_compliance_service() -> ComplianceService:
+    return ComplianceService()
+
+@lru_cache(maxsize=1)
+def get_retention_service() -> RetentionService:
+    return RetentionService()
+
+@lru_cache(maxsize=1)
+def get_communication_service() -> CommunicationService:
+    return CommunicationService()
+
+# DatabaseManager only holds the backup directory, so one instance serves every request
+_db_manager = DatabaseManager()
 
 @app.get("/")
 async def root():
@@ -103,7 +225,7 @@ async def register(
     db: Session = Depends(get_db)
 ):
     """Register a new user with email/password"""
-    auth_service = AuthService()
+    auth_service = get_auth_service()
     result = await auth_service.register_user(
         email=user_data.email,
         password=user_data.password,
@@ -120,18 +242,18 @@ async def login(
     db: Session = Depends(get_db)
 ):
     """Login with email/password (with session management and MFA support)"""
-    auth_service = AuthService()
+    auth_service = get_auth_service()
     user_result = await auth_service.login_user(
         email=credentials.email,
         password=credentials.password,
         db=db
     )
     
-    # Get user from database
-    user = db.query(User).filter(User.email == credentials.email).first()
+    # Reuse the row already loaded by login_user
+    user = user_result["user_orm"]
     
     # Check if MFA is enabled
-    if user and user.mfa_enabled:
+    if user.mfa_enabled:
         # Return partial success - MFA verification required
         return {
             "success": True,
@@ -141,7 +263,7 @@ async def login(
         }
     
     # Create session
-    session_service = SessionService()
+    session_service = get_session_service()
     device_info = request.headers.get("User-Agent", "Unknown")
     ip_address = request.client.host if request.client else None
     
@@ -165,23 +287,23 @@ async def login(
 @app.post("/auth/login/mfa-verify")
 async def login_mfa_verify(
     request_data: MFAVerifyRequest,
-    user_id: int = Query(...),
     request: Request,
+    user_id: int = Query(...),
     db: Session = Depends(get_db)
 ):
     """Verify MFA code after initial login"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    mfa_service = MFAService()
+    mfa_service = get_mfa_service()
     is_valid = await mfa_service.verify_mfa(user, request_data.code)
     
     if not is_valid:
         raise HTTPException(status_code=401, detail="Invalid MFA code")
     
     # Create session after MFA verification
-    session_service = SessionService()
+    session_service = get_session_service()
     device_info = request.headers.get("User-Agent", "Unknown")
     ip_address = request.client.host if request.client else None
     
@@ -215,7 +337,7 @@ async def oauth_token_verify(
     db: Session = Depends(get_db)
 ):
     """Verify OAuth token from provider (Google, GitHub, etc.)"""
-    auth_service = AuthService()
+    auth_service = get_auth_service()
     
     provider = oauth_request.provider.lower()
     if provider == "google":
@@ -230,11 +352,16 @@ async def oauth_token_verify(
     
     return result
 
+# The URL depends only on the provider and environment config; errors are not cached
+@lru_cache(maxsize=16)
+def build_oauth_url(provider: str) -> dict:
+    return get_auth_service().get_oauth_url(provider)
+
 @app.get("/auth/oauth/{provider}/url")
-async def get_oauth_url(provider: str):
+async def get_oauth_url(provider: str, response: Response):
     """Get OAuth authorization URL for a provider"""
-    auth_service = AuthService()
-    return auth_service.get_oauth_url(provider)
+    response.headers["Cache-Control"] = "public, max-age=3600"
+    return build_oauth_url(provider.lower())
 
 @app.get("/auth/{provider}/callback")
 async def oauth_callback(
@@ -243,9 +370,8 @@ async def oauth_callback(
     db: Session = Depends(get_db)
 ):
     """Handle OAuth callback and redirect to frontend with token"""
-    from fastapi.responses import RedirectResponse
     
-    auth_service = AuthService()
+    auth_service = get_auth_service()
     result = await auth_service.handle_oauth_callback(provider, code, db)
     
     # Redirect to frontend with token
@@ -255,18 +381,30 @@ async def oauth_callback(
 
 @app.get("/auth/me", response_model=UserSchema)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_active_user)
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current authenticated user information"""
+    # Only the returned columns; password hash, MFA secret and backup codes stay in the database
+    row = (await db.execute(
+        select(
+            User.id, User.email, User.username, User.full_name, User.role,
+            User.avatar_url, User.is_verified, User.auth_provider, User.is_active
+        ).where(User.id == user_id)
+    )).first()
+    if row is None:
+        raise credentials_exception()
+    if not row.is_active:
+        raise HTTPException(status_code=403, detail="User account is inactive")
     return {
-        "id": current_user.id,
-        "email": current_user.email,
-        "username": current_user.username,
-        "full_name": current_user.full_name,
-        "role": current_user.role.value,
-        "avatar_url": current_user.avatar_url,
-        "is_verified": current_user.is_verified,
-        "auth_provider": current_user.auth_provider.value
+        "id": row.id,
+        "email": row.email,
+        "username": row.username,
+        "full_name": row.full_name,
+        "role": row.role.value,
+        "avatar_url": row.avatar_url,
+        "is_verified": row.is_verified,
+        "auth_provider": row.auth_provider.value
     }
 
 @app.post("/auth/refresh")
@@ -274,7 +412,6 @@ async def refresh_token(
     current_user: User = Depends(get_current_active_user)
 ):
     """Refresh access token"""
-    from auth import create_access_token
     access_token = create_access_token(data={"sub": current_user.id, "email": current_user.email})
     return {
         "access_token": access_token,
@@ -290,7 +427,7 @@ async def setup_mfa(
     db: Session = Depends(get_db)
 ):
     """Setup MFA (TOTP) for user"""
-    mfa_service = MFAService()
+    mfa_service = get_mfa_service()
     result = await mfa_service.setup_totp(current_user, request.device_name, db)
     return result
 
@@ -301,7 +438,7 @@ async def verify_and_enable_mfa(
     db: Session = Depends(get_db)
 ):
     """Verify TOTP code and enable MFA"""
-    mfa_service = MFAService()
+    mfa_service = get_mfa_service()
     result = await mfa_service.verify_and_enable_totp(current_user, request.code, db)
     return result
 
@@ -312,7 +449,7 @@ async def verify_mfa(
     db: Session = Depends(get_db)
 ):
     """Verify MFA code during login"""
-    mfa_service = MFAService()
+    mfa_service = get_mfa_service()
     is_valid = await mfa_service.verify_mfa(current_user, request.code)
     if not is_valid:
         raise HTTPException(status_code=401, detail="Invalid MFA code")
@@ -325,7 +462,7 @@ async def disable_mfa(
     db: Session = Depends(get_db)
 ):
     """Disable MFA for user"""
-    mfa_service = MFAService()
+    mfa_service = get_mfa_service()
     result = await mfa_service.disable_mfa(current_user, request.password, db)
     return result
 
@@ -335,7 +472,7 @@ async def regenerate_backup_codes(
     db: Session = Depends(get_db)
 ):
     """Regenerate backup codes"""
-    mfa_service = MFAService()
+    mfa_service = get_mfa_service()
     result = await mfa_service.regenerate_backup_codes(current_user, db)
     return result
 
@@ -345,7 +482,7 @@ async def get_mfa_devices(
     db: Session = Depends(get_db)
 ):
     """Get all MFA devices for user"""
-    mfa_service = MFAService()
+    mfa_service = get_mfa_service()
     devices = await mfa_service.get_mfa_devices(current_user, db)
     return {"success": True, "devices": devices}
 
@@ -357,7 +494,7 @@ async def refresh_session_token(
     db: Session = Depends(get_db)
 ):
     """Refresh access token using refresh token"""
-    session_service = SessionService()
+    session_service = get_session_service()
     result = await session_service.refresh_session(request.refresh_token, db)
     return result
 
@@ -367,7 +504,7 @@ async def get_user_sessions(
     db: Session = Depends(get_db)
 ):
     """Get all sessions for current user"""
-    session_service = SessionService()
+    session_service = get_session_service()
     sessions = await session_service.get_user_sessions(current_user, db)
     return {"success": True, "sessions": sessions}
 
@@ -378,7 +515,7 @@ async def revoke_session(
     db: Session = Depends(get_db)
 ):
     """Revoke a session"""
-    session_service = SessionService()
+    session_service = get_session_service()
     result = await session_service.revoke_session(
         session_id=request.session_id,
         session_token=request.session_token,
@@ -393,7 +530,7 @@ async def revoke_all_sessions(
     db: Session = Depends(get_db)
 ):
     """Revoke all sessions for current user"""
-    session_service = SessionService()
+    session_service = get_session_service()
     result = await session_service.revoke_all_sessions(current_user, db)
     return result
 
@@ -406,7 +543,7 @@ async def create_invitation(
     db: Session = Depends(get_db)
 ):
     """Create a new user invitation (Admin only)"""
-    invitation_service = InvitationService()
+    invitation_service = get_invitation_service()
     role = UserRole[request.role.upper()] if request.role else UserRole.USER
     result = await invitation_service.create_invitation(
         email=request.email,
@@ -424,8 +561,7 @@ async def list_invitations(
     db: Session = Depends(get_db)
 ):
     """List invitations"""
-    from models import InvitationStatus
-    invitation_service = InvitationService()
+    invitation_service = get_invitation_service()
     status_filter = InvitationStatus[status.upper()] if status else None
     invitations = await invitation_service.list_invitations(
         user=current_user,
@@ -434,13 +570,42 @@ async def list_invitations(
     )
     return {"success": True, "invitations": invitations}
 
+@app.get("/auth/account/overview")
+async def get_account_overview(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get MFA devices, sessions and sent invitations for current user in one call"""
+    user = db.query(User).options(
+        selectinload(User.mfa_devices),
+        selectinload(User.sessions),
+        selectinload(User.invitations)
+    ).filter(User.id == current_user.id).execution_options(populate_existing=True).first()
+    
+    devices = [serialize_mfa_device(device) for device in user.mfa_devices if device.is_active]
+    sessions = [
+        serialize_session(session)
+        for session in sorted(user.sessions, key=lambda s: s.created_at, reverse=True)
+    ]
+    invitations = [
+        serialize_invitation(inv)
+        for inv in sorted(user.invitations, key=lambda i: i.created_at, reverse=True)
+    ]
+    
+    return {
+        "success": True,
+        "devices": devices,
+        "sessions": sessions,
+        "invitations": invitations
+    }
+
 @app.post("/auth/invitations/accept")
 async def accept_invitation(
     request: InvitationAcceptRequest,
     db: Session = Depends(get_db)
 ):
     """Accept an invitation and create account"""
-    invitation_service = InvitationService()
+    invitation_service = get_invitation_service()
     result = await invitation_service.accept_invitation(
         token=request.token,
         password=request.password,
@@ -457,7 +622,7 @@ async def cancel_invitation(
     db: Session = Depends(get_db)
 ):
     """Cancel an invitation"""
-    invitation_service = InvitationService()
+    invitation_service = get_invitation_service()
     result = await invitation_service.cancel_invitation(invitation_id, current_user, db)
     return result
 
@@ -468,138 +633,34 @@ async def resend_invitation(
     db: Session = Depends(get_db)
 ):
     """Resend an invitation"""
-    invitation_service = InvitationService()
+    invitation_service = get_invitation_service()
     result = await invitation_service.resend_invitation(invitation_id, current_user, db)
     return result
 
-# ========== SAML/OIDC ENDPOINTS ==========
-
-@app.post("/auth/saml/initiate")
-async def initiate_saml_sso(
-    request: SAMLInitiateRequest,
-    db: Session = Depends(get_db)
-):
-    """Initiate SAML SSO"""
-    saml_service = SAMLService()
-    result = await saml_service.initiate_sso(request.provider_id, db)
-    return result
-
-@app.get("/auth/saml/metadata/{provider_id}")
-async def get_saml_metadata(
-    provider_id: int,
-    db: Session = Depends(get_db)
-):
-    """Get SAML metadata"""
-    saml_service = SAMLService()
-    metadata = await saml_service.get_metadata(provider_id, db)
-    return Response(content=metadata, media_type="application/xml")
-
-@app.post("/auth/oidc/initiate")
-async def initiate_oidc_sso(
-    request: OIDCInitiateRequest,
-    db: Session = Depends(get_db)
-):
-    """Initiate OIDC SSO"""
-    oidc_service = OIDCService()
-    result = await oidc_service.get_authorization_url(
-        request.provider_id,
-        db,
-        state=request.state
-    )
-    return result
-
-@app.get("/auth/oidc/{provider_id}/callback")
-async def oidc_callback(
-    provider_id: int,
-    code: str,
-    state: Optional[str] = None,
-    db: Session = Depends(get_db)
-):
-    """Handle OIDC callback"""
-    from fastapi.responses import RedirectResponse
-    
-    oidc_service = OIDCService()
-    result = await oidc_service.handle_callback(provider_id, code, state, db)
-    
-    frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
-    redirect_url = f"{frontend_url}/auth/callback?token={result['access_token']}&success=true"
-    return RedirectResponse(url=redirect_url)
-
-# ========== RBAC ENDPOINTS ==========
-
-@app.get("/auth/permissions")
-async def get_user_permissions(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    """Get all permissions for current user"""
-    rbac_service = RBACService()
-    permissions = await rbac_service.get_user_permissions(current_user, db)
-    return {"success": True, "permissions": permissions}
-
-@app.post("/auth/permissions/grant")
-async def grant_permission(
-    request: PermissionGrantRequest,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
-):
-    """Grant permission to user (Admin only)"""
-    rbac_service = RBACService()
-    user = db.query(User).filter(User.id == request.user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    result = await rbac_service.grant_permission(user, request.permission, db)
-    return result
-
-@app.post("/auth/permissions/revoke")
-async def revoke_permission(
-    request: PermissionRevokeRequest,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
-):
-    """Revoke permission from user (Admin only)"""
-    rbac_service = RBACService()
-    user = db.query(User).filter(User.id == request.user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    result = await rbac_service.revoke_permission(user, request.permission, db)
-    return result
+# ========== SAML/OIDC AND RBAC ENDPOINTS ==========
 
-@app.post("/auth/permissions/create")
-async def create_permission(
-    request: PermissionCreateRequest,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
-):
-    """Create a new permission (Admin only)"""
-    rbac_service = RBACService()
-    result = await rbac_service.create_permission(
-        request.name,
-        request.resource,
-        request.action,
-        request.description,
-        db
-    )
-    return result
+app.include_router(sso.router)
+app.include_router(rbac.router)
 
-@app.post("/auth/permissions/initialize")
-async def initialize_permissions(
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
-):
-    """Initialize default permissions (Admin only)"""
-    rbac_service = RBACService()
-    result = await rbac_service.initialize_default_permissions(db)
-    return result
+# Last successfully served tour list, used as a fallback while the database is unreachable
+_tours_cache: List[dict] = []
 
 @app.get("/tours", response_model=List[TourSchema])
-async def get_tours(db: Session = Depends(get_db)):
-    tours = db.query(Tour).all()
+async def get_tours(db: AsyncSession = Depends(get_async_db)):
+    global _tours_cache
+    try:
+        tours = (await db.execute(select(Tour))).scalars().all()
+    except OperationalError as e:
+        if _tours_cache:
+            logger.warning(f"Database unavailable, serving cached tours: {e}")
+            return _tours_cache
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    _tours_cache = [TourSchema.model_validate(tour).model_dump() for tour in tours]
     return tours
 
 @app.get("/tours/{tour_id}", response_model=TourSchema)
-async def get_tour(tour_id: int, db: Session = Depends(get_db)):
-    tour = db.query(Tour).filter(Tour.id == tour_id).first()
+async def get_tour(tour_id: int, db: AsyncSession = Depends(get_async_db)):
+    tour = await db.get(Tour, tour_id)
     if not tour:
         raise HTTPException(status_code=404, detail="Tour not found")
     return tour
@@ -607,25 +668,25 @@ async def get_tour(tour_id: int, db: Session = Depends(get_db)):
 @app.post("/tours", response_model=TourSchema)
 async def create_tour(
     tour: TourCreateSchema,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_admin_user_async)
 ):
     """Create a new tour (Admin only)"""
     db_tour = Tour(**tour.dict())
     db.add(db_tour)
-    db.commit()
-    db.refresh(db_tour)
+    await db.commit()
+    await db.refresh(db_tour)
     return db_tour
 
 @app.put("/tours/{tour_id}", response_model=TourSchema)
 async def update_tour(
     tour_id: int,
     tour: TourUpdateSchema,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_admin_user_async)
 ):
     """Update a tour (Admin only)"""
-    db_tour = db.query(Tour).filter(Tour.id == tour_id).first()
+    db_tour = await db.get(Tour, tour_id)
     if not db_tour:
         raise HTTPException(status_code=404, detail="Tour not found")
     
@@ -633,62 +694,66 @@ async def update_tour(
     for field, value in update_data.items():
         setattr(db_tour, field, value)
     
-    db.commit()
-    db.refresh(db_tour)
+    await db.commit()
+    await db.refresh(db_tour)
     return db_tour
 
 @app.delete("/tours/{tour_id}")
 async def delete_tour(
     tour_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_admin_user_async)
 ):
     """Delete a tour (Admin only)"""
-    db_tour = db.query(Tour).filter(Tour.id == tour_id).first()
+    db_tour = await db.get(Tour, tour_id)
     if not db_tour:
         raise HTTPException(status_code=404, detail="Tour not found")
     
-    db.delete(db_tour)
-    db.commit()
+    await db.delete(db_tour)
+    await db.commit()
     return {"message": "Tour deleted successfully"}
 
-@app.get("/bookings", response_model=List[BookingSchema])
+# Rows from the joined booking query are validated and encoded in one pass
+_booking_list_adapter = TypeAdapter(List[BookingListItem])
+
+@app.get("/bookings", response_model=List[BookingListItem])
 async def get_bookings(
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[User] = Depends(get_optional_user_async),
     user_only: bool = Query(False, description="Get only current user's bookings")
 ):
     """Get all bookings with tour and payment information"""
+    # Only each booking's most recent payment is needed, so rank payments in SQL
+    latest_payment = select(
+        Payment.booking_id,
+        Payment.payment_method,
+        Payment.amount,
+        func.row_number().over(partition_by=Payment.booking_id, order_by=Payment.id.desc()).label("rn")
+    ).subquery()
+    stmt = select(
+        Booking.id,
+        Booking.tour_id,
+        Booking.user_email,
+        Booking.booking_date,
+        Booking.status,
+        Booking.notes,
+        Tour.name.label("tour_name"),
+        latest_payment.c.payment_method,
+        latest_payment.c.amount
+    ).outerjoin(Tour, Tour.id == Booking.tour_id).outerjoin(
+        latest_payment,
+        and_(latest_payment.c.booking_id == Booking.id, latest_payment.c.rn == 1)
+    )
     if user_only and current_user:
-        bookings = db.query(Booking).filter(Booking.user_id == current_user.id).all()
-    else:
-        bookings = db.query(Booking).all()
-    result = []
-    for booking in bookings:
-        booking_dict = {
-            "id": booking.id,
-            "tour_id": booking.tour_id,
-            "user_email": booking.user_email,
-            "booking_date": booking.booking_date,
-            "status": booking.status.value if hasattr(booking.status, 'value') else str(booking.status),
-            "notes": booking.notes,
-        }
-        # Include tour information
-        if booking.tour:
-            booking_dict["tour_name"] = booking.tour.name
-        # Include payment information
-        if booking.payments:
-            latest_payment = booking.payments[-1]  # Get the most recent payment
-            booking_dict["payment_method"] = latest_payment.payment_method.value if hasattr(latest_payment.payment_method, 'value') else str(latest_payment.payment_method)
-            booking_dict["amount"] = latest_payment.amount
-        result.append(booking_dict)
-    return result
+        stmt = stmt.where(Booking.user_id == current_user.id)
+    
+    return orm_list_response(_booking_list_adapter, (await db.execute(stmt)).all())
 
 @app.post("/bookings", response_model=BookingSchema)
 async def create_booking(
     booking: BookingSchema,
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_optional_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[User] = Depends(get_optional_user_async)
 ):
     """Create a new booking"""
     booking_data = booking.dict()
@@ -700,14 +765,14 @@ async def create_booking(
     
     db_booking = Booking(**booking_data)
     db.add(db_booking)
-    db.commit()
-    db.refresh(db_booking)
+    await db.commit()
+    await db.refresh(db_booking)
     return db_booking
 
 @app.get("/bookings/{booking_id}", response_model=BookingSchema)
-async def get_booking(booking_id: int, db: Session = Depends(get_db)):
+async def get_booking(booking_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific booking"""
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    booking = await db.get(Booking, booking_id)
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     return booking
@@ -716,11 +781,11 @@ async def get_booking(booking_id: int, db: Session = Depends(get_db)):
 async def update_booking(
     booking_id: int,
     booking: BookingUpdateSchema,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_admin_user_async)
 ):
     """Update a booking status (Admin only)"""
-    db_booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    db_booking = await db.get(Booking, booking_id)
     if not db_booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     
@@ -728,20 +793,17 @@ async def update_booking(
     for field, value in update_data.items():
         setattr(db_booking, field, value)
     
-    db.commit()
-    db.refresh(db_booking)
+    await db.commit()
+    await db.refresh(db_booking)
     return db_booking
 
 # ========== DEBIT CARD PAYMENT ENDPOINTS (STRIPE) ==========
 
 @app.post("/payments/stripe/intent", response_model=PaymentIntentResponse)
-async def create_payment_intent(
-    intent_request: PaymentIntentRequest,
-    db: Session = Depends(get_db)
-):
+async def create_payment_intent(intent_request: PaymentIntentRequest):
     """Create a payment intent for debit/credit card payments"""
     try:
-        payment_service = PaymentService()
+        payment_service = get_payment_service()
         result = await payment_service.create_payment_intent(
             amount=intent_request.amount,
             currency=intent_request.currency,
@@ -761,7 +823,7 @@ async def process_stripe_payment(
 ):
     """Process a Stripe payment with debit/credit card"""
     try:
-        payment_service = PaymentService()
+        payment_service = get_payment_service()
         result = await payment_service.process_stripe_payment(
             payment_method_id=payment_request.payment_method_id,
             amount=payment_request.amount,
@@ -786,7 +848,7 @@ async def confirm_stripe_payment(
 ):
     """Confirm a Stripe payment intent"""
     try:
-        payment_service = PaymentService()
+        payment_service = get_payment_service()
         result = await payment_service.confirm_payment_intent(
             payment_intent_id=payment_intent_id,
             tour_id=tour_id,
@@ -809,7 +871,7 @@ async def stripe_webhook(
     """Handle Stripe webhook events"""
     try:
         payload = await request.body()
-        payment_service = PaymentService()
+        payment_service = get_payment_service()
         result = payment_service.handle_webhook(payload, stripe_signature or "")
         return result
     except Exception as e:
@@ -822,7 +884,7 @@ async def refund_stripe_payment(
 ):
     """Refund a Stripe payment"""
     try:
-        payment_service = PaymentService()
+        payment_service = get_payment_service()
         result = await payment_service.refund_payment(
             payment_id=refund_request.payment_id,
             amount=refund_request.amount,
@@ -838,26 +900,62 @@ async def refund_stripe_payment(
 
 # ========== CRYPTO PAYMENT ENDPOINTS ==========
 
+_PAYMENT_CURRENCY_ALIASES = {
+    "solana": "solana", "sol": "solana",
+    "bitcoin": "bitcoin", "btc": "bitcoin",
+    "ethereum": "ethereum", "eth": "ethereum",
+}
+_payment_address_cache: dict = {}
+
+# Short-lived payment status results and in-flight lookups, keyed by (currency, tx hash),
+# so clients polling the same transaction share one upstream RPC call
+_payment_status_cache = TTLCache(maxsize=10_000, ttl=3)
+_payment_status_inflight: dict = {}
+
+def _finish_status_lookup(key, task: asyncio.Task):
+    _payment_status_inflight.pop(key, None)
+    if not task.cancelled() and task.exception() is None:
+        _payment_status_cache[key] = task.result()
+
+async def get_payment_status_coalesced(key, fetch):
+    """Return a cached status, join an in-flight lookup, or start a new one"""
+    cached = _payment_status_cache.get(key)
+    if cached is not None:
+        return cached
+    task = _payment_status_inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch())
+        _payment_status_inflight[key] = task
+        task.add_done_callback(lambda t: _finish_status_lookup(key, t))
+    # Shield so one disconnecting client doesn't cancel the lookup for the others
+    return await asyncio.shield(task)
+
 @app.get("/payments/address/{currency}", response_model=PaymentAddressResponse)
 async def get_payment_address(currency: str):
     """Get payment address for a specific cryptocurrency"""
     try:
-        currency_lower = currency.lower()
+        currency_key = _PAYMENT_CURRENCY_ALIASES.get(currency.lower())
+        if currency_key is None:
+            raise HTTPException(status_code=400, detail=f"Unsupported currency: {currency}")
+        
+        # Receiving wallets come from configuration, so resolve each currency once per process
+        cached = _payment_address_cache.get(currency_key)
+        if cached is not None:
+            return cached
         
-        if currency_lower == "solana" or currency_lower == "sol":
-            solana_service = SolanaService()
+        if currency_key == "solana":
+            solana_service = get_solana_service()
             result = solana_service.get_payment_address()
-        elif currency_lower == "bitcoin" or currency_lower == "btc":
-            crypto_service = CryptoService()
+        elif currency_key == "bitcoin":
+            crypto_service = get_crypto_service()
             result = await crypto_service.get_bitcoin_payment_address()
-        elif currency_lower == "ethereum" or currency_lower == "eth":
-            crypto_service = CryptoService()
-            result = await crypto_service.get_ethereum_payment_address()
         else:
-            raise HTTPException(status_code=400, detail=f"Unsupported currency: {currency}")
+            crypto_service = get_crypto_service()
+            result = await crypto_service.get_ethereum_payment_address()
         
         if not result.get("success"):
             raise HTTPException(status_code=400, detail=result.get("message", "Failed to get payment address"))
+        _payment_address_cache[currency_key] = result
         return result
     except HTTPException:
         raise
@@ -871,7 +969,7 @@ async def process_solana_payment(
 ):
     """Process a Solana payment"""
     try:
-        solana_service = SolanaService()
+        solana_service = get_solana_service()
         result = await solana_service.verify_solana_payment(
             signature=payment_request.transaction_hash,
             amount=payment_request.amount,
@@ -892,8 +990,11 @@ async def process_solana_payment(
 async def check_solana_payment_status(signature: str):
     """Check the status of a Solana payment"""
     try:
-        solana_service = SolanaService()
-        result = await solana_service.check_payment_status(signature)
+        solana_service = get_solana_service()
+        result = await get_payment_status_coalesced(
+            ("solana", signature),
+            lambda: solana_service.check_payment_status(signature)
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -905,7 +1006,7 @@ async def process_bitcoin_payment(
 ):
     """Process a Bitcoin payment"""
     try:
-        crypto_service = CryptoService()
+        crypto_service = get_crypto_service()
         result = await crypto_service.verify_bitcoin_payment(
             tx_hash=payment_request.transaction_hash,
             amount=payment_request.amount,
@@ -928,7 +1029,7 @@ async def process_ethereum_payment(
 ):
     """Process an Ethereum payment"""
     try:
-        crypto_service = CryptoService()
+        crypto_service = get_crypto_service()
         result = await crypto_service.verify_ethereum_payment(
             tx_hash=payment_request.transaction_hash,
             amount=payment_request.amount,
@@ -948,24 +1049,92 @@ async def process_ethereum_payment(
 async def check_crypto_payment_status(currency: str, tx_hash: str):
     """Check the status of a cryptocurrency payment"""
     try:
-        crypto_service = CryptoService()
-        result = await crypto_service.check_crypto_payment_status(tx_hash, currency)
+        crypto_service = get_crypto_service()
+        result = await get_payment_status_coalesced(
+            (currency.lower(), tx_hash),
+            lambda: crypto_service.check_crypto_payment_status(tx_hash, currency)
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/payments/crypto/status/batch")
+async def check_crypto_payment_statuses_batch(
+    queries: List[CryptoStatusQuery] = Body(..., max_length=SIGNATURE_STATUSES_LIMIT)
+):
+    """Check the status of several crypto payments with one upstream request per chain"""
+    results: List[Optional[dict]] = [None] * len(queries)
+    by_currency: dict = {}
+    for index, query in enumerate(queries):
+        currency_key = _PAYMENT_CURRENCY_ALIASES.get(query.currency.lower())
+        if currency_key is None:
+            results[index] = {"success": False, "message": f"Unsupported currency: {query.currency}"}
+        else:
+            by_currency.setdefault(currency_key, []).append(index)
+    
+    for currency_key, indexes in by_currency.items():
+        tx_hashes = [queries[i].tx_hash for i in indexes]
+        if currency_key == "solana":
+            statuses = await get_solana_service().check_statuses_batch(tx_hashes)
+        else:
+            currency = "btc" if currency_key == "bitcoin" else "eth"
+            statuses = await get_crypto_service().check_statuses_batch(tx_hashes, currency)
+        for i, status in zip(indexes, statuses):
+            results[i] = status
+    
+    return [
+        {"currency": query.currency, "tx_hash": query.tx_hash, **result}
+        for query, result in zip(queries, results)
+    ]
+
 # ========== PAYMENT HISTORY ==========
 
 @app.get("/payments", response_model=List[PaymentSchema])
-async def get_payments(db: Session = Depends(get_db)):
-    """Get all payment records"""
-    payments = db.query(Payment).all()
+async def get_payments(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[int] = Query(None, description="Payment id to continue after (from X-Next-Cursor)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get payment records, newest first, using keyset pagination"""
+    stmt = select(Payment)
+    if cursor is not None:
+        stmt = stmt.where(Payment.id < cursor)
+    payments = (await db.execute(stmt.order_by(Payment.id.desc()).limit(limit))).scalars().all()
+    if len(payments) == limit:
+        response.headers["X-Next-Cursor"] = str(payments[-1].id)
     return payments
 
+async def stream_json_array(stmt, schema, chunk_size: int = 500):
+    """Stream ORM rows from a server-side cursor as a JSON array, chunk by chunk"""
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=chunk_size))
+        yield b"["
+        first = True
+        async for rows in result.scalars().partitions():
+            chunk = b",".join(orjson.dumps(schema.model_validate(row).model_dump()) for row in rows)
+            yield chunk if first else b"," + chunk
+            first = False
+        yield b"]"
+
+def stream_with_session(stream, *args):
+    """Drive a sync export generator with its own session, closed once the stream ends"""
+    db = SessionLocal()
+    try:
+        yield from stream(*args, db)
+    finally:
+        db.close()
+
+@app.get("/payments/export")
+async def export_payments(current_user: User = Depends(get_current_admin_user)):
+    """Stream every payment record as a JSON array (Admin only)"""
+    stmt = select(Payment).order_by(Payment.id)
+    return StreamingResponse(stream_json_array(stmt, PaymentSchema), media_type="application/json")
+
 @app.get("/payments/{payment_id}", response_model=PaymentSchema)
-async def get_payment(payment_id: int, db: Session = Depends(get_db)):
+async def get_payment(payment_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific payment record"""
-    payment = db.query(Payment).filter(Payment.id == payment_id).first()
+    payment = await db.get(Payment, payment_id)
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
     return payment
@@ -973,56 +1142,117 @@ async def get_payment(payment_id: int, db: Session = Depends(get_db)):
 @app.get("/health")
 async def health_check():
     """Basic health check endpoint"""
-    from database import check_database_connection
-    db_healthy = check_database_connection()
+    db_healthy = await asyncio.to_thread(check_database_connection)
     return {
         "status": "healthy" if db_healthy else "unhealthy",
         "database": "connected" if db_healthy else "disconnected"
     }
 
+@app.get("/health/db")
+async def database_liveness_check():
+    """Lightweight database liveness probe (SELECT 1 with a short timeout)"""
+    if not await asyncio.to_thread(ping_database):
+        return ORJSONResponse(status_code=503, content={"status": "unhealthy", "database": "disconnected"})
+    return {"status": "healthy", "database": "connected"}
+
 @app.get("/health/database")
 async def database_health_check():
     """Comprehensive database health check"""
-    from db_utils import health_check_db
-    return health_check_db()
+    return await asyncio.to_thread(health_check_db)
+
+@app.get("/health/full")
+async def full_health_check():
+    """Run the connection, info and detailed database checks concurrently"""
+    db_healthy, database_info, details = await asyncio.gather(
+        asyncio.to_thread(check_database_connection),
+        asyncio.to_thread(get_database_info),
+        asyncio.to_thread(health_check_db)
+    )
+    return {
+        "status": "healthy" if db_healthy and details.get("healthy") else "unhealthy",
+        "database": "connected" if db_healthy else "disconnected",
+        "database_info": database_info,
+        "details": details
+    }
 
 @app.get("/database/info")
 async def get_database_info_endpoint():
     """Get database connection information"""
-    from database import get_database_info
-    return get_database_info()
+    return await asyncio.to_thread(get_database_info)
 
 @app.get("/database/stats")
 async def get_database_stats():
     """Get database statistics"""
-    from db_utils import DatabaseManager
-    manager = DatabaseManager()
-    return manager.get_table_stats()
+    return await asyncio.to_thread(_db_manager.get_table_stats)
 
 @app.get("/database/pool-stats")
 async def get_pool_stats():
     """Get connection pool statistics"""
-    from db_utils import DatabaseManager
-    manager = DatabaseManager()
-    return manager.get_connection_pool_stats()
+    return await asyncio.to_thread(_db_manager.get_connection_pool_stats)
+
+# Backup job status lives in the database so any worker can answer a poll; jobs are kept for a day
+BACKUP_JOB_RETENTION = timedelta(days=1)
+# Keep references to running backup tasks so they aren't garbage collected mid-backup
+_backup_tasks: set = set()
 
-@app.post("/database/backup")
+async def _run_backup_job(job_id: str, backup_name: Optional[str], encrypt: bool):
+    """Run a backup in a worker thread and record its result on the job"""
+    try:
+        result = await asyncio.to_thread(_db_manager.backup_database, backup_name=backup_name, encrypt=encrypt)
+        status = "completed" if result.get("success") else "failed"
+    except Exception as e:
+        logger.error(f"Backup job {job_id} failed: {e}")
+        result = {"success": False, "message": str(e)}
+        status = "failed"
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(BackupJob).where(BackupJob.id == job_id).values(
+                status=status,
+                finished_at=datetime.utcnow(),
+                result=orjson.dumps(result, default=str).decode()
+            )
+        )
+        await db.commit()
+
+@app.post("/database/backup", status_code=202)
 async def create_backup(
     backup_name: Optional[str] = None,
     encrypt: bool = True,
-    current_user: User = Depends(get_current_admin_user)
-):
-    """Create a database backup (with encryption) - Admin only"""
-    from db_utils import DatabaseManager
-    manager = DatabaseManager()
-    return manager.backup_database(backup_name=backup_name, encrypt=encrypt)
+    current_user: User = Depends(get_current_admin_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Start a database backup (with encryption) in the background - Admin only"""
+    job_id = uuid.uuid4().hex
+    await db.execute(delete(BackupJob).where(BackupJob.started_at < datetime.utcnow() - BACKUP_JOB_RETENTION))
+    db.add(BackupJob(id=job_id, status="running", started_at=datetime.utcnow()))
+    await db.commit()
+    task = asyncio.create_task(_run_backup_job(job_id, backup_name, encrypt))
+    _backup_tasks.add(task)
+    task.add_done_callback(_backup_tasks.discard)
+    return {"job_id": job_id, "status": "running", "status_url": f"/database/backups/{job_id}"}
 
 @app.get("/database/backups")
 async def list_backups():
     """List all available backups"""
-    from db_utils import DatabaseManager
-    manager = DatabaseManager()
-    return manager.list_backups()
+    return await asyncio.to_thread(_db_manager.list_backups)
+
+@app.get("/database/backups/{job_id}")
+async def get_backup_job(
+    job_id: str,
+    current_user: User = Depends(get_current_admin_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the status of a background backup job - Admin only"""
+    job = await db.get(BackupJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Backup job not found")
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "result": orjson.loads(job.result) if job.result else None
+    }
 
 # ========== CUSTOMER DASHBOARD ENDPOINTS ==========
 
@@ -1054,7 +1284,7 @@ async def get_account_settings(
         "phone_number": user.phone_number,
         "avatar_url": user.avatar_url,
         "is_verified": user.is_verified,
-        "created_at": user.created_at.isoformat() if user.created_at else None
+        "created_at": user.created_at
     }
 
 @app.patch("/dashboard/account")
@@ -1081,105 +1311,126 @@ async def update_account_settings(
 
 @app.get("/dashboard/invoices", response_model=List[InvoiceSchema])
 async def get_user_invoices(
-    user_email: Optional[str] = None,
-    db: Session = Depends(get_db)
-):
-    """Get invoices for a user"""
-    if not user_email:
-        return []
-    
-    user = db.query(User).filter(User.email == user_email).first()
-    if not user:
-        return []
-    
-    invoices = db.query(Invoice).filter(Invoice.user_id == user.id).order_by(Invoice.created_at.desc()).all()
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    current_user: TokenUser = Depends(get_token_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the current user's invoices, newest first, using keyset pagination on (created_at, id)"""
+    stmt = select(Invoice).where(Invoice.user_id == current_user.id)
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = cursor.rsplit("|", 1)
+            cursor_created_at = datetime.fromisoformat(cursor_created_at)
+            cursor_id = int(cursor_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.where(or_(
+            Invoice.created_at < cursor_created_at,
+            and_(Invoice.created_at == cursor_created_at, Invoice.id < cursor_id)
+        ))
+    stmt = stmt.order_by(Invoice.created_at.desc(), Invoice.id.desc()).limit(limit)
+    invoices = (await db.execute(stmt)).scalars().all()
+    if len(invoices) == limit:
+        last = invoices[-1]
+        response.headers["X-Next-Cursor"] = f"{last.created_at.isoformat()}|{last.id}"
     return invoices
 
+@app.get("/dashboard/invoices/export")
+async def export_user_invoices(current_user: TokenUser = Depends(get_token_user)):
+    """Stream all of the current user's invoices as a JSON array"""
+    stmt = select(Invoice).where(Invoice.user_id == current_user.id).order_by(Invoice.created_at.desc(), Invoice.id.desc())
+    return StreamingResponse(stream_json_array(stmt, InvoiceSchema), media_type="application/json")
+
 @app.get("/dashboard/invoices/{invoice_id}", response_model=InvoiceSchema)
-async def get_invoice(invoice_id: int, db: Session = Depends(get_db)):
+async def get_invoice(invoice_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific invoice"""
-    invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+    invoice = await db.get(Invoice, invoice_id)
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
     return invoice
 
 @app.get("/dashboard/analytics", response_model=UsageAnalyticsSchema)
 async def get_usage_analytics(
-    user_email: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get usage analytics for a user"""
-    if not user_email:
-        return {
-            "total_bookings": 0,
-            "total_spent": 0.0,
-            "favorite_destinations": [],
-            "booking_trends": {},
-            "payment_methods_used": {},
-            "recent_activity": []
-        }
+    """Get usage analytics for the current user"""
+    user_email = current_user.email
     
-    user = db.query(User).filter(User.email == user_email).first()
-    if not user:
-        return {
-            "total_bookings": 0,
-            "total_spent": 0.0,
-            "favorite_destinations": [],
-            "booking_trends": {},
-            "payment_methods_used": {},
-            "recent_activity": []
-        }
-    
-    # Get bookings
-    bookings = db.query(Booking).filter(Booking.user_email == user_email).all()
-    total_bookings = len(bookings)
-    
-    # Get payments and calculate total spent
-    payments = db.query(Payment).join(Booking).filter(Booking.user_email == user_email).filter(Payment.status == "completed").all()
-    total_spent = sum(p.amount for p in payments)
+    # Pre-aggregated row from user_analytics_mv (refreshed hourly by the scheduler)
+    if engine.dialect.name == "postgresql":
+        try:
+            row = db.execute(
+                text("SELECT * FROM user_analytics_mv WHERE user_email = :e"), {"e": user_email}
+            ).mappings().first()
+        except ProgrammingError:
+            # View not created yet (migration 004 not applied) - fall back to live aggregation
+            db.rollback()
+            row = None
+        if row is not None:
+            return {
+                "total_bookings": row["total_bookings"],
+                "total_spent": float(row["total_spent"]),
+                "favorite_destinations": row["favorite_destinations"],
+                "booking_trends": row["booking_trends"],
+                "payment_methods_used": row["payment_methods_used"],
+                "recent_activity": row["recent_activity"]
+            }
     
-    # Get favorite destinations
-    tour_ids = [b.tour_id for b in bookings]
-    tours = db.query(Tour).filter(Tour.id.in_(tour_ids)).all() if tour_ids else []
-    location_counts = {}
-    for booking in bookings:
-        tour = next((t for t in tours if t.id == booking.tour_id), None)
-        if tour and tour.location:
-            location_counts[tour.location] = location_counts.get(tour.location, 0) + 1
-    favorite_destinations = sorted(location_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+    # Totals (one pass over the user's bookings joined to their payments)
+    total_bookings, total_spent = db.query(
+        func.count(func.distinct(Booking.id)),
+        func.coalesce(func.sum(case((Payment.status == "completed", Payment.amount))), 0.0)
+    ).outerjoin(Payment, Payment.booking_id == Booking.id).filter(
+        Booking.user_email == user_email
+    ).one()
+    
+    # Favorite destinations
+    location_count = func.count(Booking.id)
+    favorite_destinations = db.query(Tour.location, location_count).join(
+        Booking, Booking.tour_id == Tour.id
+    ).filter(
+        Booking.user_email == user_email,
+        Tour.location.isnot(None)
+    ).group_by(Tour.location).order_by(location_count.desc()).limit(5).all()
     
     # Booking trends (last 6 months)
-    from datetime import datetime, timedelta
-    from collections import defaultdict
-    trends = defaultdict(int)
     six_months_ago = datetime.utcnow() - timedelta(days=180)
-    for booking in bookings:
-        if booking.created_at and booking.created_at >= six_months_ago:
-            month_key = booking.created_at.strftime("%Y-%m")
-            trends[month_key] += 1
+    booking_month = month_key(Booking.created_at)
+    trends = db.query(booking_month, func.count(Booking.id)).filter(
+        Booking.user_email == user_email,
+        Booking.created_at >= six_months_ago
+    ).group_by(booking_month).all()
     
     # Payment methods used
-    payment_methods = defaultdict(int)
-    for payment in payments:
-        method = payment.payment_method.value if hasattr(payment.payment_method, 'value') else str(payment.payment_method)
-        payment_methods[method] += 1
+    payment_methods = db.query(Payment.payment_method, func.count(Payment.id)).join(Booking).filter(
+        Booking.user_email == user_email,
+        Payment.status == "completed"
+    ).group_by(Payment.payment_method).all()
     
     # Recent activity
-    recent_activity = []
-    for booking in bookings[:10]:
-        tour = next((t for t in tours if t.id == booking.tour_id), None)
-        recent_activity.append({
+    recent_bookings = db.query(Booking.created_at, Tour.name).outerjoin(
+        Tour, Tour.id == Booking.tour_id
+    ).filter(
+        Booking.user_email == user_email
+    ).order_by(Booking.created_at.desc().nullslast()).limit(10).all()
+    recent_activity = [
+        {
             "type": "booking",
-            "description": f"Booked {tour.name if tour else 'Tour'}" if tour else "Made a booking",
-            "date": booking.created_at.isoformat() if booking.created_at else None
-        })
+            "description": f"Booked {tour_name}" if tour_name else "Made a booking",
+            "date": created_at
+        }
+        for created_at, tour_name in recent_bookings
+    ]
     
     return {
         "total_bookings": total_bookings,
-        "total_spent": total_spent,
+        "total_spent": float(total_spent),
         "favorite_destinations": [{"location": loc, "count": count} for loc, count in favorite_destinations],
-        "booking_trends": dict(trends),
-        "payment_methods_used": dict(payment_methods),
+        "booking_trends": {month: count for month, count in trends},
+        "payment_methods_used": {method.value: count for method, count in payment_methods},
         "recent_activity": recent_activity
     }
 
@@ -1215,15 +1466,15 @@ async def get_documentation_links():
 async def submit_feedback(
     feedback: FeedbackCreateSchema,
     user_email: Optional[str] = None,
+    current_user: Optional[User] = Depends(get_optional_user),
     db: Session = Depends(get_db)
 ):
-    """Submit feedback"""
-    user = None
-    if user_email:
-        user = db.query(User).filter(User.email == user_email).first()
+    """Submit feedback; signed-in users are linked to it, anonymous senders may leave an email"""
+    if current_user:
+        user_email = current_user.email
     
     db_feedback = Feedback(
-        user_id=user.id if user else None,
+        user_id=current_user.id if current_user else None,
         user_email=user_email or "anonymous@example.com",
         feedback_type=feedback.feedback_type,
         subject=feedback.subject,
@@ -1259,7 +1510,7 @@ async def ai_support_chat(
     db: Session = Depends(get_db)
 ):
     """AI support assistant with natural language queries and proactive suggestions"""
-    support_service = SupportService()
+    support_service = get_support_service()
     result = await support_service.process_ai_query(
         message=request.message,
         user_id=current_user.id if current_user else None,
@@ -1305,7 +1556,7 @@ async def get_ai_conversation(
                 "role": msg.role,
                 "content": msg.content,
                 "confidence_score": msg.confidence_score,
-                "suggested_faqs": json.loads(msg.suggested_faqs) if msg.suggested_faqs else [],
+                "suggested_faqs": orjson.loads(msg.suggested_faqs) if msg.suggested_faqs else [],
                 "created_at": msg.created_at
             }
             for msg in messages
@@ -1321,7 +1572,7 @@ async def create_support_ticket(
     db: Session = Depends(get_db)
 ):
     """Create a new support ticket"""
-    support_service = SupportService()
+    support_service = get_support_service()
     user_email = current_user.email if current_user else None
     
     if not user_email:
@@ -1350,7 +1601,7 @@ async def get_support_tickets(
     db: Session = Depends(get_db)
 ):
     """Get support tickets for current user"""
-    support_service = SupportService()
+    support_service = get_support_service()
     user_email = current_user.email if current_user else None
     
     if not user_email:
@@ -1393,7 +1644,11 @@ async def get_ticket_messages(
     db: Session = Depends(get_db)
 ):
     """Get messages for a support ticket"""
-    ticket = db.query(SupportTicket).filter(SupportTicket.id == ticket_id).first()
+    # Load the ticket and its visible messages together (internal notes are not shown to users)
+    ticket = db.query(SupportTicket).options(
+        selectinload(SupportTicket.messages.and_(SupportMessage.is_internal == False)),
+        raiseload("*")
+    ).filter(SupportTicket.id == ticket_id).first()
     
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
@@ -1405,14 +1660,7 @@ async def get_ticket_messages(
     else:
         raise HTTPException(status_code=401, detail="Authentication required")
     
-    messages = db.query(SupportMessage).filter(
-        and_(
-            SupportMessage.ticket_id == ticket_id,
-            SupportMessage.is_internal == False  # Don't show internal notes to users
-        )
-    ).order_by(SupportMessage.created_at.asc()).all()
-    
-    return messages
+    return sorted(ticket.messages, key=lambda message: message.created_at)
 
 @app.post("/support/tickets/{ticket_id}/messages", response_model=SupportMessageSchema)
 async def add_ticket_message(
@@ -1431,7 +1679,7 @@ async def add_ticket_message(
     if ticket.user_id != current_user.id and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    support_service = SupportService()
+    support_service = get_support_service()
     sender_type = "agent" if current_user.role == UserRole.ADMIN else "user"
     
     result = await support_service.add_message_to_ticket(
@@ -1458,7 +1706,7 @@ async def update_support_ticket(
     db: Session = Depends(get_db)
 ):
     """Update a support ticket (Admin only)"""
-    support_service = SupportService()
+    support_service = get_support_service()
     result = await support_service.update_ticket(
         ticket_id=ticket_id,
         status=request.status,
@@ -1475,40 +1723,53 @@ async def update_support_ticket(
 
 # ========== FAQ ==========
 
+# Serialized FAQ/tutorial/local-support listings with their ETags, keyed by endpoint and filters
+_support_content_cache = TTLCache(maxsize=512, ttl=60)
+
+def compute_etag(payload) -> str:
+    """Strong ETag over the JSON form of a response payload"""
+    return compute_body_etag(orjson.dumps(payload, default=str, option=orjson.OPT_SORT_KEYS))
+
+def compute_body_etag(body: bytes) -> str:
+    """Strong ETag over an already-serialized response body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_response(request: Request, response: Response, payload, etag: str):
+    """Return 304 when the client already holds this representation, otherwise tag the payload"""
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return payload
+
+def etag_json_response(request: Request, body: bytes, etag: str) -> Response:
+    """Send a pre-serialized JSON body, or 304 when the client already holds it"""
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
 @app.get("/support/faqs", response_model=List[FAQSchema])
 async def get_faqs(
+    request: Request,
     category: Optional[str] = None,
     language: str = Query("en"),
     search: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Get FAQs with optional filtering"""
-    support_service = SupportService()
-    faqs = await support_service.get_faqs(
-        category=category,
-        language=language,
-        search=search,
-        db=db
-    )
-    
-    result = []
-    for faq in faqs:
-        faq_dict = {
-            "id": faq.id,
-            "category": faq.category,
-            "question": faq.question,
-            "answer": faq.answer,
-            "language": faq.language,
-            "order": faq.order,
-            "view_count": faq.view_count,
-            "helpful_count": faq.helpful_count,
-            "not_helpful_count": faq.not_helpful_count,
-            "tags": json.loads(faq.tags) if faq.tags else None,
-            "created_at": faq.created_at
-        }
-        result.append(faq_dict)
+    cache_key = ("faqs", category, language, search)
+    cached = _support_content_cache.get(cache_key)
+    if cached is None:
+        support_service = get_support_service()
+        body = await support_service.get_faqs_json(
+            category=category,
+            language=language,
+            search=search,
+            db=db
+        )
+        cached = (body, compute_body_etag(body))
+        _support_content_cache[cache_key] = cached
     
-    return result
+    return etag_json_response(request, *cached)
 
 @app.get("/support/faqs/{faq_id}", response_model=FAQSchema)
 async def get_faq(
@@ -1516,7 +1777,7 @@ async def get_faq(
     db: Session = Depends(get_db)
 ):
     """Get a specific FAQ"""
-    support_service = SupportService()
+    support_service = get_support_service()
     faq = await support_service.get_faq(faq_id, db)
     
     if not faq:
@@ -1529,10 +1790,10 @@ async def get_faq(
         "answer": faq.answer,
         "language": faq.language,
         "order": faq.order,
-        "view_count": faq.view_count,
-        "helpful_count": faq.helpful_count,
-        "not_helpful_count": faq.not_helpful_count,
-        "tags": json.loads(faq.tags) if faq.tags else None,
+        "view_count": faq.view_count + support_service.pending_faq_count(faq.id, "view_count"),
+        "helpful_count": faq.helpful_count + support_service.pending_faq_count(faq.id, "helpful_count"),
+        "not_helpful_count": faq.not_helpful_count + support_service.pending_faq_count(faq.id, "not_helpful_count"),
+        "tags": orjson.loads(faq.tags) if faq.tags else None,
         "created_at": faq.created_at
     }
 
@@ -1543,12 +1804,13 @@ async def submit_faq_feedback(
     db: Session = Depends(get_db)
 ):
     """Submit feedback on FAQ helpfulness"""
-    support_service = SupportService()
+    support_service = get_support_service()
     result = await support_service.record_faq_feedback(faq_id, request.helpful, db)
     
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("error"))
     
+    _support_content_cache.clear()
     return result
 
 @app.post("/support/faqs", response_model=FAQSchema)
@@ -1564,13 +1826,14 @@ async def create_faq(
         answer=request.answer,
         language=request.language or "en",
         order=request.order or 0,
-        tags=json.dumps(request.tags) if request.tags else None,
+        tags=orjson.dumps(request.tags).decode() if request.tags else None,
         is_published=True
     )
     
     db.add(faq)
     db.commit()
     db.refresh(faq)
+    _support_content_cache.clear()
     
     return {
         "id": faq.id,
@@ -1582,7 +1845,7 @@ async def create_faq(
         "view_count": faq.view_count,
         "helpful_count": faq.helpful_count,
         "not_helpful_count": faq.not_helpful_count,
-        "tags": json.loads(faq.tags) if faq.tags else None,
+        "tags": orjson.loads(faq.tags) if faq.tags else None,
         "created_at": faq.created_at
     }
 
@@ -1590,37 +1853,25 @@ async def create_faq(
 
 @app.get("/support/tutorials", response_model=List[TutorialSchema])
 async def get_tutorials(
+    request: Request,
     category: Optional[str] = None,
     language: str = Query("en"),
     db: Session = Depends(get_db)
 ):
     """Get tutorials with optional filtering"""
-    support_service = SupportService()
-    tutorials = await support_service.get_tutorials(
-        category=category,
-        language=language,
-        db=db
-    )
-    
-    result = []
-    for tutorial in tutorials:
-        tutorial_dict = {
-            "id": tutorial.id,
-            "title": tutorial.title,
-            "category": tutorial.category,
-            "description": tutorial.description,
-            "video_url": tutorial.video_url,
-            "thumbnail_url": tutorial.thumbnail_url,
-            "duration_seconds": tutorial.duration_seconds,
-            "language": tutorial.language,
-            "order": tutorial.order,
-            "view_count": tutorial.view_count,
-            "tags": json.loads(tutorial.tags) if tutorial.tags else None,
-            "created_at": tutorial.created_at
-        }
-        result.append(tutorial_dict)
+    cache_key = ("tutorials", category, language)
+    cached = _support_content_cache.get(cache_key)
+    if cached is None:
+        support_service = get_support_service()
+        body = await support_service.get_tutorials_json(
+            category=category,
+            language=language,
+            db=db
+        )
+        cached = (body, compute_body_etag(body))
+        _support_content_cache[cache_key] = cached
     
-    return result
+    return etag_json_response(request, *cached)
 
 @app.get("/support/tutorials/{tutorial_id}", response_model=TutorialSchema)
 async def get_tutorial(
@@ -1628,7 +1879,7 @@ async def get_tutorial(
     db: Session = Depends(get_db)
 ):
     """Get a specific tutorial"""
-    support_service = SupportService()
+    support_service = get_support_service()
     tutorial = await support_service.get_tutorial(tutorial_id, db)
     
     if not tutorial:
@@ -1645,7 +1896,7 @@ async def get_tutorial(
         "language": tutorial.language,
         "order": tutorial.order,
         "view_count": tutorial.view_count,
-        "tags": json.loads(tutorial.tags) if tutorial.tags else None,
+        "tags": orjson.loads(tutorial.tags) if tutorial.tags else None,
         "created_at": tutorial.created_at
     }
 
@@ -1653,12 +1904,19 @@ async def get_tutorial(
 
 @app.get("/support/local", response_model=List[LocalSupportSchema])
 async def get_local_support(
+    request: Request,
+    response: Response,
     country: Optional[str] = None,
     city: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Get local support locations"""
-    support_service = SupportService()
+    cache_key = ("local", country, city)
+    cached = _support_content_cache.get(cache_key)
+    if cached is not None:
+        return etag_response(request, response, *cached)
+    
+    support_service = get_support_service()
     locations = await support_service.get_local_support(
         country=country,
         city=city,
@@ -1675,15 +1933,17 @@ async def get_local_support(
             "address": location.address,
             "phone": location.phone,
             "email": location.email,
-            "languages": json.loads(location.languages) if location.languages else [],
-            "services": json.loads(location.services) if location.services else None,
-            "availability_hours": json.loads(location.availability_hours) if location.availability_hours else None,
+            "languages": orjson.loads(location.languages) if location.languages else [],
+            "services": orjson.loads(location.services) if location.services else None,
+            "availability_hours": orjson.loads(location.availability_hours) if location.availability_hours else None,
             "coordinates_lat": location.coordinates_lat,
             "coordinates_lng": location.coordinates_lng
         }
         result.append(location_dict)
     
-    return result
+    etag = compute_etag(result)
+    _support_content_cache[cache_key] = (result, etag)
+    return etag_response(request, response, result, etag)
 
 # ========== SUPPORT AGENTS ==========
 
@@ -1693,7 +1953,7 @@ async def get_available_agents(
     db: Session = Depends(get_db)
 ):
     """Get available support agents"""
-    support_service = SupportService()
+    support_service = get_support_service()
     agents = await support_service.get_available_agents(
         language=language,
         db=db
@@ -1704,8 +1964,8 @@ async def get_available_agents(
         agent_dict = {
             "id": agent.id,
             "user_id": agent.user_id,
-            "languages": json.loads(agent.languages) if agent.languages else [],
-            "specialties": json.loads(agent.specialties) if agent.specialties else None,
+            "languages": orjson.loads(agent.languages) if agent.languages else [],
+            "specialties": orjson.loads(agent.specialties) if agent.specialties else None,
             "availability_status": agent.availability_status,
             "rating": agent.rating,
             "total_resolved": agent.total_resolved,
@@ -1717,10 +1977,24 @@ async def get_available_agents(
 
 # ========== LEGACY CONTACT FORM ==========
 
+async def finalize_contact_ticket(ticket_id: int):
+    """Background task: enrich and assign a ticket created from the contact form"""
+    db = SessionLocal()
+    try:
+        await get_support_service().enrich_ticket(ticket_id, db)
+    except Exception as e:
+        logger.error(f"Failed to finalize ticket {ticket_id}: {e}")
+    finally:
+        db.close()
+
 @app.post("/support/contact")
-async def submit_contact_form(contact: ContactFormSchema, db: Session = Depends(get_db)):
+async def submit_contact_form(
+    contact: ContactFormSchema,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """Submit a contact form (creates a support ticket)"""
-    support_service = SupportService()
+    support_service = get_support_service()
     result = await support_service.create_ticket(
         user_id=None,
         user_email=contact.email,
@@ -1729,12 +2003,16 @@ async def submit_contact_form(contact: ContactFormSchema, db: Session = Depends(
         category="general",
         priority="normal",
         language="en",
-        db=db
+        db=db,
+        enrich=False
     )
     
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("error"))
     
+    # Suggestions and agent assignment run after the response is sent
+    background_tasks.add_task(finalize_contact_ticket, result["ticket"].id)
+    
     return {
         "success": True,
         "message": "Thank you for contacting us! We'll get back to you soon.",
@@ -1755,23 +2033,19 @@ async def export_user_data(
     if current_user.role.value != "admin" and current_user.id != user_id:
         raise HTTPException(status_code=403, detail="You can only export your own data")
     
-    compliance_service = ComplianceService()
-    result = compliance_service.export_user_data(user_id, db)
-    
-    if not result["success"]:
-        raise HTTPException(status_code=400, detail=result.get("error", "Export failed"))
+    if db.query(User.id).filter(User.id == user_id).scalar() is None:
+        raise HTTPException(status_code=400, detail=f"User {user_id} not found")
     
+    compliance_service = get_compliance_service()
     if request.format == "csv":
-        csv_data = compliance_service.export_data_csv(user_id, db)
-        return Response(
-            content=csv_data,
+        return StreamingResponse(
+            stream_with_session(compliance_service.export_data_csv_stream, user_id),
             media_type="text/csv",
             headers={"Content-Disposition": f"attachment; filename=user_data_{user_id}.csv"}
         )
     else:
-        json_data = compliance_service.export_data_json(user_id, db)
-        return Response(
-            content=json_data,
+        return StreamingResponse(
+            stream_with_session(compliance_service.export_data_json_stream, user_id),
             media_type="application/json",
             headers={"Content-Disposition": f"attachment; filename=user_data_{user_id}.json"}
         )
@@ -1783,7 +2057,7 @@ async def delete_user_data(
     current_user: User = Depends(get_current_admin_user)
 ):
     """Delete or anonymize user data (GDPR Right to be Forgotten) - Admin only"""
-    compliance_service = ComplianceService()
+    compliance_service = get_compliance_service()
     result = compliance_service.delete_user_data(
         request.user_id,
         db,
@@ -1805,7 +2079,7 @@ async def get_consent_status(
     if current_user.role.value != "admin" and current_user.id != user_id:
         raise HTTPException(status_code=403, detail="You can only view your own consent status")
     
-    compliance_service = ComplianceService()
+    compliance_service = get_compliance_service()
     return compliance_service.get_consent_status(user_id, db)
 
 @app.post("/security/data/consent/{user_id}")
@@ -1819,7 +2093,7 @@ async def update_consent(
     if current_user.role.value != "admin" and current_user.id != user_id:
         raise HTTPException(status_code=403, detail="You can only update your own consent")
     
-    compliance_service = ComplianceService()
+    compliance_service = get_compliance_service()
     return compliance_service.update_consent(user_id, request.consent_type, request.granted, db)
 
 @app.post("/security/retention/policy")
@@ -1828,7 +2102,7 @@ async def create_retention_policy(
     current_user: User = Depends(get_current_admin_user)
 ):
     """Create or update a retention policy - Admin only"""
-    retention_service = RetentionService()
+    retention_service = get_retention_service()
     policy = RetentionPolicy(
         data_type=request.data_type,
         retention_days=request.retention_days,
@@ -1852,7 +2126,7 @@ async def apply_retention_policy(
     current_user: User = Depends(get_current_admin_user)
 ):
     """Apply retention policies - Admin only"""
-    retention_service = RetentionService()
+    retention_service = get_retention_service()
     
     if request.data_type:
         result = retention_service.apply_retention_policy(
@@ -1873,13 +2147,13 @@ async def list_retention_policies(
     current_user: User = Depends(get_current_admin_user)
 ):
     """List all retention policies - Admin only"""
-    retention_service = RetentionService()
+    retention_service = get_retention_service()
     policies = {}
     for data_type, policy in retention_service.policies.items():
         policies[data_type] = {
             "retention_days": policy.retention_days,
             "action": policy.action,
-            "cutoff_date": policy.get_cutoff_date().isoformat()
+            "cutoff_date": policy.get_cutoff_date()
         }
     return {
         "success": True,
@@ -1892,9 +2166,8 @@ async def create_encrypted_backup(
     current_user: User = Depends(get_current_admin_user)
 ):
     """Create an encrypted database backup - Admin only"""
-    from db_utils import DatabaseManager
-    manager = DatabaseManager()
-    result = manager.backup_database(
+    result = await asyncio.to_thread(
+        _db_manager.backup_database,
         backup_name=request.backup_name,
         encrypt=request.encrypt
     )
@@ -1910,9 +2183,8 @@ async def restore_backup(
     current_user: User = Depends(get_current_admin_user)
 ):
     """Restore database from backup - Admin only"""
-    from db_utils import DatabaseManager
-    manager = DatabaseManager()
-    result = manager.restore_database(
+    result = await asyncio.to_thread(
+        _db_manager.restore_database,
         backup_path=request.backup_path,
         drop_existing=request.drop_existing,
         encrypted=request.encrypted
@@ -1929,15 +2201,19 @@ async def list_backups(
     current_user: User = Depends(get_current_admin_user)
 ):
     """List all backups - Admin only"""
-    from db_utils import DatabaseManager
-    from models import BackupRecord
-    manager = DatabaseManager()
     
     # Get backups from filesystem
-    file_backups = manager.list_backups()
+    file_backups = await asyncio.to_thread(_db_manager.list_backups)
     
     # Get backups from database
-    db_backups = db.query(BackupRecord).order_by(BackupRecord.created_at.desc()).all()
+    db_backups = db.query(
+        BackupRecord.backup_name,
+        BackupRecord.backup_path,
+        BackupRecord.file_size,
+        BackupRecord.encrypted,
+        BackupRecord.status,
+        BackupRecord.created_at
+    ).order_by(BackupRecord.created_at.desc()).all()
     db_backup_list = [
         {
             "name": b.backup_name,
@@ -1946,7 +2222,7 @@ async def list_backups(
             "size_mb": round(b.file_size / (1024 * 1024), 2),
             "encrypted": b.encrypted,
             "status": b.status,
-            "created_at": b.created_at.isoformat() if b.created_at else None
+            "created_at": b.created_at
         }
         for b in db_backups
     ]
@@ -1984,31 +2260,25 @@ def create_audit_log(
     user_agent: Optional[str] = None,
     metadata: Optional[dict] = None
 ):
-    """Helper function to create audit log entries"""
-    import json
-    audit = AuditLog(
-        user_id=user_id,
-        action=action,
-        resource_type=resource_type,
-        resource_id=resource_id,
-        description=description,
-        ip_address=ip_address,
-        user_agent=user_agent,
-        metadata=json.dumps(metadata) if metadata else None
-    )
-    db.add(audit)
-    db.commit()
+    """Helper function to create audit log entries (queued and written in batches)"""
+    get_audit_log_service().record({
+        "user_id": user_id,
+        "action": action,
+        "resource_type": resource_type,
+        "resource_id": resource_id,
+        "description": description,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "metadata": orjson.dumps(metadata, default=str).decode() if metadata else None,
+        "created_at": datetime.utcnow()
+    })
 
-@app.get("/admin/analytics", response_model=AdminAnalyticsResponse)
-async def get_admin_analytics(
-    request: Request,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
-):
-    """Get real-time analytics for admin dashboard"""
-    from datetime import datetime, timedelta
-    from collections import defaultdict
-    from sqlalchemy import func, and_
+# Dashboard aggregates tolerate a minute of staleness; keyed by day so the 30-day windows roll over
+_admin_analytics_cache = TTLCache(maxsize=4, ttl=60)
+_admin_analytics_lock = asyncio.Lock()
+
+def build_admin_analytics(db: Session) -> dict:
+    """Compute the admin dashboard aggregates"""
     
     # Total counts
     total_users = db.query(func.count(User.id)).scalar()
@@ -2016,8 +2286,9 @@ async def get_admin_analytics(
     total_payments = db.query(func.count(Payment.id)).scalar()
     
     # Revenue calculations
-    completed_payments = db.query(Payment).filter(Payment.status == "completed").all()
-    total_revenue = sum(p.amount for p in completed_payments)
+    total_revenue = db.query(func.coalesce(func.sum(Payment.amount), 0.0)).filter(
+        Payment.status == "completed"
+    ).scalar()
     
     # Active users (logged in last 30 days)
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
@@ -2031,76 +2302,110 @@ async def get_admin_analytics(
     ).scalar()
     
     # Revenue by month (last 6 months)
-    revenue_by_month = defaultdict(float)
     six_months_ago = datetime.utcnow() - timedelta(days=180)
-    recent_payments = db.query(Payment).filter(
+    payment_month = month_key(Payment.created_at)
+    revenue_by_month = db.query(payment_month, func.sum(Payment.amount)).filter(
         and_(Payment.status == "completed", Payment.created_at >= six_months_ago)
-    ).all()
-    for payment in recent_payments:
-        month_key = payment.created_at.strftime("%Y-%m")
-        revenue_by_month[month_key] += payment.amount
+    ).group_by(payment_month).all()
     
     # Bookings by status
-    bookings_by_status = defaultdict(int)
-    for booking in db.query(Booking).all():
-        status = booking.status.value if hasattr(booking.status, 'value') else str(booking.status)
-        bookings_by_status[status] += 1
+    bookings_by_status = db.query(Booking.status, func.count(Booking.id)).group_by(Booking.status).all()
     
     # Payments by method
-    payments_by_method = defaultdict(float)
-    for payment in completed_payments:
-        method = payment.payment_method.value if hasattr(payment.payment_method, 'value') else str(payment.payment_method)
-        payments_by_method[method] += payment.amount
+    payments_by_method = db.query(Payment.payment_method, func.sum(Payment.amount)).filter(
+        Payment.status == "completed"
+    ).group_by(Payment.payment_method).all()
     
     # Top tours by bookings
-    tour_bookings = db.query(
-        Booking.tour_id,
-        func.count(Booking.id).label('count')
-    ).group_by(Booking.tour_id).order_by(func.count(Booking.id).desc()).limit(5).all()
-    
-    top_tours = []
-    for tour_id, count in tour_bookings:
-        tour = db.query(Tour).filter(Tour.id == tour_id).first()
-        if tour:
-            top_tours.append({
-                "id": tour.id,
-                "name": tour.name,
-                "bookings_count": count
-            })
+    bookings_count = func.count(Booking.id)
+    tour_bookings = db.query(Tour.id, Tour.name, bookings_count).join(
+        Booking, Booking.tour_id == Tour.id
+    ).group_by(Tour.id, Tour.name).order_by(bookings_count.desc()).limit(5).all()
+    
+    top_tours = [
+        {"id": tour_id, "name": name, "bookings_count": count}
+        for tour_id, name, count in tour_bookings
+    ]
     
     # Recent activity (last 10 bookings)
-    recent_bookings = db.query(Booking).order_by(Booking.created_at.desc()).limit(10).all()
-    recent_activity = []
-    for booking in recent_bookings:
-        tour = db.query(Tour).filter(Tour.id == booking.tour_id).first()
-        recent_activity.append({
+    recent_bookings = db.query(Booking.created_at, Booking.user_email, Tour.name).outerjoin(
+        Tour, Tour.id == Booking.tour_id
+    ).order_by(Booking.created_at.desc()).limit(10).all()
+    recent_activity = [
+        {
             "type": "booking",
-            "description": f"New booking for {tour.name if tour else 'Tour'}" if tour else "New booking",
-            "date": booking.created_at.isoformat() if booking.created_at else None,
-            "user_email": booking.user_email
-        })
-    
-    # Log audit
-    create_audit_log(
-        db, current_user.id, "admin.analytics.view", "analytics",
-        ip_address=request.client.host if request.client else None,
-        user_agent=request.headers.get("User-Agent")
-    )
+            "description": f"New booking for {tour_name}" if tour_name else "New booking",
+            "date": created_at,
+            "user_email": user_email
+        }
+        for created_at, user_email, tour_name in recent_bookings
+    ]
     
     return {
         "total_users": total_users,
         "total_bookings": total_bookings,
-        "total_revenue": total_revenue,
+        "total_revenue": float(total_revenue),
         "total_payments": total_payments,
         "active_users_30d": active_users_30d,
         "new_users_30d": new_users_30d,
-        "revenue_by_month": dict(revenue_by_month),
-        "bookings_by_status": dict(bookings_by_status),
-        "payments_by_method": dict(payments_by_method),
+        "revenue_by_month": {month: float(revenue) for month, revenue in revenue_by_month},
+        "bookings_by_status": {status.value: count for status, count in bookings_by_status},
+        "payments_by_method": {method.value: float(amount) for method, amount in payments_by_method},
         "top_tours": top_tours,
         "recent_activity": recent_activity
     }
 
+@app.get("/admin/analytics", response_model=AdminAnalyticsResponse)
+async def get_admin_analytics(
+    request: Request,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Get analytics for admin dashboard (cached for up to a minute)"""
+    cache_key = datetime.utcnow().date().isoformat()
+    analytics = _admin_analytics_cache.get(cache_key)
+    if analytics is None:
+        # Concurrent misses wait for the first one instead of recomputing
+        async with _admin_analytics_lock:
+            analytics = _admin_analytics_cache.get(cache_key)
+            if analytics is None:
+                analytics = build_admin_analytics(db)
+                _admin_analytics_cache[cache_key] = analytics
+    
+    # Log audit
+    create_audit_log(
+        db, current_user.id, "admin.analytics.view", "analytics",
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("User-Agent")
+    )
+    
+    return analytics
+
+def get_user_stats(user_ids: List[int], db: Session) -> dict:
+    """Booking count and completed spend per user, aggregated in one query"""
+    if not user_ids:
+        return {}
+    # Aggregate bookings and completed payments separately so the payment join can't fan out the counts
+    user_bookings = db.query(
+        Booking.user_id.label("user_id"),
+        func.count(Booking.id).label("bookings_count")
+    ).filter(Booking.user_id.in_(user_ids)).group_by(Booking.user_id).cte("user_bookings")
+    user_spend = db.query(
+        Booking.user_id.label("user_id"),
+        func.sum(Payment.amount).label("total_spent")
+    ).join(Payment, Payment.booking_id == Booking.id).filter(
+        Booking.user_id.in_(user_ids),
+        Payment.status == "completed"
+    ).group_by(Booking.user_id).cte("user_spend")
+    rows = db.query(
+        User.id,
+        func.coalesce(user_bookings.c.bookings_count, 0),
+        func.coalesce(user_spend.c.total_spent, 0)
+    ).outerjoin(user_bookings, user_bookings.c.user_id == User.id).outerjoin(
+        user_spend, user_spend.c.user_id == User.id
+    ).filter(User.id.in_(user_ids)).all()
+    return {user_id: (bookings_count, float(total_spent)) for user_id, bookings_count, total_spent in rows}
+
 @app.get("/admin/users", response_model=List[UserListResponse])
 async def list_users(
     request: Request,
@@ -2111,7 +2416,6 @@ async def list_users(
     search: Optional[str] = None
 ):
     """List all users with statistics"""
-    from sqlalchemy import or_
     
     query = db.query(User)
     
@@ -2125,20 +2429,17 @@ async def list_users(
         )
     
     users = query.offset(skip).limit(limit).all()
+    stats = get_user_stats([user.id for user in users], db)
     
     result = []
     for user in users:
-        # Get user statistics
-        bookings_count = db.query(func.count(Booking.id)).filter(Booking.user_id == user.id).scalar()
-        payments = db.query(Payment).join(Booking).filter(Booking.user_id == user.id).filter(Payment.status == "completed").all()
-        total_spent = sum(p.amount for p in payments)
-        
+        bookings_count, total_spent = stats.get(user.id, (0, 0.0))
         result.append({
             "id": user.id,
             "email": user.email,
             "username": user.username,
             "full_name": user.full_name,
-            "role": user.role.value if hasattr(user.role, 'value') else str(user.role),
+            "role": user.role.value,
             "is_active": user.is_active,
             "is_verified": user.is_verified,
             "created_at": user.created_at,
@@ -2167,9 +2468,7 @@ async def get_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    bookings_count = db.query(func.count(Booking.id)).filter(Booking.user_id == user.id).scalar()
-    payments = db.query(Payment).join(Booking).filter(Booking.user_id == user.id).filter(Payment.status == "completed").all()
-    total_spent = sum(p.amount for p in payments)
+    bookings_count, total_spent = get_user_stats([user.id], db).get(user.id, (0, 0.0))
     
     create_audit_log(
         db, current_user.id, "admin.users.view", "user", user_id,
@@ -2182,7 +2481,7 @@ async def get_user(
         "email": user.email,
         "username": user.username,
         "full_name": user.full_name,
-        "role": user.role.value if hasattr(user.role, 'value') else str(user.role),
+        "role": user.role.value,
         "is_active": user.is_active,
         "is_verified": user.is_verified,
         "created_at": user.created_at,
@@ -2200,10 +2499,6 @@ async def update_user(
     db: Session = Depends(get_db)
 ):
     """Update user information"""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     update_data = user_data.dict(exclude_unset=True)
     
     # Handle role update
@@ -2213,15 +2508,27 @@ async def update_user(
         except KeyError:
             raise HTTPException(status_code=400, detail="Invalid role")
     
-    for field, value in update_data.items():
-        setattr(user, field, value)
+    columns = (
+        User.id, User.email, User.username, User.full_name, User.role,
+        User.is_active, User.is_verified, User.created_at, User.last_login
+    )
+    if update_data:
+        # Single round trip: update and read back the new values
+        user = db.execute(
+            update(User).where(User.id == user_id).values(**update_data).returning(*columns)
+        ).first()
+        db.commit()
+    else:
+        user = db.query(*columns).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    db.commit()
-    db.refresh(user)
+    user = user._asdict()
+    user["role"] = user["role"].value
     
     create_audit_log(
         db, current_user.id, "admin.users.update", "user", user_id,
-        description=f"Updated user {user.email}",
+        description=f"Updated user {user['email']}",
         ip_address=request.client.host if request.client else None,
         user_agent=request.headers.get("User-Agent"),
         metadata=update_data
@@ -2240,12 +2547,13 @@ async def delete_user(
     if user_id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    # Dependent rows are removed by the ON DELETE rules on the foreign keys,
+    # so this is a single statement regardless of how much the user owns
+    user_email = db.execute(
+        delete(User).where(User.id == user_id).returning(User.email)
+    ).scalar_one_or_none()
+    if user_email is None:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    user_email = user.email
-    db.delete(user)
     db.commit()
     
     create_audit_log(
@@ -2264,53 +2572,51 @@ async def get_billing_summary(
     db: Session = Depends(get_db)
 ):
     """Get billing and payment summary"""
-    from datetime import datetime, timedelta
-    from collections import defaultdict
-    
-    # Total revenue
-    completed_payments = db.query(Payment).filter(Payment.status == "completed").all()
-    total_revenue = sum(p.amount for p in completed_payments)
-    
-    # Revenue this month
     now = datetime.utcnow()
     first_day_this_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    payments_this_month = [p for p in completed_payments if p.created_at >= first_day_this_month]
-    revenue_this_month = sum(p.amount for p in payments_this_month)
-    
-    # Revenue last month
     if first_day_this_month.month == 1:
         first_day_last_month = first_day_this_month.replace(year=first_day_this_month.year - 1, month=12)
     else:
         first_day_last_month = first_day_this_month.replace(month=first_day_this_month.month - 1)
-    last_day_last_month = first_day_this_month - timedelta(seconds=1)
-    payments_last_month = [p for p in completed_payments if first_day_last_month <= p.created_at <= last_day_last_month]
-    revenue_last_month = sum(p.amount for p in payments_last_month)
-    
-    # Pending payments
-    pending_payments = db.query(Payment).filter(Payment.status == "pending").all()
-    pending_amount = sum(p.amount for p in pending_payments)
-    
-    # Failed payments
-    failed_payments = db.query(Payment).filter(Payment.status == "failed").all()
-    failed_amount = sum(p.amount for p in failed_payments)
     
-    # Refunded amount
-    refunded_payments = db.query(Payment).filter(Payment.status == "refunded").all()
-    refunded_amount = sum(p.amount for p in refunded_payments)
+    def amount_where(*conditions):
+        return func.coalesce(func.sum(case((and_(*conditions), Payment.amount))), 0.0)
+    
+    completed = Payment.status == "completed"
+    
+    # Revenue and outstanding amounts in a single pass over payments
+    (
+        total_revenue,
+        revenue_this_month,
+        revenue_last_month,
+        pending_amount,
+        failed_amount,
+        refunded_amount
+    ) = db.query(
+        amount_where(completed),
+        amount_where(completed, Payment.created_at >= first_day_this_month),
+        amount_where(
+            completed,
+            Payment.created_at >= first_day_last_month,
+            Payment.created_at < first_day_this_month
+        ),
+        amount_where(Payment.status == "pending"),
+        amount_where(Payment.status == "failed"),
+        amount_where(Payment.status == "refunded")
+    ).one()
     
     # Revenue by payment method
-    revenue_by_method = defaultdict(float)
-    for payment in completed_payments:
-        method = payment.payment_method.value if hasattr(payment.payment_method, 'value') else str(payment.payment_method)
-        revenue_by_method[method] += payment.amount
+    revenue_by_method = db.query(Payment.payment_method, func.sum(Payment.amount)).filter(
+        completed
+    ).group_by(Payment.payment_method).all()
     
     # Invoice summary
-    invoices = db.query(Invoice).all()
+    invoice_counts = dict(db.query(Invoice.status, func.count(Invoice.id)).group_by(Invoice.status).all())
     invoices_summary = {
-        "total": len(invoices),
-        "paid": len([i for i in invoices if i.status == "paid"]),
-        "pending": len([i for i in invoices if i.status == "pending"]),
-        "cancelled": len([i for i in invoices if i.status == "cancelled"])
+        "total": sum(invoice_counts.values()),
+        "paid": invoice_counts.get("paid", 0),
+        "pending": invoice_counts.get("pending", 0),
+        "cancelled": invoice_counts.get("cancelled", 0)
     }
     
     create_audit_log(
@@ -2320,13 +2626,13 @@ async def get_billing_summary(
     )
     
     return {
-        "total_revenue": total_revenue,
-        "revenue_this_month": revenue_this_month,
-        "revenue_last_month": revenue_last_month,
-        "pending_payments": pending_amount,
-        "failed_payments": failed_amount,
-        "refunded_amount": refunded_amount,
-        "revenue_by_payment_method": dict(revenue_by_method),
+        "total_revenue": float(total_revenue),
+        "revenue_this_month": float(revenue_this_month),
+        "revenue_last_month": float(revenue_last_month),
+        "pending_payments": float(pending_amount),
+        "failed_payments": float(failed_amount),
+        "refunded_amount": float(refunded_amount),
+        "revenue_by_payment_method": {method.value: float(amount) for method, amount in revenue_by_method},
         "invoices_summary": invoices_summary
     }
 
@@ -2340,8 +2646,6 @@ async def get_usage_report(
     report_type: str = Query("summary")
 ):
     """Get usage statistics and reports"""
-    from datetime import datetime, timedelta
-    from collections import defaultdict
     
     if not start_date:
         start_date = datetime.utcnow() - timedelta(days=30)
@@ -2349,22 +2653,29 @@ async def get_usage_report(
         end_date = datetime.utcnow()
     
     # User registrations over time
-    users = db.query(User).filter(
+    user_day = day_key(User.created_at)
+    users_by_day = db.query(user_day, func.count(User.id)).filter(
         User.created_at >= start_date,
         User.created_at <= end_date
-    ).all()
+    ).group_by(user_day).all()
     
     # Bookings over time
-    bookings = db.query(Booking).filter(
+    booking_day = day_key(Booking.created_at)
+    bookings_by_day = db.query(booking_day, func.count(Booking.id)).filter(
         Booking.created_at >= start_date,
         Booking.created_at <= end_date
-    ).all()
+    ).group_by(booking_day).all()
     
     # Payments over time
-    payments = db.query(Payment).filter(
+    payment_day = day_key(Payment.created_at)
+    payments_by_day = db.query(
+        payment_day,
+        func.count(Payment.id),
+        func.coalesce(func.sum(case((Payment.status == "completed", Payment.amount))), 0.0)
+    ).filter(
         Payment.created_at >= start_date,
         Payment.created_at <= end_date
-    ).all()
+    ).group_by(payment_day).all()
     
     # Daily statistics
     daily_stats = defaultdict(lambda: {
@@ -2374,19 +2685,15 @@ async def get_usage_report(
         "revenue": 0.0
     })
     
-    for user in users:
-        day_key = user.created_at.strftime("%Y-%m-%d")
-        daily_stats[day_key]["users"] += 1
+    for day, count in users_by_day:
+        daily_stats[day]["users"] = count
     
-    for booking in bookings:
-        day_key = booking.created_at.strftime("%Y-%m-%d")
-        daily_stats[day_key]["bookings"] += 1
+    for day, count in bookings_by_day:
+        daily_stats[day]["bookings"] = count
     
-    for payment in payments:
-        day_key = payment.created_at.strftime("%Y-%m-%d")
-        daily_stats[day_key]["payments"] += 1
-        if payment.status == "completed":
-            daily_stats[day_key]["revenue"] += payment.amount
+    for day, count, revenue in payments_by_day:
+        daily_stats[day]["payments"] = count
+        daily_stats[day]["revenue"] = float(revenue)
     
     create_audit_log(
         db, current_user.id, "admin.reports.view", "report",
@@ -2398,14 +2705,14 @@ async def get_usage_report(
     return {
         "success": True,
         "period": {
-            "start_date": start_date.isoformat(),
-            "end_date": end_date.isoformat()
+            "start_date": start_date,
+            "end_date": end_date
         },
         "summary": {
-            "total_users": len(users),
-            "total_bookings": len(bookings),
-            "total_payments": len(payments),
-            "total_revenue": sum(p.amount for p in payments if p.status == "completed")
+            "total_users": sum(count for _, count in users_by_day),
+            "total_bookings": sum(count for _, count in bookings_by_day),
+            "total_payments": sum(count for _, count, _ in payments_by_day),
+            "total_revenue": sum(stats["revenue"] for stats in daily_stats.values())
         },
         "daily_stats": dict(daily_stats)
     }
@@ -2417,24 +2724,21 @@ async def get_system_health(
     db: Session = Depends(get_db)
 ):
     """Get system health monitoring data"""
-    from datetime import datetime
-    import time
-    from database import check_database_connection
-    from db_utils import DatabaseManager
     
     start_time = time.time()
     
     # Database health
     db_healthy = check_database_connection()
-    db_manager = DatabaseManager()
-    db_stats = db_manager.get_connection_pool_stats()
-    table_stats = db_manager.get_table_stats()
+    db_stats, table_stats = await asyncio.gather(
+        asyncio.to_thread(_db_manager.get_connection_pool_stats),
+        asyncio.to_thread(_db_manager.get_table_stats)
+    )
     
     # API health (basic check)
     api_healthy = True
     try:
-        # Simple query to test API
-        db.query(User).limit(1).all()
+        # Round trip on the request's session without loading any ORM rows
+        api_healthy = bool(db.execute(text("SELECT 1")).scalar())
     except:
         api_healthy = False
     
@@ -2484,9 +2788,18 @@ async def get_audit_logs(
     offset: int = Query(0, ge=0)
 ):
     """Get audit logs with filtering"""
-    from sqlalchemy import and_
     
-    query = db.query(AuditLog)
+    query = db.query(
+        AuditLog.id,
+        AuditLog.user_id,
+        User.email.label("user_email"),
+        AuditLog.action,
+        AuditLog.resource_type,
+        AuditLog.resource_id,
+        AuditLog.description,
+        AuditLog.ip_address,
+        AuditLog.created_at
+    ).outerjoin(User, User.id == AuditLog.user_id)
     
     if user_id:
         query = query.filter(AuditLog.user_id == user_id)
@@ -2499,27 +2812,19 @@ async def get_audit_logs(
     if end_date:
         query = query.filter(AuditLog.created_at <= end_date)
     
-    logs = query.order_by(AuditLog.created_at.desc()).offset(offset).limit(limit).all()
-    
-    result = []
-    for log in logs:
-        user_email = None
-        if log.user_id:
-            user = db.query(User).filter(User.id == log.user_id).first()
-            if user:
-                user_email = user.email
-        
-        result.append({
-            "id": log.id,
-            "user_id": log.user_id,
-            "user_email": user_email,
-            "action": log.action,
-            "resource_type": log.resource_type,
-            "resource_id": log.resource_id,
-            "description": log.description,
-            "ip_address": log.ip_address,
-            "created_at": log.created_at
-        })
+    query = query.order_by(AuditLog.created_at.desc()).offset(offset).limit(limit)
+    if engine.dialect.name == "postgresql":
+        # Let Postgres render the page as one JSON array instead of building rows in Python
+        page = query.subquery("page")
+        body = db.query(cast(
+            func.coalesce(
+                func.json_agg(aggregate_order_by(page.table_valued(), page.c.created_at.desc())),
+                text("'[]'::json")
+            ),
+            Text
+        )).scalar().encode()
+    else:
+        body = orjson.dumps([row._asdict() for row in query.all()])
     
     create_audit_log(
         db, current_user.id, "admin.audit.view", "audit_log",
@@ -2527,18 +2832,33 @@ async def get_audit_logs(
         user_agent=request.headers.get("User-Agent")
     )
     
-    return result
+    return Response(content=body, media_type="application/json")
 
 # ========== COMMUNICATION ENDPOINTS ==========
 
+# Hot list endpoints serialize straight to JSON bytes in pydantic-core
+_message_list_adapter = TypeAdapter(List[MessageSchema])
+_forum_post_list_adapter = TypeAdapter(List[ForumPostSchema])
+_forum_category_list_adapter = TypeAdapter(List[ForumCategorySchema])
+
+# Serialized category list (with post counts); cleared when a post is created
+_forum_categories_cache = TTLCache(maxsize=1, ttl=60)
+
+def orm_list_response(adapter: TypeAdapter, rows) -> Response:
+    """Validate ORM rows and encode them in one pass, bypassing FastAPI's response encoding"""
+    return Response(
+        content=adapter.dump_json(adapter.validate_python(rows, from_attributes=True)),
+        media_type="application/json"
+    )
+
 @app.post("/communication/chat/rooms", response_model=ChatRoomSchema)
 async def create_chat_room(
     request_data: ChatRoomCreateRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: TokenUser = Depends(get_token_user),
     db: Session = Depends(get_db)
 ):
     """Create a new chat room"""
-    comm_service = CommunicationService()
+    comm_service = get_communication_service()
     result = await comm_service.create_chat_room(
         room_type=request_data.room_type,
         user_id=current_user.id,
@@ -2551,22 +2871,22 @@ async def create_chat_room(
 
 @app.get("/communication/chat/rooms", response_model=List[ChatRoomSchema])
 async def get_chat_rooms(
-    current_user: User = Depends(get_current_active_user),
+    current_user: TokenUser = Depends(get_token_user),
     db: Session = Depends(get_db)
 ):
     """Get all chat rooms for current user"""
-    comm_service = CommunicationService()
-    rooms = await comm_service.get_user_chat_rooms(current_user.id, db)
+    comm_service = get_communication_service()
+    rooms = await asyncio.to_thread(comm_service.get_user_chat_rooms, current_user.id, db)
     return rooms
 
 @app.post("/communication/chat/messages", response_model=MessageSchema)
 async def send_message(
     request_data: MessageCreateRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: TokenUser = Depends(get_token_user),
     db: Session = Depends(get_db)
 ):
     """Send a message in a chat room"""
-    comm_service = CommunicationService()
+    comm_service = get_communication_service()
     result = await comm_service.send_message(
         room_id=request_data.room_id,
         sender_id=current_user.id,
@@ -2579,13 +2899,11 @@ async def send_message(
         raise HTTPException(status_code=400, detail=result.get("error"))
     
     message = result["message"]
-    # Add sender email
-    sender = db.query(User).filter(User.id == message.sender_id).first()
     return {
         "id": message.id,
         "room_id": message.room_id,
         "sender_id": message.sender_id,
-        "sender_email": sender.email if sender else None,
+        "sender_email": current_user.email,
         "content": message.content,
         "message_type": message.message_type,
         "translated_content": message.translated_content,
@@ -2598,45 +2916,28 @@ async def send_message(
 @app.get("/communication/chat/rooms/{room_id}/messages", response_model=List[MessageSchema])
 async def get_messages(
     room_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: TokenUser = Depends(get_token_user),
+    db: AsyncSession = Depends(get_async_db),
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0)
 ):
     """Get messages from a chat room"""
-    comm_service = CommunicationService()
+    comm_service = get_communication_service()
     result = await comm_service.get_messages(room_id, current_user.id, limit, offset, db)
     if not result.get("success"):
         raise HTTPException(status_code=403, detail=result.get("error"))
     
-    messages = result["messages"]
-    # Add sender emails
-    result_messages = []
-    for msg in messages:
-        sender = db.query(User).filter(User.id == msg.sender_id).first() if msg.sender_id else None
-        result_messages.append({
-            "id": msg.id,
-            "room_id": msg.room_id,
-            "sender_id": msg.sender_id,
-            "sender_email": sender.email if sender else None,
-            "content": msg.content,
-            "message_type": msg.message_type,
-            "translated_content": msg.translated_content,
-            "original_language": msg.original_language,
-            "translated_language": msg.translated_language,
-            "is_read": msg.is_read,
-            "created_at": msg.created_at
-        })
-    return result_messages
+    # Senders are eager-loaded by the service; MessageSchema reads sender.email
+    return orm_list_response(_message_list_adapter, result["messages"])
 
 @app.post("/communication/ai/chat")
 async def ai_chat(
     request_data: AIChatRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: TokenUser = Depends(get_token_user),
     db: Session = Depends(get_db)
 ):
     """Send a message to AI chatbot"""
-    comm_service = CommunicationService()
+    comm_service = get_communication_service()
     result = await comm_service.send_ai_message(
         message=request_data.message,
         session_id=request_data.session_id,
@@ -2651,21 +2952,21 @@ async def ai_chat(
 @app.get("/communication/ai/conversations/{session_id}", response_model=List[AIMessageSchema])
 async def get_ai_conversation(
     session_id: str,
-    current_user: User = Depends(get_current_active_user),
+    current_user: TokenUser = Depends(get_token_user),
     db: Session = Depends(get_db)
 ):
     """Get AI conversation history"""
-    comm_service = CommunicationService()
+    comm_service = get_communication_service()
     messages = await comm_service.get_ai_conversation_history(session_id, current_user.id, db)
     return messages
 
 @app.post("/communication/translate")
 async def translate_text(
     request_data: TranslationRequest,
-    current_user: User = Depends(get_current_active_user)
+    current_user: TokenUser = Depends(get_token_user)
 ):
     """Translate text to target language"""
-    comm_service = CommunicationService()
+    comm_service = get_communication_service()
     result = await comm_service.translate_text(
         text=request_data.text,
         target_language=request_data.target_language,
@@ -2676,11 +2977,11 @@ async def translate_text(
 @app.post("/communication/calls/initiate", response_model=CallSessionSchema)
 async def initiate_call(
     request_data: CallInitiateRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: TokenUser = Depends(get_token_user),
     db: Session = Depends(get_db)
 ):
     """Initiate a voice or video call"""
-    comm_service = CommunicationService()
+    comm_service = get_communication_service()
     result = await comm_service.initiate_call(
         call_type=request_data.call_type,
         initiator_id=current_user.id,
@@ -2695,11 +2996,11 @@ async def initiate_call(
 async def update_call_status(
     session_id: str,
     status: str = Query(...),
-    current_user: User = Depends(get_current_active_user),
+    current_user: TokenUser = Depends(get_token_user),
     db: Session = Depends(get_db)
 ):
     """Update call status"""
-    comm_service = CommunicationService()
+    comm_service = get_communication_service()
     result = await comm_service.update_call_status(session_id, status, db)
     if not result.get("success"):
         raise HTTPException(status_code=404, detail=result.get("error"))
@@ -2712,7 +3013,7 @@ async def create_broadcast(
     db: Session = Depends(get_db)
 ):
     """Create a broadcast alert (Admin only)"""
-    comm_service = CommunicationService()
+    comm_service = get_communication_service()
     result = await comm_service.create_broadcast(
         alert_type=request_data.alert_type,
         priority=request_data.priority,
@@ -2732,10 +3033,10 @@ async def get_broadcasts(
     db: Session = Depends(get_db)
 ):
     """Get active broadcast alerts for current user"""
-    comm_service = CommunicationService()
+    comm_service = get_communication_service()
     alerts = await comm_service.get_active_broadcasts(
         user_id=current_user.id,
-        user_role=current_user.role.value if hasattr(current_user.role, 'value') else str(current_user.role),
+        user_role=current_user.role.value,
         db=db
     )
     return alerts
@@ -2743,59 +3044,54 @@ async def get_broadcasts(
 @app.post("/communication/broadcasts/{alert_id}/view")
 async def mark_broadcast_viewed(
     alert_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: TokenUser = Depends(get_token_user),
     db: Session = Depends(get_db)
 ):
     """Mark a broadcast alert as viewed"""
-    comm_service = CommunicationService()
+    comm_service = get_communication_service()
     result = await comm_service.mark_broadcast_viewed(alert_id, current_user.id, db)
     return result
 
 @app.get("/communication/forums/categories", response_model=List[ForumCategorySchema])
-async def get_forum_categories(db: Session = Depends(get_db)):
+async def get_forum_categories(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Get all forum categories"""
-    comm_service = CommunicationService()
-    categories = await comm_service.get_forum_categories(db)
-    # Add post count
-    from sqlalchemy import func
-    result = []
-    for cat in categories:
-        post_count = db.query(func.count(ForumPost.id)).filter(
-            ForumPost.category_id == cat.id
-        ).scalar()
-        result.append({
-            "id": cat.id,
-            "name": cat.name,
-            "description": cat.description,
-            "slug": cat.slug,
-            "order": cat.order,
-            "is_active": cat.is_active,
-            "post_count": post_count
-        })
-    return result
+    cached = _forum_categories_cache.get("categories")
+    if cached is None:
+        comm_service = get_communication_service()
+        categories = await comm_service.get_forum_categories(db)
+        body = _forum_category_list_adapter.dump_json(
+            _forum_category_list_adapter.validate_python(categories, from_attributes=True)
+        )
+        cached = (body, compute_body_etag(body))
+        _forum_categories_cache["categories"] = cached
+    
+    return etag_json_response(request, *cached)
 
 @app.post("/communication/forums/posts", response_model=ForumPostSchema)
 async def create_forum_post(
     request_data: ForumPostCreateRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: TokenUser = Depends(get_token_user),
     db: Session = Depends(get_db)
 ):
     """Create a forum post"""
-    comm_service = CommunicationService()
-    result = await comm_service.create_forum_post(
+    comm_service = get_communication_service()
+    result = await asyncio.to_thread(
+        comm_service.create_forum_post,
         category_id=request_data.category_id,
         author_id=current_user.id,
         title=request_data.title,
         content=request_data.content,
         db=db
     )
+    if not result.get("success"):
+        raise HTTPException(status_code=409, detail=result.get("error"))
+    _forum_categories_cache.clear()
     post = result["post"]
-    author = db.query(User).filter(User.id == post.author_id).first()
     return {
         "id": post.id,
         "category_id": post.category_id,
         "author_id": post.author_id,
-        "author_email": author.email if author else None,
+        "author_email": current_user.email,
         "title": post.title,
         "content": post.content,
         "slug": post.slug,
@@ -2812,99 +3108,66 @@ async def get_forum_posts(
     category_id: Optional[int] = Query(None),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get forum posts"""
-    comm_service = CommunicationService()
+    comm_service = get_communication_service()
+    # Column rows with author_email joined in and a content preview
     posts = await comm_service.get_forum_posts(category_id, limit, offset, db)
-    result = []
-    for post in posts:
-        author = db.query(User).filter(User.id == post.author_id).first() if post.author_id else None
-        result.append({
-            "id": post.id,
-            "category_id": post.category_id,
-            "author_id": post.author_id,
-            "author_email": author.email if author else None,
-            "title": post.title,
-            "content": post.content,
-            "slug": post.slug,
-            "is_pinned": post.is_pinned,
-            "is_locked": post.is_locked,
-            "view_count": post.view_count,
-            "reply_count": post.reply_count,
-            "last_reply_at": post.last_reply_at,
-            "created_at": post.created_at
-        })
-    return result
+    return orm_list_response(_forum_post_list_adapter, posts)
 
 @app.get("/communication/forums/posts/{post_id}", response_model=ForumPostSchema)
 async def get_forum_post(
     post_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific forum post"""
-    from models import ForumPost
-    post = db.query(ForumPost).filter(ForumPost.id == post_id).first()
+    comm_service = get_communication_service()
+    post = await comm_service.get_forum_post(post_id, db)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    # Increment view count
-    post.view_count = (post.view_count or 0) + 1
-    db.commit()
-    db.refresh(post)
+    # Views are buffered and flushed by the scheduler; report the count including them
+    comm_service.record_post_view(post_id)
     
-    author = db.query(User).filter(User.id == post.author_id).first() if post.author_id else None
-    return {
-        "id": post.id,
-        "category_id": post.category_id,
-        "author_id": post.author_id,
-        "author_email": author.email if author else None,
-        "title": post.title,
-        "content": post.content,
-        "slug": post.slug,
-        "is_pinned": post.is_pinned,
-        "is_locked": post.is_locked,
-        "view_count": post.view_count,
-        "reply_count": post.reply_count,
-        "last_reply_at": post.last_reply_at,
-        "created_at": post.created_at
-    }
+    response = ForumPostSchema.model_validate(post)
+    response.view_count += comm_service.pending_post_views(post_id)
+    return response
 
 @app.get("/communication/forums/posts/{post_id}/replies", response_model=List[ForumReplySchema])
 async def get_forum_replies(
     post_id: int,
-    db: Session = Depends(get_db)
-):
-    """Get replies for a forum post"""
-    from models import ForumReply
-    replies = db.query(ForumReply).filter(ForumReply.post_id == post_id).order_by(
-        ForumReply.created_at.asc()
-    ).all()
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a page of replies for a forum post, oldest first; X-Total-Count carries the reply count"""
+    reply_count = (await db.execute(
+        select(ForumPost.reply_count).where(ForumPost.id == post_id)
+    )).scalar_one_or_none()
+    response.headers["X-Total-Count"] = str(reply_count or 0)
+    if not reply_count:
+        return []
     
-    result = []
-    for reply in replies:
-        author = db.query(User).filter(User.id == reply.author_id).first() if reply.author_id else None
-        result.append({
-            "id": reply.id,
-            "post_id": reply.post_id,
-            "author_id": reply.author_id,
-            "author_email": author.email if author else None,
-            "parent_reply_id": reply.parent_reply_id,
-            "content": reply.content,
-            "is_solution": reply.is_solution,
-            "created_at": reply.created_at
-        })
-    return result
+    return (await db.execute(
+        select(ForumReply).options(
+            selectinload(ForumReply.author), raiseload("*")
+        ).where(ForumReply.post_id == post_id).order_by(
+            ForumReply.created_at.asc(), ForumReply.id.asc()
+        ).offset(offset).limit(limit)
+    )).scalars().all()
 
 @app.post("/communication/forums/replies", response_model=ForumReplySchema)
 async def create_forum_reply(
     request_data: ForumReplyCreateRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: TokenUser = Depends(get_token_user),
     db: Session = Depends(get_db)
 ):
     """Create a forum reply"""
-    comm_service = CommunicationService()
-    result = await comm_service.create_forum_reply(
+    comm_service = get_communication_service()
+    result = await asyncio.to_thread(
+        comm_service.create_forum_reply,
         post_id=request_data.post_id,
         author_id=current_user.id,
         content=request_data.content,
@@ -2912,37 +3175,30 @@ async def create_forum_reply(
         db=db
     )
     reply = result["reply"]
-    author = db.query(User).filter(User.id == reply.author_id).first()
     return {
         "id": reply.id,
         "post_id": reply.post_id,
         "author_id": reply.author_id,
-        "author_email": author.email if author else None,
+        "author_email": current_user.email,
         "parent_reply_id": reply.parent_reply_id,
         "content": reply.content,
         "is_solution": reply.is_solution,
         "created_at": reply.created_at
     }
 
-# Initialize scheduler service on startup
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on application startup"""
-    from services.scheduler_service import get_scheduler_service
-    scheduler = get_scheduler_service()
-    scheduler.start()
-    logger.info("Application startup: Scheduler service initialized")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup on application shutdown"""
-    from services.scheduler_service import get_scheduler_service
-    scheduler = get_scheduler_service()
-    scheduler.stop()
-    logger.info("Application shutdown: Scheduler service stopped")
-
 if __name__ == "__main__":
+    import sys
     import uvicorn
     logging.basicConfig(level=logging.INFO)
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Workers are separate processes (each builds its own engine and pool); WEB_CONCURRENCY is
+    # the same variable the uvicorn CLI reads, so `uvicorn main:app` in Docker honours it too
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        log_level="info"
+    )
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Text, Index, CheckConstraint, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Text, Index, CheckConstraint, Boolean, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import ENUM as PG_ENUM, UUID
 from database import Base
@@ -108,8 +108,10 @@ class User(Base):
 
     __table_args__ = (
         Index('idx_users_email', 'email'),
+        Index('idx_users_email_lower', text('lower(email)')),
         Index('idx_users_provider', 'auth_provider', 'provider_id'),
         Index('idx_users_uuid', 'uuid'),
+        Index('idx_users_last_login', 'last_login'),
     )
 
 class Tour(Base):
@@ -167,6 +169,8 @@ class Booking(Base):
         Index('idx_bookings_status', 'status'),
         Index('idx_bookings_booking_date', 'booking_date'),
         Index('idx_bookings_tour_status', 'tour_id', 'status'),
+        Index('idx_bookings_email_created', 'user_email', 'created_at'),
+        Index('idx_bookings_user_status', 'user_id', 'status'),
     )
 
 class Payment(Base):
@@ -201,6 +205,10 @@ class Payment(Base):
         Index('idx_payments_status', 'status'),
         Index('idx_payments_method_status', 'payment_method', 'status'),
         Index('idx_payments_created_at', 'created_at'),
+        Index('idx_payments_status_booking', 'status', 'booking_id'),
+        Index('idx_payments_booking_id_desc', 'booking_id', text('id DESC')),
+        Index('idx_payments_status_created', 'status', 'created_at'),
+        Index('idx_payments_completed_created', 'created_at', postgresql_where=text("status = 'completed'")),
     )
 
 class Invoice(Base):
@@ -232,6 +240,7 @@ class Invoice(Base):
         Index('idx_invoices_user_id', 'user_id'),
         Index('idx_invoices_status', 'status'),
         Index('idx_invoices_created_at', 'created_at'),
+        Index('idx_invoices_user_created', 'user_id', 'created_at'),
     )
 
 class Feedback(Base):
@@ -256,6 +265,7 @@ class Feedback(Base):
         Index('idx_feedback_type', 'feedback_type'),
         Index('idx_feedback_status', 'status'),
         Index('idx_feedback_created_at', 'created_at'),
+        Index('idx_feedback_email_created', 'user_email', 'created_at'),
     )
 
 class DataConsent(Base):
@@ -318,6 +328,20 @@ class BackupRecord(Base):
         Index('idx_backups_expires_at', 'expires_at'),
     )
 
+class BackupJob(Base):
+    """Status of a background backup started through the API, shared by all workers"""
+    __tablename__ = "backup_jobs"
+    
+    id = Column(String(32), primary_key=True)  # uuid4 hex returned to the client
+    status = Column(String(50), default="running", nullable=False)  # running, completed, failed
+    started_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    result = Column(Text, nullable=True)  # JSON string returned by DatabaseManager.backup_database
+    
+    __table_args__ = (
+        Index('idx_backup_jobs_started_at', 'started_at'),
+    )
+
 # ========== AUTHENTICATION & SESSION MODELS ==========
 
 class UserSession(Base):
@@ -522,6 +546,7 @@ class AuditLog(Base):
         Index('idx_audit_user_action', 'user_id', 'action'),
         Index('idx_audit_resource', 'resource_type', 'resource_id'),
         Index('idx_audit_created_at', 'created_at'),
+        Index('idx_audit_created_user_resource', 'created_at', 'user_id', 'resource_type'),
     )
 
 # ========== COMMUNICATION MODELS ==========
@@ -586,7 +611,7 @@ class Message(Base):
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False, index=True)
     
     room = relationship("ChatRoom", back_populates="messages")
-    sender = relationship("User")
+    sender = relationship("User", lazy="raise")  # load explicitly (selectinload) to avoid per-message queries
     
     __table_args__ = (
         Index('idx_messages_room_created', 'room_id', 'created_at'),
@@ -705,6 +730,7 @@ class ForumCategory(Base):
     slug = Column(String(255), unique=True, nullable=False, index=True)
     order = Column(Integer, default=0, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
+    post_count = Column(Integer, default=0, nullable=False)  # Maintained by CommunicationService.create_forum_post and user deletion
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
     
     posts = relationship("ForumPost", back_populates="category", cascade="all, delete-orphan")
@@ -722,7 +748,7 @@ class ForumPost(Base):
     author_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
     title = Column(String(500), nullable=False, index=True)
     content = Column(Text, nullable=False)
-    slug = Column(String(500), nullable=True, index=True)
+    slug = Column(String(500), nullable=True, unique=True, index=True)
     is_pinned = Column(Boolean, default=False, nullable=False, index=True)
     is_locked = Column(Boolean, default=False, nullable=False)
     view_count = Column(Integer, default=0, nullable=False)
@@ -736,7 +762,8 @@ class ForumPost(Base):
     replies = relationship("ForumReply", back_populates="post", cascade="all, delete-orphan")
     
     __table_args__ = (
-        Index('idx_forum_post_category_created', 'category_id', 'created_at'),
+        # Category listing filters on category_id and sorts by (is_pinned DESC, created_at DESC); a backward scan serves it
+        Index('idx_forum_post_category_pinned_created', 'category_id', 'is_pinned', 'created_at'),
         Index('idx_forum_post_pinned', 'is_pinned', 'created_at'),
     )
 
@@ -754,7 +781,7 @@ class ForumReply(Base):
     updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
     
     post = relationship("ForumPost", back_populates="replies")
-    author = relationship("User")
+    author = relationship("User", lazy="raise_on_sql")  # load explicitly (selectinload) to avoid per-reply queries
     parent_reply = relationship("ForumReply", remote_side=[id])
     
     __table_args__ = (
@@ -814,6 +841,7 @@ class SupportMessage(Base):
     
     __table_args__ = (
         Index('idx_messages_ticket_created', 'ticket_id', 'created_at'),
+        Index('idx_support_messages_ticket_internal_created', 'ticket_id', 'is_internal', 'created_at'),
     )
 
 class FAQ(Base):
@@ -0,0 +1,6 @@
+"""
+API routers split out of main.py.
+
+Each module exposes a `router` that main.py includes; heavy service
+dependencies are imported lazily inside the module's service getters.
+"""
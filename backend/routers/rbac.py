@@ -0,0 +1,109 @@
+"""
+Role-based access control endpoints.
+"""
+from functools import lru_cache
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from auth import get_current_active_user, get_current_admin_user
+from database import get_db
+from models import User
+from schemas import (
+    PermissionGrantRequest, PermissionGrantBulkRequest, PermissionRevokeRequest, PermissionCreateRequest
+)
+from services.rbac_service import RBACService
+
+router = APIRouter(prefix="/auth/permissions", tags=["rbac"])
+
+
+@lru_cache(maxsize=1)
+def get_rbac_service() -> RBACService:
+    return RBACService()
+
+
+@router.get("")
+async def get_user_permissions(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get all permissions for current user"""
+    rbac_service = get_rbac_service()
+    permissions = await rbac_service.get_user_permissions(current_user, db)
+    return {"success": True, "permissions": permissions}
+
+
+@router.post("/grant")
+async def grant_permission(
+    request: PermissionGrantRequest,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Grant permission to user (Admin only)"""
+    rbac_service = get_rbac_service()
+    # Identity-map hit when the admin targets themselves
+    user = db.get(User, request.user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    result = await rbac_service.grant_permission(user, request.permission, db)
+    return result
+
+
+@router.post("/grant-bulk")
+async def grant_permissions_bulk(
+    request: PermissionGrantBulkRequest,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Grant many permissions to many users in one call (Admin only)"""
+    if not request.grants:
+        return {"success": True, "granted": 0, "already_granted": 0}
+    rbac_service = get_rbac_service()
+    return await rbac_service.grant_permissions_bulk(
+        [(grant.user_id, grant.permission) for grant in request.grants], db
+    )
+
+
+@router.post("/revoke")
+async def revoke_permission(
+    request: PermissionRevokeRequest,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Revoke permission from user (Admin only)"""
+    rbac_service = get_rbac_service()
+    # Identity-map hit when the admin targets themselves
+    user = db.get(User, request.user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    result = await rbac_service.revoke_permission(user, request.permission, db)
+    return result
+
+
+@router.post("/create")
+async def create_permission(
+    request: PermissionCreateRequest,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Create a new permission (Admin only)"""
+    rbac_service = get_rbac_service()
+    result = await rbac_service.create_permission(
+        request.name,
+        request.resource,
+        request.action,
+        request.description,
+        db
+    )
+    return result
+
+
+@router.post("/initialize")
+async def initialize_permissions(
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Initialize default permissions (Admin only)"""
+    rbac_service = get_rbac_service()
+    result = await rbac_service.initialize_default_permissions(db)
+    return result
@@ -0,0 +1,87 @@
+"""
+SAML / OIDC single sign-on endpoints.
+
+python3-saml (lxml/xmlsec) and authlib are only needed once someone actually
+uses SSO, so the services are imported on first use instead of at worker boot.
+"""
+import os
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import RedirectResponse, Response
+from sqlalchemy.orm import Session
+
+from database import get_db
+from schemas import SAMLInitiateRequest, OIDCInitiateRequest
+
+router = APIRouter(prefix="/auth", tags=["sso"])
+
+
+@lru_cache(maxsize=1)
+def get_saml_service():
+    from services.saml_service import SAMLService
+    return SAMLService()
+
+
+@lru_cache(maxsize=1)
+def get_oidc_service(http_client: httpx.AsyncClient):
+    from services.oidc_service import OIDCService
+    return OIDCService(http_client=http_client)
+
+
+@router.post("/saml/initiate")
+async def initiate_saml_sso(
+    request: SAMLInitiateRequest,
+    db: Session = Depends(get_db)
+):
+    """Initiate SAML SSO"""
+    saml_service = get_saml_service()
+    result = await saml_service.initiate_sso(request.provider_id, db)
+    return result
+
+
+@router.get("/saml/metadata/{provider_id}")
+async def get_saml_metadata(
+    provider_id: int,
+    db: Session = Depends(get_db)
+):
+    """Get SAML metadata"""
+    saml_service = get_saml_service()
+    metadata = await saml_service.get_metadata(provider_id, db)
+    return Response(content=metadata, media_type="application/xml")
+
+
+@router.post("/oidc/initiate")
+async def initiate_oidc_sso(
+    request: OIDCInitiateRequest,
+    http_request: Request,
+    db: Session = Depends(get_db)
+):
+    """Initiate OIDC SSO"""
+    oidc_service = get_oidc_service(http_request.app.state.http)
+    result = await oidc_service.get_authorization_url(
+        request.provider_id,
+        db,
+        state=request.state
+    )
+    return result
+
+
+@router.get("/oidc/{provider_id}/callback")
+async def oidc_callback(
+    provider_id: int,
+    code: str,
+    http_request: Request,
+    state: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Handle OIDC callback"""
+    
+    oidc_service = get_oidc_service(http_request.app.state.http)
+    result = await oidc_service.handle_callback(provider_id, code, state, db)
+    
+    frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
+    redirect_url = f"{frontend_url}/auth/callback?token={result['access_token']}&success=true"
+    return RedirectResponse(url=redirect_url)
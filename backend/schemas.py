@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import AliasChoices, AliasPath, BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -29,6 +29,21 @@ class BookingSchema(BaseModel):
     class Config:
         from_attributes = True
 
+# One row of GET /bookings: booking columns plus tour name and latest payment
+class BookingListItem(BaseModel):
+    id: int
+    tour_id: int
+    user_email: Optional[str] = None
+    booking_date: Optional[datetime] = None
+    status: str
+    notes: Optional[str] = None
+    tour_name: Optional[str] = None
+    payment_method: Optional[str] = None
+    amount: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
 class PaymentSchema(BaseModel):
     id: int
     booking_id: int
@@ -69,6 +84,10 @@ class CryptoPaymentRequest(BaseModel):
     public_key: Optional[str] = None
     user_email: Optional[str] = None
 
+class CryptoStatusQuery(BaseModel):
+    currency: str  # "solana", "bitcoin", "ethereum"
+    tx_hash: str
+
 class PaymentAddressRequest(BaseModel):
     currency: str  # "solana", "bitcoin", "ethereum"
 
@@ -293,6 +312,9 @@ class PermissionGrantRequest(BaseModel):
     user_id: int
     permission: str
 
+class PermissionGrantBulkRequest(BaseModel):
+    grants: List[PermissionGrantRequest]
+
 class PermissionRevokeRequest(BaseModel):
     user_id: int
     permission: str
@@ -406,7 +428,8 @@ class MessageSchema(BaseModel):
     id: int
     room_id: int
     sender_id: Optional[int] = None
-    sender_email: Optional[str] = None
+    # Read from an eager-loaded Message.sender when validating ORM rows
+    sender_email: Optional[str] = Field(None, validation_alias=AliasChoices("sender_email", AliasPath("sender", "email")))
     content: str
     message_type: str
     translated_content: Optional[str] = None
@@ -517,7 +540,8 @@ class ForumPostSchema(BaseModel):
     id: int
     category_id: int
     author_id: Optional[int] = None
-    author_email: Optional[str] = None
+    # Read from an eager-loaded ForumPost.author when validating ORM rows
+    author_email: Optional[str] = Field(None, validation_alias=AliasChoices("author_email", AliasPath("author", "email")))
     title: str
     content: str
     slug: Optional[str] = None
@@ -540,7 +564,8 @@ class ForumReplySchema(BaseModel):
     id: int
     post_id: int
     author_id: Optional[int] = None
-    author_email: Optional[str] = None
+    # Read from an eager-loaded ForumReply.author when validating ORM rows
+    author_email: Optional[str] = Field(None, validation_alias=AliasChoices("author_email", AliasPath("author", "email")))
     parent_reply_id: Optional[int] = None
     content: str
     is_solution: bool
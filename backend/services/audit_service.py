@@ -0,0 +1,124 @@
+"""
+Audit Log Service
+
+Buffers audit log entries in an in-process queue and writes them to the
+database in batches, keeping the commit off the request path.
+"""
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Queued by stop() behind the pending entries; the flusher writes what it holds and exits
+_STOP = object()
+
+
+class AuditLogService:
+    """Service for batching audit log writes"""
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+        self.flush_interval = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "1"))
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=int(os.getenv("AUDIT_QUEUE_SIZE", "10000")))
+        self.task: Optional[asyncio.Task] = None
+
+    def record(self, entry: Dict[str, Any]):
+        """Queue an audit entry; when the queue is full, write it with its own session instead"""
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            logger.warning("Audit queue full, writing entry synchronously")
+            self._write([entry])
+
+    def start(self):
+        """Start the background flusher on the running event loop"""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+            logger.info("Audit log flusher started")
+
+    async def stop(self):
+        """Stop the flusher and write whatever is still queued"""
+        if self.task is not None:
+            # A sentinel rather than cancel(), so the batch the flusher holds is written too
+            await self.queue.put(_STOP)
+            await self.task
+            self.task = None
+        while not self.queue.empty():
+            batch: List[Dict[str, Any]] = []
+            self._drain(batch)
+            await asyncio.to_thread(self._write, batch)
+        logger.info("Audit log flusher stopped")
+
+    async def _run(self):
+        """Write batches of up to batch_size entries, at least every flush_interval seconds"""
+        stopping = False
+        while not stopping:
+            entry = await self.queue.get()
+            if entry is _STOP:
+                break
+            batch = [entry]
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            if not stopping:
+                stopping = self._drain(batch)
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                logger.error(f"Failed to write audit log batch: {e}")
+
+    def _drain(self, batch: List[Dict[str, Any]]) -> bool:
+        """Top a batch up with entries that are already queued; True if the stop sentinel was reached"""
+        while len(batch) < self.batch_size:
+            try:
+                entry = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if entry is _STOP:
+                return True
+            batch.append(entry)
+        return False
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        """Insert a batch using a dedicated session"""
+        db = SessionLocal()
+        try:
+            self._insert(batch, db)
+        finally:
+            db.close()
+
+    def _insert(self, batch: List[Dict[str, Any]], db: Session):
+        """Bulk insert audit rows and commit"""
+        db.execute(insert(AuditLog.__table__), batch)
+        db.commit()
+
+
+# Singleton instance
+_audit_log_service: Optional[AuditLogService] = None
+
+
+def get_audit_log_service() -> AuditLogService:
+    """Get or create audit log service singleton"""
+    global _audit_log_service
+    if _audit_log_service is None:
+        _audit_log_service = AuditLogService()
+    return _audit_log_service
@@ -5,20 +5,36 @@ Handles OAuth2 authentication with multiple providers (Google, GitHub, etc.)
 and traditional email/password authentication.
 """
 import os
+import logging
 import httpx
 from typing import Optional, Dict, Any
+from sqlalchemy import bindparam, func, or_, select, update
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
 from models import User, AuthProvider, UserRole
-from auth import get_password_hash, verify_password, create_access_token
+from auth import get_password_hash_async, verify_password_async, create_access_token
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# Login lookup built once at import; each call only binds the email (case-insensitive,
+# served by idx_users_email_lower). Registration rejects case variants, but older rows may
+# still differ only by case: an exact-case match wins, then the oldest account, and at
+# most two rows are fetched so such duplicates can be reported.
+_login_email = bindparam("email")
+USER_BY_EMAIL = select(User).where(
+    func.lower(User.email) == func.lower(_login_email)
+).order_by((User.email == _login_email).desc(), User.id).limit(2)
+
 
 class AuthService:
     """Service for handling authentication operations"""
 
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        # Long-lived client so provider connections are reused across requests
+        self.http_client = http_client or httpx.AsyncClient(timeout=httpx.Timeout(10.0))
+        
         # OAuth2 Configuration
         self.google_client_id = os.getenv("GOOGLE_CLIENT_ID")
         self.google_client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
@@ -42,25 +58,24 @@ class AuthService:
         db: Session = None
     ) -> Dict[str, Any]:
         """Register a new user with email/password"""
-        # Check if user already exists
-        existing_user = db.query(User).filter(User.email == email).first()
-        if existing_user:
+        # Check email (case-insensitively) and, if provided, username in one round trip
+        taken = func.lower(User.email) == email.lower()
+        if username:
+            taken = or_(taken, User.username == username)
+        existing_emails = db.execute(select(User.email).where(taken)).scalars().all()
+        if email.lower() in {existing.lower() for existing in existing_emails}:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
-        
-        # Check username if provided
-        if username:
-            existing_username = db.query(User).filter(User.username == username).first()
-            if existing_username:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Username already taken"
-                )
+        if existing_emails:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Username already taken"
+            )
         
         # Create new user
-        hashed_password = get_password_hash(password)
+        hashed_password = await get_password_hash_async(password)
         user = User(
             email=email,
             username=username,
@@ -99,7 +114,13 @@ class AuthService:
         db: Session = None
     ) -> Dict[str, Any]:
         """Authenticate user with email/password"""
-        user = db.query(User).filter(User.email == email).first()
+        users = db.execute(USER_BY_EMAIL, {"email": email}).scalars().all()
+        if len(users) > 1:
+            logger.warning(
+                f"Accounts {users[0].id} and {users[1].id} have emails differing only by case; "
+                f"logging in as {users[0].id}"
+            )
+        user = users[0] if users else None
         
         if not user:
             raise HTTPException(
@@ -120,7 +141,12 @@ class AuthService:
                 detail="This account uses social login. Please sign in with your provider."
             )
         
-        if not verify_password(password, user.hashed_password):
+        # Detach the loaded row so callers can reuse it without a refresh after commit,
+        # and hand the pooled connection back while the password hash is checked
+        db.expunge(user)
+        db.rollback()
+        
+        if not await verify_password_async(password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
@@ -128,6 +154,7 @@ class AuthService:
         
         # Update last login
         user.last_login = datetime.utcnow()
+        db.execute(update(User).where(User.id == user.id).values(last_login=user.last_login))
         db.commit()
         
         # Create access token
@@ -143,6 +170,7 @@ class AuthService:
                 "role": user.role.value,
                 "avatar_url": user.avatar_url
             },
+            "user_orm": user,
             "access_token": access_token,
             "token_type": "bearer"
         }
@@ -150,69 +178,69 @@ class AuthService:
     async def verify_google_token(self, token: str, db: Session) -> Dict[str, Any]:
         """Verify Google OAuth token and create/update user"""
         try:
-            async with httpx.AsyncClient() as client:
-                # Verify token with Google
-                response = await client.get(
-                    f"https://www.googleapis.com/oauth2/v2/userinfo",
-                    headers={"Authorization": f"Bearer {token}"}
+            client = self.http_client
+            # Verify token with Google
+            response = await client.get(
+                f"https://www.googleapis.com/oauth2/v2/userinfo",
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            
+            if response.status_code != 200:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid Google token"
                 )
-                
-                if response.status_code != 200:
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="Invalid Google token"
-                    )
-                
-                google_user = response.json()
-                
-                # Check if user exists by email or provider_id
-                user = db.query(User).filter(
-                    (User.email == google_user["email"]) |
-                    ((User.provider_id == google_user["id"]) & (User.auth_provider == AuthProvider.GOOGLE))
-                ).first()
-                
-                if user:
-                    # Update existing user
-                    user.provider_id = google_user["id"]
-                    user.auth_provider = AuthProvider.GOOGLE
-                    user.avatar_url = google_user.get("picture")
-                    user.full_name = google_user.get("name")
-                    user.last_login = datetime.utcnow()
-                    if not user.is_verified:
-                        user.is_verified = True
-                else:
-                    # Create new user
-                    user = User(
-                        email=google_user["email"],
-                        full_name=google_user.get("name"),
-                        auth_provider=AuthProvider.GOOGLE,
-                        provider_id=google_user["id"],
-                        avatar_url=google_user.get("picture"),
-                        is_active=True,
-                        is_verified=True,
-                        role=UserRole.USER
-                    )
-                    db.add(user)
-                
-                db.commit()
-                db.refresh(user)
-                
-                # Create access token
-                access_token = create_access_token(data={"sub": user.id, "email": user.email})
-                
-                return {
-                    "success": True,
-                    "user": {
-                        "id": user.id,
-                        "email": user.email,
-                        "username": user.username,
-                        "full_name": user.full_name,
-                        "role": user.role.value,
-                        "avatar_url": user.avatar_url
-                    },
-                    "access_token": access_token,
-                    "token_type": "bearer"
-                }
+            
+            google_user = response.json()
+            
+            # Check if user exists by email or provider_id
+            user = db.query(User).filter(
+                (User.email == google_user["email"]) |
+                ((User.provider_id == google_user["id"]) & (User.auth_provider == AuthProvider.GOOGLE))
+            ).first()
+            
+            if user:
+                # Update existing user
+                user.provider_id = google_user["id"]
+                user.auth_provider = AuthProvider.GOOGLE
+                user.avatar_url = google_user.get("picture")
+                user.full_name = google_user.get("name")
+                user.last_login = datetime.utcnow()
+                if not user.is_verified:
+                    user.is_verified = True
+            else:
+                # Create new user
+                user = User(
+                    email=google_user["email"],
+                    full_name=google_user.get("name"),
+                    auth_provider=AuthProvider.GOOGLE,
+                    provider_id=google_user["id"],
+                    avatar_url=google_user.get("picture"),
+                    is_active=True,
+                    is_verified=True,
+                    role=UserRole.USER
+                )
+                db.add(user)
+            
+            db.commit()
+            db.refresh(user)
+            
+            # Create access token
+            access_token = create_access_token(data={"sub": user.id, "email": user.email})
+            
+            return {
+                "success": True,
+                "user": {
+                    "id": user.id,
+                    "email": user.email,
+                    "username": user.username,
+                    "full_name": user.full_name,
+                    "role": user.role.value,
+                    "avatar_url": user.avatar_url
+                },
+                "access_token": access_token,
+                "token_type": "bearer"
+            }
         except httpx.RequestError as e:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -222,84 +250,84 @@ class AuthService:
     async def verify_github_token(self, token: str, db: Session) -> Dict[str, Any]:
         """Verify GitHub OAuth token and create/update user"""
         try:
-            async with httpx.AsyncClient() as client:
-                # Get user info from GitHub
-                response = await client.get(
-                    "https://api.github.com/user",
+            client = self.http_client
+            # Get user info from GitHub
+            response = await client.get(
+                "https://api.github.com/user",
+                headers={"Authorization": f"token {token}"}
+            )
+            
+            if response.status_code != 200:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid GitHub token"
+                )
+            
+            github_user = response.json()
+            
+            # Get email if not public
+            email = github_user.get("email")
+            if not email:
+                email_response = await client.get(
+                    "https://api.github.com/user/emails",
                     headers={"Authorization": f"token {token}"}
                 )
-                
-                if response.status_code != 200:
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="Invalid GitHub token"
-                    )
-                
-                github_user = response.json()
-                
-                # Get email if not public
-                email = github_user.get("email")
-                if not email:
-                    email_response = await client.get(
-                        "https://api.github.com/user/emails",
-                        headers={"Authorization": f"token {token}"}
-                    )
-                    if email_response.status_code == 200:
-                        emails = email_response.json()
-                        email = next((e["email"] for e in emails if e.get("primary")), emails[0]["email"] if emails else None)
-                
-                if not email:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="GitHub account email not available"
-                    )
-                
-                # Check if user exists
-                user = db.query(User).filter(
-                    (User.email == email) |
-                    ((User.provider_id == str(github_user["id"])) & (User.auth_provider == AuthProvider.GITHUB))
-                ).first()
-                
-                if user:
-                    user.provider_id = str(github_user["id"])
-                    user.auth_provider = AuthProvider.GITHUB
-                    user.avatar_url = github_user.get("avatar_url")
-                    user.full_name = github_user.get("name")
-                    user.last_login = datetime.utcnow()
-                    if not user.is_verified:
-                        user.is_verified = True
-                else:
-                    user = User(
-                        email=email,
-                        username=github_user.get("login"),
-                        full_name=github_user.get("name"),
-                        auth_provider=AuthProvider.GITHUB,
-                        provider_id=str(github_user["id"]),
-                        avatar_url=github_user.get("avatar_url"),
-                        is_active=True,
-                        is_verified=True,
-                        role=UserRole.USER
-                    )
-                    db.add(user)
-                
-                db.commit()
-                db.refresh(user)
-                
-                access_token = create_access_token(data={"sub": user.id, "email": user.email})
-                
-                return {
-                    "success": True,
-                    "user": {
-                        "id": user.id,
-                        "email": user.email,
-                        "username": user.username,
-                        "full_name": user.full_name,
-                        "role": user.role.value,
-                        "avatar_url": user.avatar_url
-                    },
-                    "access_token": access_token,
-                    "token_type": "bearer"
-                }
+                if email_response.status_code == 200:
+                    emails = email_response.json()
+                    email = next((e["email"] for e in emails if e.get("primary")), emails[0]["email"] if emails else None)
+            
+            if not email:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="GitHub account email not available"
+                )
+            
+            # Check if user exists
+            user = db.query(User).filter(
+                (User.email == email) |
+                ((User.provider_id == str(github_user["id"])) & (User.auth_provider == AuthProvider.GITHUB))
+            ).first()
+            
+            if user:
+                user.provider_id = str(github_user["id"])
+                user.auth_provider = AuthProvider.GITHUB
+                user.avatar_url = github_user.get("avatar_url")
+                user.full_name = github_user.get("name")
+                user.last_login = datetime.utcnow()
+                if not user.is_verified:
+                    user.is_verified = True
+            else:
+                user = User(
+                    email=email,
+                    username=github_user.get("login"),
+                    full_name=github_user.get("name"),
+                    auth_provider=AuthProvider.GITHUB,
+                    provider_id=str(github_user["id"]),
+                    avatar_url=github_user.get("avatar_url"),
+                    is_active=True,
+                    is_verified=True,
+                    role=UserRole.USER
+                )
+                db.add(user)
+            
+            db.commit()
+            db.refresh(user)
+            
+            access_token = create_access_token(data={"sub": user.id, "email": user.email})
+            
+            return {
+                "success": True,
+                "user": {
+                    "id": user.id,
+                    "email": user.email,
+                    "username": user.username,
+                    "full_name": user.full_name,
+                    "role": user.role.value,
+                    "avatar_url": user.avatar_url
+                },
+                "access_token": access_token,
+                "token_type": "bearer"
+            }
         except httpx.RequestError as e:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -370,63 +398,63 @@ class AuthService:
         """Handle Google OAuth callback"""
         redirect_uri = f"{self.base_url}/auth/google/callback"
         
-        async with httpx.AsyncClient() as client:
-            # Exchange code for token
-            token_response = await client.post(
-                "https://oauth2.googleapis.com/token",
-                data={
-                    "code": code,
-                    "client_id": self.google_client_id,
-                    "client_secret": self.google_client_secret,
-                    "redirect_uri": redirect_uri,
-                    "grant_type": "authorization_code"
-                }
+        client = self.http_client
+        # Exchange code for token
+        token_response = await client.post(
+            "https://oauth2.googleapis.com/token",
+            data={
+                "code": code,
+                "client_id": self.google_client_id,
+                "client_secret": self.google_client_secret,
+                "redirect_uri": redirect_uri,
+                "grant_type": "authorization_code"
+            }
+        )
+        
+        if token_response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Failed to exchange Google authorization code"
             )
-            
-            if token_response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Failed to exchange Google authorization code"
-                )
-            
-            token_data = token_response.json()
-            access_token = token_data.get("access_token")
-            
-            # Verify token and get user info
-            return await self.verify_google_token(access_token, db)
+        
+        token_data = token_response.json()
+        access_token = token_data.get("access_token")
+        
+        # Verify token and get user info
+        return await self.verify_google_token(access_token, db)
 
     async def _handle_github_callback(self, code: str, db: Session) -> Dict[str, Any]:
         """Handle GitHub OAuth callback"""
         redirect_uri = f"{self.base_url}/auth/github/callback"
         
-        async with httpx.AsyncClient() as client:
-            # Exchange code for token
-            token_response = await client.post(
-                "https://github.com/login/oauth/access_token",
-                data={
-                    "code": code,
-                    "client_id": self.github_client_id,
-                    "client_secret": self.github_client_secret,
-                    "redirect_uri": redirect_uri
-                },
-                headers={"Accept": "application/json"}
+        client = self.http_client
+        # Exchange code for token
+        token_response = await client.post(
+            "https://github.com/login/oauth/access_token",
+            data={
+                "code": code,
+                "client_id": self.github_client_id,
+                "client_secret": self.github_client_secret,
+                "redirect_uri": redirect_uri
+            },
+            headers={"Accept": "application/json"}
+        )
+        
+        if token_response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Failed to exchange GitHub authorization code"
             )
-            
-            if token_response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Failed to exchange GitHub authorization code"
-                )
-            
-            token_data = token_response.json()
-            access_token = token_data.get("access_token")
-            
-            if not access_token:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Failed to get access token from GitHub"
-                )
-            
-            # Verify token and get user info
-            return await self.verify_github_token(access_token, db)
+        
+        token_data = token_response.json()
+        access_token = token_data.get("access_token")
+        
+        if not access_token:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Failed to get access token from GitHub"
+            )
+        
+        # Verify token and get user info
+        return await self.verify_github_token(access_token, db)
 
@@ -4,11 +4,17 @@ Handles messaging, AI chatbot, translation, and communication features
 """
 import logging
 import json
+import re
 import uuid
+import threading
+from collections import Counter
 from typing import Optional, Dict, List
 from datetime import datetime
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session, raiseload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, and_, case, func, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from models import (
     ChatRoom, ChatParticipant, Message, AIConversation, AIMessage,
@@ -17,6 +23,16 @@ from models import (
 
 logger = logging.getLogger(__name__)
 
+# Forum post views are buffered here and written in batches by the scheduler
+_post_view_lock = threading.Lock()
+_pending_post_views: Counter = Counter()
+
+# Forum post lists carry a content preview; the full text comes from the single-post endpoint
+FORUM_POST_PREVIEW_LENGTH = 300
+
+# Attempts at a unique forum post slug before giving up (the first retry adds a random suffix)
+FORUM_SLUG_ATTEMPTS = 5
+
 
 class CommunicationService:
     """Service for handling all communication features"""
@@ -75,9 +91,9 @@ class CommunicationService:
         
         return {"success": True, "room": room, "existing": False}
     
-    async def get_user_chat_rooms(self, user_id: int, db: Session) -> List[ChatRoom]:
+    def get_user_chat_rooms(self, user_id: int, db: Session) -> List[ChatRoom]:
         """Get all chat rooms for a user"""
-        rooms = db.query(ChatRoom).join(ChatParticipant).filter(
+        rooms = db.query(ChatRoom).options(raiseload("*")).join(ChatParticipant).filter(
             ChatParticipant.user_id == user_id
         ).order_by(ChatRoom.updated_at.desc()).all()
         return rooms
@@ -137,33 +153,41 @@ class CommunicationService:
         user_id: int,
         limit: int = 50,
         offset: int = 0,
-        db: Session = None
+        db: AsyncSession = None
     ) -> Dict:
         """Get messages from a chat room"""
         # Verify user is participant
-        participant = db.query(ChatParticipant).filter(
-            and_(
+        participant = (await db.execute(
+            select(ChatParticipant).where(
                 ChatParticipant.room_id == room_id,
                 ChatParticipant.user_id == user_id
             )
-        ).first()
+        )).scalar_one_or_none()
         
         if not participant:
             return {"success": False, "error": "Not a participant in this room", "messages": []}
         
-        messages = db.query(Message).filter(
+        page_ids = select(Message.id).where(
             Message.room_id == room_id
-        ).order_by(Message.created_at.desc()).offset(offset).limit(limit).all()
-        
-        # Mark messages as read
-        unread_ids = [m.id for m in messages if not m.is_read and m.sender_id != user_id]
-        if unread_ids:
-            db.query(Message).filter(Message.id.in_(unread_ids)).update(
-                {"is_read": True, "read_at": datetime.utcnow()},
-                synchronize_session=False
-            )
+        ).order_by(Message.created_at.desc()).offset(offset).limit(limit)
+        
+        # Mark the page's messages as read before loading it
+        marked = await db.execute(
+            update(Message).where(
+                Message.id.in_(page_ids),
+                Message.is_read == False,
+                or_(Message.sender_id.is_(None), Message.sender_id != user_id)
+            ).values(is_read=True, read_at=datetime.utcnow()).execution_options(synchronize_session=False)
+        )
+        if marked.rowcount:
             participant.last_read_at = datetime.utcnow()
-            db.commit()
+            await db.commit()
+        
+        messages = (await db.execute(
+            select(Message).options(selectinload(Message.sender), raiseload("*")).where(
+                Message.room_id == room_id
+            ).order_by(Message.created_at.desc()).offset(offset).limit(limit)
+        )).scalars().all()
         
         return {"success": True, "messages": list(reversed(messages))}
     
@@ -263,7 +287,7 @@ class CommunicationService:
         if not conversation:
             return []
         
-        return db.query(AIMessage).filter(
+        return db.query(AIMessage).options(raiseload("*")).filter(
             AIMessage.conversation_id == conversation.id
         ).order_by(AIMessage.created_at.asc()).all()
     
@@ -463,13 +487,15 @@ class CommunicationService:
     
     # ========== FORUMS ==========
     
-    async def get_forum_categories(self, db: Session) -> List[ForumCategory]:
+    async def get_forum_categories(self, db: AsyncSession) -> List[ForumCategory]:
         """Get all active forum categories"""
-        return db.query(ForumCategory).filter(
-            ForumCategory.is_active == True
-        ).order_by(ForumCategory.order.asc()).all()
+        return (await db.execute(
+            select(ForumCategory).options(raiseload("*")).where(
+                ForumCategory.is_active == True
+            ).order_by(ForumCategory.order.asc())
+        )).scalars().all()
     
-    async def create_forum_post(
+    def create_forum_post(
         self,
         category_id: int,
         author_id: int,
@@ -478,43 +504,116 @@ class CommunicationService:
         db: Session = None
     ) -> Dict:
         """Create a forum post"""
-        import re
         # Simple slug generation
-        slug = re.sub(r'[^\w\s-]', '', title.lower())
-        slug = re.sub(r'[-\s]+', '-', slug)
-        
-        post = ForumPost(
-            category_id=category_id,
-            author_id=author_id,
-            title=title,
-            content=content,
-            slug=slug
+        base_slug = re.sub(r'[^\w\s-]', '', title.lower())
+        base_slug = re.sub(r'[-\s]+', '-', base_slug)
+        
+        # The unique slug index does the duplicate check: ON CONFLICT DO NOTHING returns
+        # no id on a clash, and only then is a suffixed slug tried
+        insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        slug = base_slug
+        post_id = None
+        for _ in range(FORUM_SLUG_ATTEMPTS):
+            post_id = db.execute(
+                insert(ForumPost).values(
+                    category_id=category_id,
+                    author_id=author_id,
+                    title=title,
+                    content=content,
+                    slug=slug
+                ).on_conflict_do_nothing(index_elements=["slug"]).returning(ForumPost.id)
+            ).scalar_one_or_none()
+            if post_id is not None:
+                break
+            slug = f"{base_slug}-{uuid.uuid4().hex[:6]}"
+        
+        if post_id is None:
+            db.rollback()
+            return {"success": False, "error": "Could not generate a unique slug"}
+        
+        db.query(ForumCategory).filter(ForumCategory.id == category_id).update(
+            {"post_count": ForumCategory.post_count + 1},
+            synchronize_session=False
         )
-        db.add(post)
         db.commit()
-        db.refresh(post)
         
-        return {"success": True, "post": post}
+        return {"success": True, "post": db.get(ForumPost, post_id)}
     
     async def get_forum_posts(
         self,
         category_id: Optional[int] = None,
         limit: int = 20,
         offset: int = 0,
-        db: Session = None
-    ) -> List[ForumPost]:
-        """Get forum posts"""
-        query = db.query(ForumPost)
+        db: AsyncSession = None
+    ) -> List:
+        """Get forum posts as column rows, with the author email joined in and content truncated"""
+        stmt = self._forum_post_select(func.substr(ForumPost.content, 1, FORUM_POST_PREVIEW_LENGTH))
         
         if category_id:
-            query = query.filter(ForumPost.category_id == category_id)
+            stmt = stmt.where(ForumPost.category_id == category_id)
         
-        return query.order_by(
+        stmt = stmt.order_by(
             ForumPost.is_pinned.desc(),
             ForumPost.created_at.desc()
-        ).offset(offset).limit(limit).all()
+        ).offset(offset).limit(limit)
+        return (await db.execute(stmt)).all()
+    
+    async def get_forum_post(self, post_id: int, db: AsyncSession):
+        """Get a single forum post row, with the author email joined in"""
+        return (await db.execute(
+            self._forum_post_select(ForumPost.content).where(ForumPost.id == post_id)
+        )).one_or_none()
+    
+    def _forum_post_select(self, content):
+        """Columns returned for forum posts, with content supplied by the caller"""
+        return select(
+            ForumPost.id,
+            ForumPost.category_id,
+            ForumPost.author_id,
+            User.email.label("author_email"),
+            ForumPost.title,
+            content.label("content"),
+            ForumPost.slug,
+            ForumPost.is_pinned,
+            ForumPost.is_locked,
+            ForumPost.view_count,
+            ForumPost.reply_count,
+            ForumPost.last_reply_at,
+            ForumPost.created_at
+        ).outerjoin(User, User.id == ForumPost.author_id)
+    
+    def record_post_view(self, post_id: int):
+        """Buffer a forum post view; written by flush_post_views"""
+        with _post_view_lock:
+            _pending_post_views[post_id] += 1
     
-    async def create_forum_reply(
+    def pending_post_views(self, post_id: int) -> int:
+        """Views recorded for a post that are not yet written to the database"""
+        return _pending_post_views.get(post_id, 0)
+    
+    def flush_post_views(self, db: Session) -> int:
+        """Write buffered post views with a single UPDATE; returns the number of posts touched"""
+        global _pending_post_views
+        with _post_view_lock:
+            pending, _pending_post_views = _pending_post_views, Counter()
+        if not pending:
+            return 0
+        
+        try:
+            db.query(ForumPost).filter(ForumPost.id.in_(list(pending))).update(
+                {ForumPost.view_count: ForumPost.view_count + case(dict(pending), value=ForumPost.id, else_=0)},
+                synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the views back so they are retried on the next flush
+            with _post_view_lock:
+                _pending_post_views.update(pending)
+            raise
+        return len(pending)
+    
+    def create_forum_reply(
         self,
         post_id: int,
         author_id: int,
@@ -531,11 +630,11 @@ class CommunicationService:
         )
         db.add(reply)
         
-        # Update post reply count and last reply time
-        post = db.query(ForumPost).filter(ForumPost.id == post_id).first()
-        if post:
-            post.reply_count = (post.reply_count or 0) + 1
-            post.last_reply_at = datetime.utcnow()
+        # Update post reply count and last reply time in the same transaction
+        db.query(ForumPost).filter(ForumPost.id == post_id).update(
+            {"reply_count": ForumPost.reply_count + 1, "last_reply_at": datetime.utcnow()},
+            synchronize_session=False
+        )
         
         db.commit()
         db.refresh(reply)
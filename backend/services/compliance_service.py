@@ -7,18 +7,23 @@ Provides tools for:
 - Consent management
 - Data portability
 """
-import json
+import csv
 import logging
+import orjson
+from io import StringIO
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, Iterator, List, Optional, Any, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, func, select
 
-from models import User, Booking, Payment, Invoice, Feedback
+from models import User, Booking, Payment, Invoice, Feedback, Tour, ForumCategory, ForumPost, ForumReply
 from services.encryption_service import get_encryption_service
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched per round trip when streaming exports
+EXPORT_BATCH_SIZE = 500
+
 
 class ComplianceService:
     """Service for GDPR/CCPA compliance operations"""
@@ -43,93 +48,9 @@ class ComplianceService:
                 raise ValueError(f"User {user_id} not found")
             
             # Collect all user data
-            data = {
-                "export_date": datetime.utcnow().isoformat(),
-                "user_id": user.id,
-                "user_uuid": str(user.uuid),
-                "profile": {
-                    "email": user.email,
-                    "username": user.username,
-                    "full_name": user.full_name,
-                    "phone_number": user.phone_number,
-                    "avatar_url": user.avatar_url,
-                    "role": user.role.value if hasattr(user.role, 'value') else str(user.role),
-                    "auth_provider": user.auth_provider.value if hasattr(user.auth_provider, 'value') else str(user.auth_provider),
-                    "is_active": user.is_active,
-                    "is_verified": user.is_verified,
-                    "created_at": user.created_at.isoformat() if user.created_at else None,
-                    "updated_at": user.updated_at.isoformat() if user.updated_at else None,
-                    "last_login": user.last_login.isoformat() if user.last_login else None,
-                },
-                "bookings": [],
-                "payments": [],
-                "invoices": [],
-                "feedback": []
-            }
-            
-            # Get bookings
-            bookings = db.query(Booking).filter(Booking.user_id == user_id).all()
-            for booking in bookings:
-                booking_data = {
-                    "id": booking.id,
-                    "tour_id": booking.tour_id,
-                    "booking_date": booking.booking_date.isoformat() if booking.booking_date else None,
-                    "status": booking.status.value if hasattr(booking.status, 'value') else str(booking.status),
-                    "notes": booking.notes,
-                    "created_at": booking.created_at.isoformat() if booking.created_at else None,
-                    "updated_at": booking.updated_at.isoformat() if booking.updated_at else None,
-                }
-                if booking.tour:
-                    booking_data["tour_name"] = booking.tour.name
-                    booking_data["tour_location"] = booking.tour.location
-                data["bookings"].append(booking_data)
-            
-            # Get payments
-            payments = db.query(Payment).join(Booking).filter(Booking.user_id == user_id).all()
-            for payment in payments:
-                payment_data = {
-                    "id": payment.id,
-                    "booking_id": payment.booking_id,
-                    "amount": payment.amount,
-                    "payment_method": payment.payment_method.value if hasattr(payment.payment_method, 'value') else str(payment.payment_method),
-                    "status": payment.status.value if hasattr(payment.status, 'value') else str(payment.status),
-                    "transaction_id": payment.transaction_id,
-                    "created_at": payment.created_at.isoformat() if payment.created_at else None,
-                    "completed_at": payment.completed_at.isoformat() if payment.completed_at else None,
-                }
-                data["payments"].append(payment_data)
-            
-            # Get invoices
-            invoices = db.query(Invoice).filter(Invoice.user_id == user_id).all()
-            for invoice in invoices:
-                invoice_data = {
-                    "id": invoice.id,
-                    "invoice_number": invoice.invoice_number,
-                    "amount": invoice.amount,
-                    "tax_amount": invoice.tax_amount,
-                    "total_amount": invoice.total_amount,
-                    "currency": invoice.currency,
-                    "status": invoice.status,
-                    "due_date": invoice.due_date.isoformat() if invoice.due_date else None,
-                    "paid_at": invoice.paid_at.isoformat() if invoice.paid_at else None,
-                    "created_at": invoice.created_at.isoformat() if invoice.created_at else None,
-                }
-                data["invoices"].append(invoice_data)
-            
-            # Get feedback
-            feedbacks = db.query(Feedback).filter(Feedback.user_id == user_id).all()
-            for feedback in feedbacks:
-                feedback_data = {
-                    "id": feedback.id,
-                    "feedback_type": feedback.feedback_type,
-                    "subject": feedback.subject,
-                    "message": feedback.message,
-                    "rating": feedback.rating,
-                    "status": feedback.status,
-                    "created_at": feedback.created_at.isoformat() if feedback.created_at else None,
-                    "admin_response": feedback.admin_response,
-                }
-                data["feedback"].append(feedback_data)
+            data = self._export_header(user)
+            for section, stmt, serialize in self._export_sections(user_id):
+                data[section] = [serialize(*row) for row in db.execute(stmt)]
             
             return {
                 "success": True,
@@ -144,6 +65,100 @@ class ComplianceService:
                 "error": str(e)
             }
     
+    def _export_header(self, user: User) -> Dict[str, Any]:
+        """Top-level export fields and profile"""
+        return {
+            "export_date": datetime.utcnow().isoformat(),
+            "user_id": user.id,
+            "user_uuid": str(user.uuid),
+            "profile": {
+                "email": user.email,
+                "username": user.username,
+                "full_name": user.full_name,
+                "phone_number": user.phone_number,
+                "avatar_url": user.avatar_url,
+                "role": user.role.value,
+                "auth_provider": user.auth_provider.value,
+                "is_active": user.is_active,
+                "is_verified": user.is_verified,
+                "created_at": user.created_at.isoformat() if user.created_at else None,
+                "updated_at": user.updated_at.isoformat() if user.updated_at else None,
+                "last_login": user.last_login.isoformat() if user.last_login else None,
+            }
+        }
+    
+    def _export_sections(self, user_id: int) -> List[Tuple[str, Any, Callable[..., Dict[str, Any]]]]:
+        """(section name, select statement, row serializer) for each exported collection"""
+        return [
+            (
+                "bookings",
+                select(Booking, Tour.name, Tour.location)
+                .outerjoin(Tour, Tour.id == Booking.tour_id)
+                .where(Booking.user_id == user_id),
+                self._export_booking
+            ),
+            (
+                "payments",
+                select(Payment).join(Booking, Booking.id == Payment.booking_id).where(Booking.user_id == user_id),
+                self._export_payment
+            ),
+            ("invoices", select(Invoice).where(Invoice.user_id == user_id), self._export_invoice),
+            ("feedback", select(Feedback).where(Feedback.user_id == user_id), self._export_feedback),
+        ]
+    
+    def _export_booking(self, booking: Booking, tour_name: Optional[str], tour_location: Optional[str]) -> Dict[str, Any]:
+        booking_data = {
+            "id": booking.id,
+            "tour_id": booking.tour_id,
+            "booking_date": booking.booking_date.isoformat() if booking.booking_date else None,
+            "status": booking.status.value,
+            "notes": booking.notes,
+            "created_at": booking.created_at.isoformat() if booking.created_at else None,
+            "updated_at": booking.updated_at.isoformat() if booking.updated_at else None,
+        }
+        if tour_name is not None:
+            booking_data["tour_name"] = tour_name
+            booking_data["tour_location"] = tour_location
+        return booking_data
+    
+    def _export_payment(self, payment: Payment) -> Dict[str, Any]:
+        return {
+            "id": payment.id,
+            "booking_id": payment.booking_id,
+            "amount": payment.amount,
+            "payment_method": payment.payment_method.value,
+            "status": payment.status.value,
+            "transaction_id": payment.transaction_id,
+            "created_at": payment.created_at.isoformat() if payment.created_at else None,
+            "completed_at": payment.completed_at.isoformat() if payment.completed_at else None,
+        }
+    
+    def _export_invoice(self, invoice: Invoice) -> Dict[str, Any]:
+        return {
+            "id": invoice.id,
+            "invoice_number": invoice.invoice_number,
+            "amount": invoice.amount,
+            "tax_amount": invoice.tax_amount,
+            "total_amount": invoice.total_amount,
+            "currency": invoice.currency,
+            "status": invoice.status,
+            "due_date": invoice.due_date.isoformat() if invoice.due_date else None,
+            "paid_at": invoice.paid_at.isoformat() if invoice.paid_at else None,
+            "created_at": invoice.created_at.isoformat() if invoice.created_at else None,
+        }
+    
+    def _export_feedback(self, feedback: Feedback) -> Dict[str, Any]:
+        return {
+            "id": feedback.id,
+            "feedback_type": feedback.feedback_type,
+            "subject": feedback.subject,
+            "message": feedback.message,
+            "rating": feedback.rating,
+            "status": feedback.status,
+            "created_at": feedback.created_at.isoformat() if feedback.created_at else None,
+            "admin_response": feedback.admin_response,
+        }
+    
     def delete_user_data(self, user_id: int, db: Session, anonymize: bool = True) -> Dict[str, Any]:
         """
         Delete or anonymize user data (GDPR Right to be Forgotten)
@@ -209,6 +224,25 @@ class ComplianceService:
                 feedbacks = db.query(Feedback).filter(Feedback.user_id == user_id).all()
                 deleted_items["feedback"] = len(feedbacks)
                 
+                # The ORM cascade removes the user's forum posts and replies without touching the
+                # denormalized counters, so take them off per category / per post first
+                post_counts = db.query(ForumPost.category_id, func.count(ForumPost.id)).filter(
+                    ForumPost.author_id == user_id
+                ).group_by(ForumPost.category_id).all()
+                for category_id, count in post_counts:
+                    db.query(ForumCategory).filter(ForumCategory.id == category_id).update(
+                        {"post_count": ForumCategory.post_count - count},
+                        synchronize_session=False
+                    )
+                reply_counts = db.query(ForumReply.post_id, func.count(ForumReply.id)).filter(
+                    ForumReply.author_id == user_id
+                ).group_by(ForumReply.post_id).all()
+                for post_id, count in reply_counts:
+                    db.query(ForumPost).filter(ForumPost.id == post_id).update(
+                        {"reply_count": ForumPost.reply_count - count},
+                        synchronize_session=False
+                    )
+                
                 # Delete user (cascade will handle related records)
                 db.delete(user)
                 db.commit()
@@ -231,44 +265,68 @@ class ComplianceService:
     
     def export_data_json(self, user_id: int, db: Session) -> str:
         """Export user data as JSON string"""
-        result = self.export_user_data(user_id, db)
-        if result["success"]:
-            return json.dumps(result["data"], indent=2)
-        else:
-            raise ValueError(result.get("error", "Export failed"))
+        return b"".join(self.export_data_json_stream(user_id, db)).decode()
+    
+    def export_data_json_stream(self, user_id: int, db: Session) -> Iterator[bytes]:
+        """Export user data as a JSON document, streamed section by section"""
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise ValueError(f"User {user_id} not found")
+        
+        # Leave the top-level object open so the collections can be appended to it
+        yield orjson.dumps(self._export_header(user))[:-1]
+        for section, stmt, serialize in self._export_sections(user_id):
+            yield b',"' + section.encode() + b'":['
+            separator = b""
+            for partition in db.execute(stmt).yield_per(EXPORT_BATCH_SIZE).partitions():
+                yield separator + b",".join(orjson.dumps(serialize(*row)) for row in partition)
+                separator = b","
+            yield b"]"
+        yield b"}"
     
     def export_data_csv(self, user_id: int, db: Session) -> str:
         """Export user data as CSV (simplified)"""
-        import csv
-        from io import StringIO
-        
-        result = self.export_user_data(user_id, db)
-        if not result["success"]:
-            raise ValueError(result.get("error", "Export failed"))
+        return "".join(self.export_data_csv_stream(user_id, db))
+    
+    def export_data_csv_stream(self, user_id: int, db: Session) -> Iterator[str]:
+        """Export user data as CSV (simplified), one chunk per batch of bookings"""
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise ValueError(f"User {user_id} not found")
         
-        data = result["data"]
         output = StringIO()
+        writer = csv.writer(output)
+        
+        def drain() -> str:
+            chunk = output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+            return chunk
         
         # Write profile data
-        writer = csv.writer(output)
         writer.writerow(["Data Type", "Field", "Value"])
-        writer.writerow(["Profile", "Email", data["profile"]["email"]])
-        writer.writerow(["Profile", "Username", data["profile"]["username"]])
-        writer.writerow(["Profile", "Full Name", data["profile"]["full_name"]])
+        writer.writerow(["Profile", "Email", user.email])
+        writer.writerow(["Profile", "Username", user.username])
+        writer.writerow(["Profile", "Full Name", user.full_name])
         
         # Write bookings
         writer.writerow([])
         writer.writerow(["Bookings"])
         writer.writerow(["ID", "Tour ID", "Booking Date", "Status"])
-        for booking in data["bookings"]:
-            writer.writerow([
-                booking["id"],
-                booking["tour_id"],
-                booking["booking_date"],
-                booking["status"]
-            ])
+        yield drain()
         
-        return output.getvalue()
+        stmt = select(Booking.id, Booking.tour_id, Booking.booking_date, Booking.status).where(
+            Booking.user_id == user_id
+        )
+        for partition in db.execute(stmt).yield_per(EXPORT_BATCH_SIZE).partitions():
+            for booking_id, tour_id, booking_date, status in partition:
+                writer.writerow([
+                    booking_id,
+                    tour_id,
+                    booking_date.isoformat() if booking_date else None,
+                    status.value
+                ])
+            yield drain()
     
     def get_consent_status(self, user_id: int, db: Session) -> Dict[str, Any]:
         """Get user consent status for data processing"""
@@ -1,9 +1,11 @@
 from sqlalchemy.orm import Session
 from models import Payment, Booking, Tour
-from typing import Optional, Dict, Any
+from services.verification_cache import verification_key, get_verified, remember_verified
+from typing import Optional, Dict, Any, List
 import os
 import logging
 import httpx
+import asyncio
 from decimal import Decimal
 
 logger = logging.getLogger(__name__)
@@ -16,6 +18,15 @@ class CryptoService:
         self.ethereum_rpc_url = os.getenv("ETHEREUM_RPC_URL", "https://eth-sepolia.g.alchemy.com/v2/demo")
         self.payment_wallet_btc = os.getenv("PAYMENT_WALLET_BTC")
         self.payment_wallet_eth = os.getenv("PAYMENT_WALLET_ETH")
+        # Shared client so block explorer / RPC connections are kept alive across requests
+        self.http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+        )
+
+    async def close(self):
+        """Close the shared HTTP client"""
+        await self.http_client.aclose()
 
     async def get_bitcoin_payment_address(self) -> Dict[str, Any]:
         """Get Bitcoin payment address"""
@@ -47,69 +58,86 @@ class CryptoService:
         user_email: Optional[str] = None,
         db: Session = None
     ) -> Dict[str, Any]:
-        """Verify a Bitcoin payment transaction"""
+        """Verify a Bitcoin payment transaction (successful results are cached)"""
+        key = verification_key("bitcoin", tx_hash, amount, tour_id)
+        cached = get_verified(key)
+        if cached is not None:
+            return cached
+        result = await self._verify_bitcoin_payment(tx_hash, amount, tour_id, user_email, db)
+        remember_verified(key, result)
+        return result
+
+    async def _verify_bitcoin_payment(
+        self,
+        tx_hash: str,
+        amount: float,
+        tour_id: int,
+        user_email: Optional[str] = None,
+        db: Session = None
+    ) -> Dict[str, Any]:
+        """Verify a Bitcoin payment transaction against the chain"""
         try:
-            async with httpx.AsyncClient() as client:
-                # Get transaction details from block explorer
-                response = await client.get(
-                    f"{self.bitcoin_api_url}/tx/{tx_hash}"
-                )
-                
-                if response.status_code != 200:
-                    return {"success": False, "message": "Transaction not found"}
-
-                tx_data = response.json()
-                
-                # Verify transaction is confirmed
-                if tx_data.get("status", {}).get("block_height") is None:
-                    return {"success": False, "message": "Transaction not confirmed"}
-
-                # Get tour
-                tour = db.query(Tour).filter(Tour.id == tour_id).first()
-                if not tour:
-                    return {"success": False, "message": "Tour not found"}
-
-                # Check if payment already processed
-                existing_payment = db.query(Payment).filter(
-                    Payment.transaction_id == tx_hash
-                ).first()
-
-                if existing_payment:
-                    return {
-                        "success": True,
-                        "message": "Payment already processed",
-                        "payment_id": existing_payment.id
-                    }
+            client = self.http_client
+            # Get transaction details from block explorer
+            response = await client.get(
+                f"{self.bitcoin_api_url}/tx/{tx_hash}"
+            )
+            
+            if response.status_code != 200:
+                return {"success": False, "message": "Transaction not found"}
 
-                # Create booking
-                booking = Booking(
-                    tour_id=tour_id,
-                    user_email=user_email,
-                    status="confirmed"
-                )
-                db.add(booking)
-                db.commit()
-                db.refresh(booking)
-
-                # Create payment record
-                payment = Payment(
-                    booking_id=booking.id,
-                    amount=amount,
-                    payment_method="bitcoin",
-                    transaction_id=tx_hash,
-                    status="completed"
-                )
-                db.add(payment)
-                db.commit()
-                db.refresh(payment)
+            tx_data = response.json()
+            
+            # Verify transaction is confirmed
+            if tx_data.get("status", {}).get("block_height") is None:
+                return {"success": False, "message": "Transaction not confirmed"}
+
+            # Get tour
+            tour = db.query(Tour).filter(Tour.id == tour_id).first()
+            if not tour:
+                return {"success": False, "message": "Tour not found"}
 
+            # Check if payment already processed
+            existing_payment = db.query(Payment).filter(
+                Payment.transaction_id == tx_hash
+            ).first()
+
+            if existing_payment:
                 return {
                     "success": True,
-                    "booking_id": booking.id,
-                    "payment_id": payment.id,
-                    "transaction_id": tx_hash,
-                    "message": "Bitcoin payment verified and booking confirmed"
+                    "message": "Payment already processed",
+                    "payment_id": existing_payment.id
                 }
+
+            # Create booking
+            booking = Booking(
+                tour_id=tour_id,
+                user_email=user_email,
+                status="confirmed"
+            )
+            db.add(booking)
+            db.commit()
+            db.refresh(booking)
+
+            # Create payment record
+            payment = Payment(
+                booking_id=booking.id,
+                amount=amount,
+                payment_method="bitcoin",
+                transaction_id=tx_hash,
+                status="completed"
+            )
+            db.add(payment)
+            db.commit()
+            db.refresh(payment)
+
+            return {
+                "success": True,
+                "booking_id": booking.id,
+                "payment_id": payment.id,
+                "transaction_id": tx_hash,
+                "message": "Bitcoin payment verified and booking confirmed"
+            }
         except Exception as e:
             logger.error(f"Bitcoin payment verification error: {str(e)}")
             return {"success": False, "message": str(e)}
@@ -122,78 +150,95 @@ class CryptoService:
         user_email: Optional[str] = None,
         db: Session = None
     ) -> Dict[str, Any]:
-        """Verify an Ethereum payment transaction"""
+        """Verify an Ethereum payment transaction (successful results are cached)"""
+        key = verification_key("ethereum", tx_hash, amount, tour_id)
+        cached = get_verified(key)
+        if cached is not None:
+            return cached
+        result = await self._verify_ethereum_payment(tx_hash, amount, tour_id, user_email, db)
+        remember_verified(key, result)
+        return result
+
+    async def _verify_ethereum_payment(
+        self,
+        tx_hash: str,
+        amount: float,
+        tour_id: int,
+        user_email: Optional[str] = None,
+        db: Session = None
+    ) -> Dict[str, Any]:
+        """Verify an Ethereum payment transaction against the chain"""
         try:
             # Use Ethereum RPC to get transaction receipt
-            async with httpx.AsyncClient() as client:
-                payload = {
-                    "jsonrpc": "2.0",
-                    "method": "eth_getTransactionReceipt",
-                    "params": [tx_hash],
-                    "id": 1
-                }
-                response = await client.post(self.ethereum_rpc_url, json=payload)
-                
-                if response.status_code != 200:
-                    return {"success": False, "message": "Failed to fetch transaction"}
-
-                result = response.json()
-                
-                if not result.get("result"):
-                    return {"success": False, "message": "Transaction not found"}
-
-                receipt = result["result"]
-                
-                # Check if transaction was successful
-                if receipt.get("status") != "0x1":
-                    return {"success": False, "message": "Transaction failed"}
-
-                # Get tour
-                tour = db.query(Tour).filter(Tour.id == tour_id).first()
-                if not tour:
-                    return {"success": False, "message": "Tour not found"}
-
-                # Check if payment already processed
-                existing_payment = db.query(Payment).filter(
-                    Payment.transaction_id == tx_hash
-                ).first()
-
-                if existing_payment:
-                    return {
-                        "success": True,
-                        "message": "Payment already processed",
-                        "payment_id": existing_payment.id
-                    }
+            client = self.http_client
+            payload = {
+                "jsonrpc": "2.0",
+                "method": "eth_getTransactionReceipt",
+                "params": [tx_hash],
+                "id": 1
+            }
+            response = await client.post(self.ethereum_rpc_url, json=payload)
+            
+            if response.status_code != 200:
+                return {"success": False, "message": "Failed to fetch transaction"}
 
-                # Create booking
-                booking = Booking(
-                    tour_id=tour_id,
-                    user_email=user_email,
-                    status="confirmed"
-                )
-                db.add(booking)
-                db.commit()
-                db.refresh(booking)
-
-                # Create payment record
-                payment = Payment(
-                    booking_id=booking.id,
-                    amount=amount,
-                    payment_method="ethereum",
-                    transaction_id=tx_hash,
-                    status="completed"
-                )
-                db.add(payment)
-                db.commit()
-                db.refresh(payment)
+            result = response.json()
+            
+            if not result.get("result"):
+                return {"success": False, "message": "Transaction not found"}
+
+            receipt = result["result"]
+            
+            # Check if transaction was successful
+            if receipt.get("status") != "0x1":
+                return {"success": False, "message": "Transaction failed"}
+
+            # Get tour
+            tour = db.query(Tour).filter(Tour.id == tour_id).first()
+            if not tour:
+                return {"success": False, "message": "Tour not found"}
+
+            # Check if payment already processed
+            existing_payment = db.query(Payment).filter(
+                Payment.transaction_id == tx_hash
+            ).first()
 
+            if existing_payment:
                 return {
                     "success": True,
-                    "booking_id": booking.id,
-                    "payment_id": payment.id,
-                    "transaction_id": tx_hash,
-                    "message": "Ethereum payment verified and booking confirmed"
+                    "message": "Payment already processed",
+                    "payment_id": existing_payment.id
                 }
+
+            # Create booking
+            booking = Booking(
+                tour_id=tour_id,
+                user_email=user_email,
+                status="confirmed"
+            )
+            db.add(booking)
+            db.commit()
+            db.refresh(booking)
+
+            # Create payment record
+            payment = Payment(
+                booking_id=booking.id,
+                amount=amount,
+                payment_method="ethereum",
+                transaction_id=tx_hash,
+                status="completed"
+            )
+            db.add(payment)
+            db.commit()
+            db.refresh(payment)
+
+            return {
+                "success": True,
+                "booking_id": booking.id,
+                "payment_id": payment.id,
+                "transaction_id": tx_hash,
+                "message": "Ethereum payment verified and booking confirmed"
+            }
         except Exception as e:
             logger.error(f"Ethereum payment verification error: {str(e)}")
             return {"success": False, "message": str(e)}
@@ -206,36 +251,83 @@ class CryptoService:
         """Check the status of a cryptocurrency payment"""
         try:
             if currency.lower() == "btc":
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(
-                        f"{self.bitcoin_api_url}/tx/{tx_hash}"
-                    )
-                    if response.status_code == 200:
-                        tx_data = response.json()
+                client = self.http_client
+                response = await client.get(
+                    f"{self.bitcoin_api_url}/tx/{tx_hash}"
+                )
+                if response.status_code == 200:
+                    tx_data = response.json()
+                    return {
+                        "success": True,
+                        "status": "confirmed" if tx_data.get("status", {}).get("block_height") else "pending",
+                        "confirmations": tx_data.get("status", {}).get("block_height", 0)
+                    }
+            elif currency.lower() in ["eth", "ethereum"]:
+                client = self.http_client
+                payload = {
+                    "jsonrpc": "2.0",
+                    "method": "eth_getTransactionReceipt",
+                    "params": [tx_hash],
+                    "id": 1
+                }
+                response = await client.post(self.ethereum_rpc_url, json=payload)
+                if response.status_code == 200:
+                    result = response.json()
+                    if result.get("result"):
                         return {
                             "success": True,
-                            "status": "confirmed" if tx_data.get("status", {}).get("block_height") else "pending",
-                            "confirmations": tx_data.get("status", {}).get("block_height", 0)
+                            "status": "confirmed" if result["result"].get("status") == "0x1" else "failed"
                         }
-            elif currency.lower() in ["eth", "ethereum"]:
-                async with httpx.AsyncClient() as client:
-                    payload = {
-                        "jsonrpc": "2.0",
-                        "method": "eth_getTransactionReceipt",
-                        "params": [tx_hash],
-                        "id": 1
-                    }
-                    response = await client.post(self.ethereum_rpc_url, json=payload)
-                    if response.status_code == 200:
-                        result = response.json()
-                        if result.get("result"):
-                            return {
-                                "success": True,
-                                "status": "confirmed" if result["result"].get("status") == "0x1" else "failed"
-                            }
             
             return {"success": False, "message": "Transaction not found"}
         except Exception as e:
             logger.error(f"Error checking crypto payment status: {str(e)}")
             return {"success": False, "message": str(e)}
 
+    async def check_statuses_batch(
+        self,
+        tx_hashes: List[str],
+        currency: str
+    ) -> List[Dict[str, Any]]:
+        """Check the status of several payments for one currency, preserving input order"""
+        if currency.lower() in ["eth", "ethereum"]:
+            return await self._check_ethereum_statuses_batch(tx_hashes)
+        # The block explorer has no batch endpoint; reuse pooled connections concurrently instead
+        return list(await asyncio.gather(
+            *(self.check_crypto_payment_status(tx_hash, currency) for tx_hash in tx_hashes)
+        ))
+
+    async def _check_ethereum_statuses_batch(self, tx_hashes: List[str]) -> List[Dict[str, Any]]:
+        """Fetch several Ethereum receipts in a single JSON-RPC batch request"""
+        if not tx_hashes:
+            return []
+        try:
+            payload = [
+                {
+                    "jsonrpc": "2.0",
+                    "method": "eth_getTransactionReceipt",
+                    "params": [tx_hash],
+                    "id": index
+                }
+                for index, tx_hash in enumerate(tx_hashes)
+            ]
+            response = await self.http_client.post(self.ethereum_rpc_url, json=payload)
+            if response.status_code != 200:
+                return [{"success": False, "message": "Failed to fetch transaction"} for _ in tx_hashes]
+
+            # Batch responses may come back in any order
+            receipts = {item.get("id"): item.get("result") for item in response.json()}
+            results = []
+            for index in range(len(tx_hashes)):
+                receipt = receipts.get(index)
+                if receipt:
+                    results.append({
+                        "success": True,
+                        "status": "confirmed" if receipt.get("status") == "0x1" else "failed"
+                    })
+                else:
+                    results.append({"success": False, "message": "Transaction not found"})
+            return results
+        except Exception as e:
+            logger.error(f"Error checking crypto payment statuses: {str(e)}")
+            return [{"success": False, "message": str(e)} for _ in tx_hashes]
@@ -6,13 +6,26 @@ Handles user invitations and onboarding workflows.
 import os
 import secrets
 import uuid
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from datetime import datetime, timedelta
 
 from models import User, Invitation, InvitationStatus, UserRole, AuthProvider
-from auth import get_password_hash
+from auth import get_password_hash_async
+
+
+def serialize_invitation(inv: Invitation) -> Dict[str, Any]:
+    """API representation of an invitation (never includes its token)"""
+    return {
+        "id": inv.id,
+        "email": inv.email,
+        "role": inv.role.value,
+        "status": inv.status.value,
+        "expires_at": inv.expires_at.isoformat(),
+        "accepted_at": inv.accepted_at.isoformat() if inv.accepted_at else None,
+        "created_at": inv.created_at.isoformat()
+    }
 
 
 class InvitationService:
@@ -144,7 +157,7 @@ class InvitationService:
             )
         
         # Create user
-        hashed_password = get_password_hash(password)
+        hashed_password = await get_password_hash_async(password)
         user = User(
             email=invitation.email,
             username=username,
@@ -238,18 +251,7 @@ class InvitationService:
         
         invitations = query.order_by(Invitation.created_at.desc()).all()
         
-        return [
-            {
-                "id": inv.id,
-                "email": inv.email,
-                "role": inv.role.value,
-                "status": inv.status.value,
-                "expires_at": inv.expires_at.isoformat(),
-                "accepted_at": inv.accepted_at.isoformat() if inv.accepted_at else None,
-                "created_at": inv.created_at.isoformat()
-            }
-            for inv in invitations
-        ]
+        return [serialize_invitation(inv) for inv in invitations]
     
     async def resend_invitation(
         self,
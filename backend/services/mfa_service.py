@@ -18,6 +18,18 @@ from datetime import datetime, timedelta
 from models import User, MFADevice, MFAMethod
 
 
+def serialize_mfa_device(device: MFADevice) -> Dict[str, Any]:
+    """API representation of an MFA device (never includes the secret)"""
+    return {
+        "id": device.id,
+        "method": device.method.value,
+        "device_name": device.device_name,
+        "is_verified": device.is_verified,
+        "last_used": device.last_used.isoformat() if device.last_used else None,
+        "created_at": device.created_at.isoformat()
+    }
+
+
 class MFAService:
     """Service for managing multi-factor authentication"""
     
@@ -184,7 +196,7 @@ class MFAService:
         db: Session
     ) -> Dict[str, Any]:
         """Disable MFA for a user (requires password verification)"""
-        from auth import verify_password
+        from auth import verify_password_async
         
         if not user.mfa_enabled:
             raise HTTPException(
@@ -193,7 +205,7 @@ class MFAService:
             )
         
         # Verify password
-        if not user.hashed_password or not verify_password(password, user.hashed_password):
+        if not user.hashed_password or not await verify_password_async(password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid password"
@@ -249,15 +261,5 @@ class MFAService:
             MFADevice.is_active == True
         ).all()
         
-        return [
-            {
-                "id": device.id,
-                "method": device.method.value,
-                "device_name": device.device_name,
-                "is_verified": device.is_verified,
-                "last_used": device.last_used.isoformat() if device.last_used else None,
-                "created_at": device.created_at.isoformat()
-            }
-            for device in devices
-        ]
+        return [serialize_mfa_device(device) for device in devices]
 
@@ -1,5 +1,7 @@
 import stripe
 import os
+import asyncio
+import orjson
 from sqlalchemy.orm import Session
 from models import Payment, Booking, Tour
 from schemas import PaymentRequest
@@ -58,8 +60,12 @@ class PaymentService:
             if not tour:
                 return {"success": False, "message": "Tour not found"}
 
+            # Hand the pooled connection back while Stripe confirms the charge
+            db.rollback()
+
             # Create payment intent
-            payment_intent = stripe.PaymentIntent.create(
+            payment_intent = await asyncio.to_thread(
+                stripe.PaymentIntent.create,
                 amount=int(amount * 100),  # Convert to cents
                 currency="usd",
                 payment_method=payment_method_id,
@@ -227,9 +233,12 @@ class PaymentService:
         """Handle Stripe webhook events"""
         webhook_secret = os.getenv("STRIPE_WEBHOOK_SECRET")
         try:
-            event = stripe.Webhook.construct_event(
-                payload, sig_header, webhook_secret
+            # Verify the signature over the raw body first, then parse it exactly once;
+            # only plain dict access is needed below, so skip building StripeObjects
+            stripe.WebhookSignature.verify_header(
+                payload.decode("utf-8"), sig_header, webhook_secret, stripe.Webhook.DEFAULT_TOLERANCE
             )
+            event = orjson.loads(payload)
         except ValueError as e:
             logger.error(f"Invalid payload: {str(e)}")
             return {"success": False, "message": "Invalid payload"}
@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_, desc, case
 from collections import defaultdict
 
+from database import day_key
 from models import (
     ServiceProvider, Tour, Booking, Payment, Review, MarketingCampaign,
     CustomerBehavior, ProviderAnalytics, User
@@ -17,6 +18,9 @@ from models import (
 
 logger = logging.getLogger(__name__)
 
+# Rows per round trip when analytics iterate raw rows instead of aggregating in SQL
+STREAM_BATCH_SIZE = 1000
+
 
 class ProviderBIService:
     """Service for provider business intelligence and analytics"""
@@ -38,8 +42,7 @@ class ProviderBIService:
                 end_date = datetime.utcnow()
             
             # Get provider's tours
-            tours = db.query(Tour).filter(Tour.provider_id == provider_id).all()
-            tour_ids = [t.id for t in tours]
+            tour_ids = [tour_id for tour_id, in db.query(Tour.id).filter(Tour.provider_id == provider_id)]
             
             if not tour_ids:
                 return self._empty_analytics()
@@ -67,18 +70,14 @@ class ProviderBIService:
                 bookings_by_status[status] = count
             
             # Bookings by day
-            bookings_by_day = defaultdict(int)
-            bookings = db.query(Booking).filter(
+            booking_day = day_key(Booking.created_at)
+            bookings_by_day = db.query(booking_day, func.count(Booking.id)).filter(
                 and_(
                     Booking.tour_id.in_(tour_ids),
                     Booking.created_at >= start_date,
                     Booking.created_at <= end_date
                 )
-            ).all()
-            
-            for booking in bookings:
-                day_key = booking.created_at.strftime("%Y-%m-%d")
-                bookings_by_day[day_key] += 1
+            ).group_by(booking_day).all()
             
             # Top tours by bookings
             top_tours = db.query(
@@ -134,20 +133,19 @@ class ProviderBIService:
                 end_date = datetime.utcnow()
             
             # Get provider's tours
-            tours = db.query(Tour).filter(Tour.provider_id == provider_id).all()
-            tour_ids = [t.id for t in tours]
+            tour_ids = [tour_id for tour_id, in db.query(Tour.id).filter(Tour.provider_id == provider_id)]
             
             if not tour_ids:
                 return self._empty_customer_insights()
             
             # Customer actions
-            behaviors = db.query(CustomerBehavior).filter(
+            behaviors = db.query(CustomerBehavior.action_type, CustomerBehavior.user_id).filter(
                 and_(
                     CustomerBehavior.provider_id == provider_id,
                     CustomerBehavior.created_at >= start_date,
                     CustomerBehavior.created_at <= end_date
                 )
-            ).all()
+            ).yield_per(STREAM_BATCH_SIZE)
             
             actions_by_type = defaultdict(int)
             unique_customers = set()
@@ -172,32 +170,30 @@ class ProviderBIService:
                 elif behavior.action_type == "review":
                     conversion_funnel["reviews"] += 1
             
-            # Repeat customers
-            bookings = db.query(Booking).filter(
+            # Repeat customers and demographics from a single pass over the bookings
+            bookings = db.query(Booking.user_id, Booking.user_email).filter(
                 and_(
                     Booking.tour_id.in_(tour_ids),
                     Booking.created_at >= start_date,
                     Booking.created_at <= end_date
                 )
-            ).all()
+            ).yield_per(STREAM_BATCH_SIZE)
             
             customer_booking_count = defaultdict(int)
-            for booking in bookings:
-                if booking.user_id:
-                    customer_booking_count[booking.user_id] += 1
-            
-            repeat_customers = sum(1 for count in customer_booking_count.values() if count > 1)
-            total_customers = len(customer_booking_count)
-            repeat_rate = (repeat_customers / total_customers * 100) if total_customers > 0 else 0
-            
             # Customer demographics (simplified)
             customer_locations = defaultdict(int)
-            for booking in bookings:
-                if booking.user_email:
+            for user_id, user_email in bookings:
+                if user_id:
+                    customer_booking_count[user_id] += 1
+                if user_email:
                     # Extract domain for basic location insight
-                    domain = booking.user_email.split('@')[-1] if '@' in booking.user_email else 'unknown'
+                    domain = user_email.split('@')[-1] if '@' in user_email else 'unknown'
                     customer_locations[domain] += 1
             
+            repeat_customers = sum(1 for count in customer_booking_count.values() if count > 1)
+            total_customers = len(customer_booking_count)
+            repeat_rate = (repeat_customers / total_customers * 100) if total_customers > 0 else 0
+            
             return {
                 "success": True,
                 "unique_customers": len(unique_customers),
@@ -229,51 +225,56 @@ class ProviderBIService:
                 end_date = datetime.utcnow()
             
             # Get provider's tours
-            tours = db.query(Tour).filter(Tour.provider_id == provider_id).all()
-            tour_ids = [t.id for t in tours]
+            tour_ids = [tour_id for tour_id, in db.query(Tour.id).filter(Tour.provider_id == provider_id)]
             
             if not tour_ids:
                 return self._empty_revenue()
             
-            # Get completed payments
-            completed_payments = db.query(Payment).join(Booking).filter(
-                and_(
-                    Booking.tour_id.in_(tour_ids),
-                    Payment.status == "completed",
-                    Payment.created_at >= start_date,
-                    Payment.created_at <= end_date
-                )
-            ).all()
+            # Completed payments for the provider's tours in the window
+            completed = and_(
+                Booking.tour_id.in_(tour_ids),
+                Payment.status == "completed",
+                Payment.created_at >= start_date,
+                Payment.created_at <= end_date
+            )
             
-            total_revenue = sum(p.amount for p in completed_payments)
+            total_revenue, total_transactions = db.query(
+                func.coalesce(func.sum(Payment.amount), 0.0),
+                func.count(Payment.id)
+            ).join(Booking).filter(completed).one()
+            total_revenue = float(total_revenue)
             
             # Revenue by payment method
-            revenue_by_method = defaultdict(float)
-            for payment in completed_payments:
-                method = payment.payment_method.value if hasattr(payment.payment_method, 'value') else str(payment.payment_method)
-                revenue_by_method[method] += payment.amount
+            revenue_by_method = {
+                method.value: float(revenue)
+                for method, revenue in db.query(
+                    Payment.payment_method, func.sum(Payment.amount)
+                ).join(Booking).filter(completed).group_by(Payment.payment_method)
+            }
             
             # Revenue by day
-            revenue_by_day = defaultdict(float)
-            for payment in completed_payments:
-                day_key = payment.created_at.strftime("%Y-%m-%d")
-                revenue_by_day[day_key] += payment.amount
-            
-            # Revenue by tour
-            revenue_by_tour = defaultdict(float)
-            for payment in completed_payments:
-                if payment.booking and payment.booking.tour_id:
-                    revenue_by_tour[payment.booking.tour_id] += payment.amount
-            
-            revenue_by_tour_list = []
-            for tour_id, revenue in sorted(revenue_by_tour.items(), key=lambda x: x[1], reverse=True)[:10]:
-                tour = db.query(Tour).filter(Tour.id == tour_id).first()
-                if tour:
-                    revenue_by_tour_list.append({
-                        "tour_id": tour.id,
-                        "tour_name": tour.name,
-                        "revenue": revenue
-                    })
+            payment_day = day_key(Payment.created_at)
+            revenue_by_day = {
+                day: float(revenue)
+                for day, revenue in db.query(
+                    payment_day, func.sum(Payment.amount)
+                ).join(Booking).filter(completed).group_by(payment_day)
+            }
+            
+            # Revenue by tour (top 10)
+            tour_revenue = func.sum(Payment.amount)
+            revenue_by_tour_list = [
+                {
+                    "tour_id": tour_id,
+                    "tour_name": tour_name,
+                    "revenue": float(revenue)
+                }
+                for tour_id, tour_name, revenue in db.query(Tour.id, Tour.name, tour_revenue).join(
+                    Booking, Booking.tour_id == Tour.id
+                ).join(Payment, Payment.booking_id == Booking.id).filter(completed).group_by(
+                    Tour.id, Tour.name
+                ).order_by(tour_revenue.desc()).limit(10)
+            ]
             
             # Calculate commission (if applicable)
             provider = db.query(ServiceProvider).filter(ServiceProvider.id == provider_id).first()
@@ -287,10 +288,10 @@ class ProviderBIService:
                 "net_revenue": net_revenue,
                 "platform_commission": platform_commission,
                 "commission_rate": commission_rate,
-                "revenue_by_method": dict(revenue_by_method),
-                "revenue_by_day": dict(revenue_by_day),
+                "revenue_by_method": revenue_by_method,
+                "revenue_by_day": revenue_by_day,
                 "revenue_by_tour": revenue_by_tour_list,
-                "total_transactions": len(completed_payments)
+                "total_transactions": total_transactions
             }
         except Exception as e:
             logger.error(f"Error getting revenue analytics: {e}")
@@ -313,41 +314,55 @@ class ProviderBIService:
                 end_date = datetime.utcnow()
             
             # Get provider's tours
-            tours = db.query(Tour).filter(Tour.provider_id == provider_id).all()
-            tour_ids = [t.id for t in tours]
+            tour_ids = [tour_id for tour_id, in db.query(Tour.id).filter(Tour.provider_id == provider_id)]
             
             if not tour_ids:
                 return self._empty_performance()
             
             # Reviews and ratings
-            reviews = db.query(Review).filter(
+            reviews = db.query(Review.rating, Review.created_at, Review.response_at).filter(
                 and_(
                     Review.provider_id == provider_id,
                     Review.created_at >= start_date,
                     Review.created_at <= end_date,
                     Review.is_published == True
                 )
-            ).all()
-            
-            total_reviews = len(reviews)
-            average_rating = sum(r.rating for r in reviews) / total_reviews if total_reviews > 0 else 0
+            ).yield_per(STREAM_BATCH_SIZE)
             
+            total_reviews = 0
+            rating_total = 0
             rating_distribution = defaultdict(int)
-            for review in reviews:
-                rating_distribution[review.rating] += 1
+            responded_reviews = 0
+            response_times = []
+            for rating, created_at, response_at in reviews:
+                total_reviews += 1
+                rating_total += rating
+                rating_distribution[rating] += 1
+                # Response time (for reviews), in hours
+                if response_at:
+                    responded_reviews += 1
+                    if created_at:
+                        response_times.append((response_at - created_at).total_seconds() / 3600)
+            average_rating = rating_total / total_reviews if total_reviews > 0 else 0
             
             # Bookings
-            bookings = db.query(Booking).filter(
+            booking_statuses = db.query(Booking.status).filter(
                 and_(
                     Booking.tour_id.in_(tour_ids),
                     Booking.created_at >= start_date,
                     Booking.created_at <= end_date
                 )
-            ).all()
-            
-            total_bookings = len(bookings)
-            confirmed_bookings = sum(1 for b in bookings if b.status.value == "confirmed")
-            cancelled_bookings = sum(1 for b in bookings if b.status.value == "cancelled")
+            ).yield_per(STREAM_BATCH_SIZE)
+            
+            total_bookings = 0
+            confirmed_bookings = 0
+            cancelled_bookings = 0
+            for status, in booking_statuses:
+                total_bookings += 1
+                if status.value == "confirmed":
+                    confirmed_bookings += 1
+                elif status.value == "cancelled":
+                    cancelled_bookings += 1
             cancellation_rate = (cancelled_bookings / total_bookings * 100) if total_bookings > 0 else 0
             
             # Views and conversion
@@ -362,14 +377,6 @@ class ProviderBIService:
             
             conversion_rate = (total_bookings / views * 100) if views > 0 else 0
             
-            # Response time (for reviews)
-            reviews_with_response = [r for r in reviews if r.response_at]
-            response_times = []
-            for review in reviews_with_response:
-                if review.response_at and review.created_at:
-                    response_time = (review.response_at - review.created_at).total_seconds() / 3600  # hours
-                    response_times.append(response_time)
-            
             avg_response_time = sum(response_times) / len(response_times) if response_times else None
             
             return {
@@ -383,7 +390,7 @@ class ProviderBIService:
                 "total_views": views,
                 "conversion_rate": round(conversion_rate, 2),
                 "average_response_time_hours": round(avg_response_time, 2) if avg_response_time else None,
-                "response_rate": round((len(reviews_with_response) / total_reviews * 100) if total_reviews > 0 else 0, 2)
+                "response_rate": round((responded_reviews / total_reviews * 100) if total_reviews > 0 else 0, 2)
             }
         except Exception as e:
             logger.error(f"Error getting performance metrics: {e}")
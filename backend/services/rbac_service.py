@@ -3,12 +3,18 @@ Role-Based Access Control Service
 
 Handles granular permissions and RBAC.
 """
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
+from cachetools import TTLCache
+from sqlalchemy import insert, select, update
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
 from models import User, Permission, RolePermission, UserPermission, UserRole
 
+# Effective permissions per (user_id, role); a role change misses naturally, and
+# grants/revokes evict the entry, so the TTL only bounds staleness across workers
+_permissions_cache = TTLCache(maxsize=10_000, ttl=60)
+
 
 class RBACService:
     """Service for managing role-based access control"""
@@ -49,22 +55,8 @@ class RBACService:
         if user.role == UserRole.ADMIN:
             return True
         
-        # Check user-specific permissions (overrides)
-        user_perm = db.query(UserPermission).join(Permission).filter(
-            UserPermission.user_id == user.id,
-            Permission.name == permission
-        ).first()
-        
-        if user_perm:
-            return user_perm.granted
-        
-        # Check role permissions
-        role_perm = db.query(RolePermission).join(Permission).filter(
-            RolePermission.role == user.role,
-            Permission.name == permission
-        ).first()
-        
-        return role_perm is not None
+        # User-specific overrides are already applied to the effective permission list
+        return permission in await self.get_user_permissions(user, db)
     
     async def has_permission(
         self,
@@ -93,13 +85,20 @@ class RBACService:
         user: User,
         db: Session
     ) -> List[str]:
-        """Get all permissions for a user"""
+        """Get all permissions for a user (cached briefly per user and role)"""
+        cache_key = (user.id, user.role)
+        cached = _permissions_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
         permissions = []
         
         # Admin has all permissions
         if user.role == UserRole.ADMIN:
             all_perms = db.query(Permission).all()
-            return [p.name for p in all_perms]
+            names = [p.name for p in all_perms]
+            _permissions_cache[cache_key] = tuple(names)
+            return names
         
         # Get role permissions
         role_perms = db.query(Permission).join(RolePermission).filter(
@@ -124,7 +123,9 @@ class RBACService:
         # Add remaining role permissions
         permissions.extend(list(role_permission_names))
         
-        return sorted(set(permissions))
+        names = sorted(set(permissions))
+        _permissions_cache[cache_key] = tuple(names)
+        return names
     
     async def grant_permission(
         self,
@@ -165,12 +166,74 @@ class RBACService:
             db.add(user_perm)
         
         db.commit()
+        _permissions_cache.pop((user.id, user.role), None)
         
         return {
             "success": True,
             "message": f"Permission {permission_name} granted to user"
         }
     
+    async def grant_permissions_bulk(
+        self,
+        grants: List[Tuple[int, str]],
+        db: Session
+    ) -> Dict[str, Any]:
+        """Grant many (user_id, permission name) pairs with a fixed number of queries"""
+        pairs = set(grants)
+        user_ids = {user_id for user_id, _ in pairs}
+        permission_names = {name for _, name in pairs}
+        
+        user_roles = dict(db.execute(select(User.id, User.role).where(User.id.in_(user_ids))).all())
+        missing_users = user_ids - user_roles.keys()
+        if missing_users:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Users not found: {sorted(missing_users)}"
+            )
+        
+        permission_ids = dict(db.execute(
+            select(Permission.name, Permission.id).where(Permission.name.in_(permission_names))
+        ).all())
+        missing_permissions = permission_names - permission_ids.keys()
+        if missing_permissions:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Permissions not found: {sorted(missing_permissions)}"
+            )
+        
+        wanted = {(user_id, permission_ids[name]) for user_id, name in pairs}
+        existing = {
+            (row.user_id, row.permission_id): row
+            for row in db.execute(
+                select(UserPermission.id, UserPermission.user_id, UserPermission.permission_id, UserPermission.granted)
+                .where(
+                    UserPermission.user_id.in_(user_ids),
+                    UserPermission.permission_id.in_(permission_ids.values())
+                )
+            )
+        }
+        
+        # Flip existing denies to grants, and insert the pairs that have no row yet
+        denied_ids = [row.id for key, row in existing.items() if key in wanted and not row.granted]
+        if denied_ids:
+            db.execute(update(UserPermission).where(UserPermission.id.in_(denied_ids)).values(granted=True))
+        new_rows = [
+            {"user_id": user_id, "permission_id": permission_id, "granted": True}
+            for user_id, permission_id in wanted if (user_id, permission_id) not in existing
+        ]
+        if new_rows:
+            db.execute(insert(UserPermission), new_rows)
+        db.commit()
+        
+        for user_id, role in user_roles.items():
+            _permissions_cache.pop((user_id, role), None)
+        
+        return {
+            "success": True,
+            "granted": len(denied_ids) + len(new_rows),
+            "already_granted": len(wanted) - len(denied_ids) - len(new_rows)
+        }
+    
     async def revoke_permission(
         self,
         user: User,
@@ -205,6 +268,7 @@ class RBACService:
             )
             db.add(user_perm)
             db.commit()
+        _permissions_cache.pop((user.id, user.role), None)
         
         return {
             "success": True,
@@ -255,6 +319,7 @@ class RBACService:
                     db.add(role_perm)
         
         db.commit()
+        _permissions_cache.clear()
         
         return {
             "success": True,
@@ -287,6 +352,7 @@ class RBACService:
         
         db.add(permission)
         db.commit()
+        _permissions_cache.clear()
         db.refresh(permission)
         
         return {
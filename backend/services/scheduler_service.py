@@ -1,7 +1,7 @@
 """
 Scheduled Task Service
 
-Runs automated tasks for data retention policies and backups.
+Runs automated tasks for data retention policies, backups and analytics refreshes.
 Uses the schedule library for periodic task execution.
 """
 import schedule
@@ -11,19 +11,86 @@ import threading
 from datetime import datetime
 from typing import Optional
 
-from database import SessionLocal
+from sqlalchemy import create_engine, pool, text
+
+from database import SessionLocal, engine
+from db_utils import DatabaseManager
 from services.retention_service import RetentionService
+from services.support_service import SupportService
+from services.communication_service import CommunicationService
 
 logger = logging.getLogger(__name__)
 
+# Postgres advisory lock key held by the one worker process that runs cluster-wide jobs
+SCHEDULER_LEADER_LOCK_KEY = 7_461_203_001
+
 
 class SchedulerService:
     """Service for running scheduled tasks"""
     
     def __init__(self):
         self.retention_service = RetentionService()
+        self.support_service = SupportService()
+        self.communication_service = CommunicationService()
+        self.db_manager = DatabaseManager()
         self.running = False
         self.thread: Optional[threading.Thread] = None
+        self._leader_conn = None
+        self._leader_lock = threading.Lock()
+        # The advisory lock is held on a connection of its own, outside the request pool,
+        # so the leader keeps its full pool for requests and counter flushes
+        self._lock_engine = None
+    
+    def is_leader(self) -> bool:
+        """
+        Whether this process runs the cluster-wide jobs (retention, analytics refresh).
+        Every worker process starts a scheduler; on Postgres they race for a session-level
+        advisory lock, and the holder keeps its connection open until it stops or dies.
+        In-process buffers (FAQ counters, post views) are flushed by every worker.
+        """
+        if engine.dialect.name != "postgresql":
+            return True
+        with self._leader_lock:
+            if self._leader_conn is not None:
+                try:
+                    self._leader_conn.execute(text("SELECT 1"))
+                    self._leader_conn.commit()
+                    return True
+                except Exception:
+                    # Connection lost, and the lock with it; compete for it again below
+                    self._release_leadership()
+            conn = None
+            try:
+                if self._lock_engine is None:
+                    self._lock_engine = create_engine(engine.url, poolclass=pool.NullPool)
+                conn = self._lock_engine.connect()
+                acquired = conn.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": SCHEDULER_LEADER_LOCK_KEY}
+                ).scalar()
+                conn.commit()
+            except Exception as e:
+                if conn is not None:
+                    conn.close()
+                logger.error(f"Error acquiring scheduler leader lock: {e}")
+                return False
+            if not acquired:
+                conn.close()
+                return False
+            self._leader_conn = conn
+            logger.info("Scheduler leader lock acquired; this process runs cluster-wide jobs")
+            return True
+    
+    def _release_leadership(self):
+        """Close the lock-holding connection; ending the session releases the advisory lock"""
+        if self._leader_conn is None:
+            return
+        try:
+            # NullPool really closes the connection instead of pooling it with the lock held
+            self._leader_conn.close()
+        except Exception as e:
+            logger.warning(f"Error releasing scheduler leader lock: {e}")
+        finally:
+            self._leader_conn = None
     
     def setup_retention_schedule(self):
         """Setup scheduled retention policy execution"""
@@ -33,6 +100,8 @@ class SchedulerService:
     
     def _run_retention_policies(self):
         """Run all retention policies"""
+        if not self.is_leader():
+            return
         try:
             logger.info("Starting scheduled retention policy execution")
             db = SessionLocal()
@@ -47,6 +116,53 @@ class SchedulerService:
         except Exception as e:
             logger.error(f"Error running retention policies: {e}")
     
+    def setup_counter_flush_schedule(self):
+        """Setup periodic flushing of buffered FAQ counters and forum post views"""
+        schedule.every(1).minutes.do(self._flush_faq_counters)
+        schedule.every(1).minutes.do(self._flush_post_views)
+        logger.info("Counter flush scheduler configured (every minute)")
+    
+    def _flush_faq_counters(self):
+        """Write buffered FAQ view/feedback counters to the database"""
+        try:
+            db = SessionLocal()
+            try:
+                updated = self.support_service.flush_faq_counters(db)
+                if updated:
+                    logger.info(f"Flushed FAQ counters for {updated} FAQs")
+            finally:
+                db.close()
+        except Exception as e:
+            logger.error(f"Error flushing FAQ counters: {e}")
+    
+    def _flush_post_views(self):
+        """Write buffered forum post views to the database"""
+        try:
+            db = SessionLocal()
+            try:
+                updated = self.communication_service.flush_post_views(db)
+                if updated:
+                    logger.info(f"Flushed view counts for {updated} forum posts")
+            finally:
+                db.close()
+        except Exception as e:
+            logger.error(f"Error flushing forum post views: {e}")
+    
+    def setup_analytics_refresh_schedule(self):
+        """Setup hourly refresh of the analytics materialized views"""
+        schedule.every().hour.do(self._refresh_analytics_views)
+        logger.info("Analytics view refresh scheduler configured (hourly)")
+    
+    def _refresh_analytics_views(self):
+        """Refresh pre-aggregated dashboard analytics"""
+        if not self.is_leader():
+            return
+        result = self.db_manager.refresh_analytics_views()
+        if result.get("success"):
+            logger.info("Analytics views refreshed")
+        else:
+            logger.debug(f"Analytics views not refreshed: {result.get('message')}")
+    
     def start(self):
         """Start the scheduler in a background thread"""
         if self.running:
@@ -54,11 +170,15 @@ class SchedulerService:
             return
         
         self.setup_retention_schedule()
+        self.setup_counter_flush_schedule()
+        self.setup_analytics_refresh_schedule()
         self.running = True
         
         def run_scheduler():
             logger.info("Scheduler service started")
             while self.running:
+                # Claim leadership eagerly so a dead leader is replaced before its next job is due
+                self.is_leader()
                 schedule.run_pending()
                 time.sleep(60)  # Check every minute
             logger.info("Scheduler service stopped")
@@ -71,12 +191,22 @@ class SchedulerService:
         """Stop the scheduler"""
         self.running = False
         schedule.clear()
+        self._flush_faq_counters()
+        self._flush_post_views()
+        with self._leader_lock:
+            self._release_leadership()
         logger.info("Scheduler service stopped")
     
     def run_now(self, task_name: str = "retention"):
         """Run a scheduled task immediately"""
         if task_name == "retention":
             self._run_retention_policies()
+        elif task_name == "faq_counters":
+            self._flush_faq_counters()
+        elif task_name == "post_views":
+            self._flush_post_views()
+        elif task_name == "analytics":
+            self._refresh_analytics_views()
         else:
             logger.warning(f"Unknown task: {task_name}")
 
@@ -15,6 +15,20 @@ from models import User, UserSession, SessionStatus
 from auth import create_access_token, decode_access_token
 
 
+def serialize_session(session: UserSession) -> Dict[str, Any]:
+    """API representation of a session (never includes its tokens)"""
+    return {
+        "id": session.id,
+        "device_info": session.device_info,
+        "ip_address": session.ip_address,
+        "status": session.status.value,
+        "created_at": session.created_at.isoformat(),
+        "last_activity": session.last_activity.isoformat(),
+        "expires_at": session.expires_at.isoformat(),
+        "is_current": False  # Will be set by caller if needed
+    }
+
+
 class SessionService:
     """Service for managing user sessions"""
     
@@ -226,19 +240,7 @@ class SessionService:
             UserSession.user_id == user.id
         ).order_by(UserSession.created_at.desc()).all()
         
-        return [
-            {
-                "id": session.id,
-                "device_info": session.device_info,
-                "ip_address": session.ip_address,
-                "status": session.status.value,
-                "created_at": session.created_at.isoformat(),
-                "last_activity": session.last_activity.isoformat(),
-                "expires_at": session.expires_at.isoformat(),
-                "is_current": False  # Will be set by caller if needed
-            }
-            for session in sessions
-        ]
+        return [serialize_session(session) for session in sessions]
     
     async def cleanup_expired_sessions(self, db: Session) -> int:
         """Clean up expired sessions"""
@@ -2,14 +2,20 @@ from solana.rpc.api import Client
 from solana.rpc.commitment import Finalized
 from sqlalchemy.orm import Session
 from models import Payment, Booking, Tour
+from services.verification_cache import verification_key, get_verified, remember_verified
 from solders.pubkey import Pubkey
+from solders.signature import Signature
 from solders.rpc.responses import GetTransactionResp
+import asyncio
 import os
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 logger = logging.getLogger(__name__)
 
+# getSignatureStatuses accepts at most this many signatures per call
+SIGNATURE_STATUSES_LIMIT = 256
+
 class SolanaService:
     def __init__(self):
         self.rpc_url = os.getenv("SOLANA_RPC_URL", "https://api.devnet.solana.com")
@@ -43,7 +49,25 @@ class SolanaService:
         user_email: Optional[str] = None,
         db: Session = None
     ) -> Dict[str, Any]:
-        """Verify a Solana payment transaction"""
+        """Verify a Solana payment transaction (successful results are cached)"""
+        key = verification_key("solana", signature, amount, tour_id)
+        cached = get_verified(key)
+        if cached is not None:
+            return cached
+        result = await self._verify_solana_payment(signature, amount, public_key, tour_id, user_email, db)
+        remember_verified(key, result)
+        return result
+
+    async def _verify_solana_payment(
+        self,
+        signature: str,
+        amount: float,
+        public_key: str,
+        tour_id: int,
+        user_email: Optional[str] = None,
+        db: Session = None
+    ) -> Dict[str, Any]:
+        """Verify a Solana payment transaction against the RPC node"""
         try:
             # Verify transaction signature
             transaction_resp: GetTransactionResp = self.client.get_transaction(
@@ -156,3 +180,60 @@ class SolanaService:
             logger.error(f"Error checking payment status: {str(e)}")
             return {"success": False, "message": str(e)}
 
+    async def check_statuses_batch(
+        self,
+        signatures: List[str]
+    ) -> List[Dict[str, Any]]:
+        """Check the status of several Solana transactions with one getSignatureStatuses call"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(signatures)
+        parsed = []
+        for index, signature in enumerate(signatures):
+            try:
+                parsed.append((index, Signature.from_string(signature)))
+            except Exception:
+                results[index] = {"success": False, "status": "invalid", "message": "Invalid signature"}
+
+        if parsed:
+            def fetch_statuses():
+                sigs = [sig for _, sig in parsed]
+                statuses = []
+                for start in range(0, len(sigs), SIGNATURE_STATUSES_LIMIT):
+                    statuses.extend(self.client.get_signature_statuses(
+                        sigs[start:start + SIGNATURE_STATUSES_LIMIT],
+                        search_transaction_history=True
+                    ).value)
+                return statuses
+
+            try:
+                # The RPC client is synchronous; keep its round trips off the event loop
+                statuses = await asyncio.to_thread(fetch_statuses)
+            except Exception as e:
+                logger.error(f"Error checking payment statuses: {str(e)}")
+                for index, _ in parsed:
+                    results[index] = {"success": False, "message": str(e)}
+                return results
+
+            for (index, _), status in zip(parsed, statuses):
+                signature = signatures[index]
+                if status is None:
+                    results[index] = {
+                        "success": False,
+                        "status": "not_found",
+                        "message": "Transaction not found"
+                    }
+                elif status.err:
+                    results[index] = {
+                        "success": False,
+                        "status": "failed",
+                        "message": f"Transaction failed: {status.err}"
+                    }
+                else:
+                    finalized = str(status.confirmation_status).lower().endswith("finalized")
+                    results[index] = {
+                        "success": True,
+                        "status": "confirmed" if finalized else "pending",
+                        "signature": signature,
+                        "slot": status.slot
+                    }
+
+        return results
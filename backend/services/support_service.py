@@ -4,11 +4,15 @@ Handles 24/7 support system including AI assistant, tickets, FAQ, tutorials, and
 """
 import logging
 import json
+import orjson
 import uuid
+import threading
+from collections import Counter
 from typing import Optional, Dict, List, Any
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func, desc
+from sqlalchemy import or_, and_, func, desc, case, cast, literal_column, Text
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
 import re
 
 from models import (
@@ -18,6 +22,42 @@ from models import (
 
 logger = logging.getLogger(__name__)
 
+# FAQ view/feedback increments are buffered here and written in batches by the scheduler
+FAQ_COUNTER_FIELDS = ("view_count", "helpful_count", "not_helpful_count")
+_faq_counter_lock = threading.Lock()
+_pending_faq_counters: Counter = Counter()
+
+# Columns returned by the FAQ / tutorial list endpoints
+FAQ_LIST_COLUMNS = (
+    "id", "category", "question", "answer", "language", "order",
+    "view_count", "helpful_count", "not_helpful_count", "tags", "created_at"
+)
+TUTORIAL_LIST_COLUMNS = (
+    "id", "title", "category", "description", "video_url", "thumbnail_url",
+    "duration_seconds", "language", "order", "view_count", "tags", "created_at"
+)
+
+
+def render_json_array(model, columns, criteria, order_by, db: Session) -> bytes:
+    """Serialize matching rows to a JSON array; on Postgres the database builds the document"""
+    if db.get_bind().dialect.name == "postgresql":
+        fields = []
+        for name in columns:
+            column = getattr(model, name)
+            # tags are stored as JSON text
+            fields += [literal_column(f"'{name}'"), cast(column, JSONB) if name == "tags" else column]
+        document = func.coalesce(
+            func.json_agg(aggregate_order_by(func.json_build_object(*fields), *order_by)),
+            literal_column("'[]'::json")
+        )
+        return db.query(cast(document, Text)).filter(*criteria).scalar().encode()
+    
+    rows = db.query(*[getattr(model, name) for name in columns]).filter(*criteria).order_by(*order_by).all()
+    return orjson.dumps([
+        {**row._asdict(), "tags": orjson.loads(row.tags) if row.tags else None}
+        for row in rows
+    ])
+
 
 class SupportService:
     """Service for handling 24/7 support system"""
@@ -265,15 +305,16 @@ class SupportService:
         category: str,
         priority: str,
         language: str,
-        db: Session
+        db: Session,
+        enrich: bool = True
     ) -> Dict[str, Any]:
-        """Create a new support ticket"""
+        """Create a new support ticket (pass enrich=False to defer suggestions/assignment to enrich_ticket)"""
         try:
             # Generate ticket number
             ticket_number = f"TKT-{datetime.utcnow().strftime('%Y%m%d')}-{uuid.uuid4().hex[:8].upper()}"
             
             # Get AI suggestions for the ticket
-            ai_suggestions = await self._get_ticket_suggestions(description, category, db)
+            ai_suggestions = await self._get_ticket_suggestions(description, category, db) if enrich else None
             
             ticket = SupportTicket(
                 ticket_number=ticket_number,
@@ -293,7 +334,8 @@ class SupportService:
             db.refresh(ticket)
             
             # Auto-assign if possible
-            await self._auto_assign_ticket(ticket, db)
+            if enrich:
+                await self._auto_assign_ticket(ticket, db)
             
             return {
                 "success": True,
@@ -308,6 +350,17 @@ class SupportService:
                 "error": str(e)
             }
     
+    async def enrich_ticket(self, ticket_id: int, db: Session):
+        """Attach AI suggestions to a ticket and auto-assign it"""
+        ticket = db.query(SupportTicket).filter(SupportTicket.id == ticket_id).first()
+        if not ticket:
+            return
+        ai_suggestions = await self._get_ticket_suggestions(ticket.description, ticket.category, db)
+        if ai_suggestions:
+            ticket.ai_suggestions = json.dumps(ai_suggestions)
+            db.commit()
+        await self._auto_assign_ticket(ticket, db)
+    
     async def _get_ticket_suggestions(self, description: str, category: str, db: Session) -> List[str]:
         """Get AI-powered suggestions for ticket resolution"""
         # Find similar resolved tickets
@@ -493,48 +546,86 @@ class SupportService:
         db: Session
     ) -> List[FAQ]:
         """Get FAQs with optional filtering"""
-        query = db.query(FAQ).filter(
-            and_(
-                FAQ.is_published == True,
-                FAQ.language == language
-            )
-        )
+        criteria = self._faq_criteria(category, language, search)
+        return db.query(FAQ).filter(*criteria).order_by(FAQ.order, FAQ.helpful_count.desc()).all()
+    
+    async def get_faqs_json(
+        self,
+        category: Optional[str],
+        language: str,
+        search: Optional[str],
+        db: Session
+    ) -> bytes:
+        """Get filtered FAQs as a ready-to-send JSON array"""
+        criteria = self._faq_criteria(category, language, search)
+        return render_json_array(FAQ, FAQ_LIST_COLUMNS, criteria, (FAQ.order, FAQ.helpful_count.desc()), db)
+    
+    def _faq_criteria(self, category: Optional[str], language: str, search: Optional[str]) -> list:
+        """Filter conditions shared by the FAQ list queries"""
+        criteria = [FAQ.is_published == True, FAQ.language == language]
         
         if category:
-            query = query.filter(FAQ.category == category)
+            criteria.append(FAQ.category == category)
         
         if search:
-            query = query.filter(
+            criteria.append(
                 or_(
                     FAQ.question.ilike(f"%{search}%"),
                     FAQ.answer.ilike(f"%{search}%")
                 )
             )
         
-        return query.order_by(FAQ.order, FAQ.helpful_count.desc()).all()
+        return criteria
     
     async def get_faq(self, faq_id: int, db: Session) -> Optional[FAQ]:
-        """Get a specific FAQ"""
+        """Get a specific FAQ (the view is counted in the pending counters)"""
         faq = db.query(FAQ).filter(FAQ.id == faq_id).first()
         if faq:
-            faq.view_count += 1
-            db.commit()
+            self._increment_faq_counter(faq_id, "view_count")
         return faq
     
     async def record_faq_feedback(self, faq_id: int, helpful: bool, db: Session) -> Dict[str, Any]:
         """Record FAQ helpfulness feedback"""
-        faq = db.query(FAQ).filter(FAQ.id == faq_id).first()
-        if not faq:
+        if db.query(FAQ.id).filter(FAQ.id == faq_id).scalar() is None:
             return {"success": False, "error": "FAQ not found"}
         
-        if helpful:
-            faq.helpful_count += 1
-        else:
-            faq.not_helpful_count += 1
-        
-        db.commit()
+        self._increment_faq_counter(faq_id, "helpful_count" if helpful else "not_helpful_count")
         return {"success": True}
     
+    def _increment_faq_counter(self, faq_id: int, field: str):
+        with _faq_counter_lock:
+            _pending_faq_counters[(faq_id, field)] += 1
+    
+    def pending_faq_count(self, faq_id: int, field: str) -> int:
+        """Increments recorded for an FAQ counter that are not yet written to the database"""
+        return _pending_faq_counters.get((faq_id, field), 0)
+    
+    def flush_faq_counters(self, db: Session) -> int:
+        """Write buffered FAQ counters with a single UPDATE; returns the number of FAQs touched"""
+        global _pending_faq_counters
+        with _faq_counter_lock:
+            pending, _pending_faq_counters = _pending_faq_counters, Counter()
+        if not pending:
+            return 0
+        
+        faq_ids = {faq_id for faq_id, _ in pending}
+        values = {}
+        for field in FAQ_COUNTER_FIELDS:
+            deltas = {faq_id: count for (faq_id, name), count in pending.items() if name == field}
+            if deltas:
+                column = getattr(FAQ, field)
+                values[column] = column + case(deltas, value=FAQ.id, else_=0)
+        try:
+            db.query(FAQ).filter(FAQ.id.in_(faq_ids)).update(values, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the increments back so they are retried on the next flush
+            with _faq_counter_lock:
+                _pending_faq_counters.update(pending)
+            raise
+        return len(faq_ids)
+    
     # ========== TUTORIALS ==========
     
     async def get_tutorials(
@@ -544,17 +635,27 @@ class SupportService:
         db: Session
     ) -> List[Tutorial]:
         """Get tutorials with optional filtering"""
-        query = db.query(Tutorial).filter(
-            and_(
-                Tutorial.is_published == True,
-                Tutorial.language == language
-            )
-        )
+        criteria = self._tutorial_criteria(category, language)
+        return db.query(Tutorial).filter(*criteria).order_by(Tutorial.order).all()
+    
+    async def get_tutorials_json(
+        self,
+        category: Optional[str],
+        language: str,
+        db: Session
+    ) -> bytes:
+        """Get filtered tutorials as a ready-to-send JSON array"""
+        criteria = self._tutorial_criteria(category, language)
+        return render_json_array(Tutorial, TUTORIAL_LIST_COLUMNS, criteria, (Tutorial.order,), db)
+    
+    def _tutorial_criteria(self, category: Optional[str], language: str) -> list:
+        """Filter conditions shared by the tutorial list queries"""
+        criteria = [Tutorial.is_published == True, Tutorial.language == language]
         
         if category:
-            query = query.filter(Tutorial.category == category)
+            criteria.append(Tutorial.category == category)
         
-        return query.order_by(Tutorial.order).all()
+        return criteria
     
     async def get_tutorial(self, tutorial_id: int, db: Session) -> Optional[Tutorial]:
         """Get a specific tutorial"""
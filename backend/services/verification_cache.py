@@ -0,0 +1,28 @@
+"""
+Payment Verification Cache
+
+Remembers successful on-chain payment verifications so retries and double
+submissions of the same transaction skip the RPC and database round-trips.
+"""
+import hashlib
+from typing import Any, Dict, Optional
+from cachetools import LRUCache
+
+# Only successful verifications are stored; failures must be re-checked
+_verified_payments: LRUCache = LRUCache(maxsize=10_000)
+
+
+def verification_key(method: str, tx_hash: str, amount: float, tour_id: int) -> bytes:
+    """Build a compact cache key for a verification request"""
+    return hashlib.blake2b(f"{method}|{tx_hash}|{amount}|{tour_id}".encode(), digest_size=16).digest()
+
+
+def get_verified(key: bytes) -> Optional[Dict[str, Any]]:
+    """Return the cached result of a successful verification, if any"""
+    return _verified_payments.get(key)
+
+
+def remember_verified(key: bytes, result: Dict[str, Any]) -> None:
+    """Cache a verification result if it succeeded"""
+    if result.get("success"):
+        _verified_payments[key] = result
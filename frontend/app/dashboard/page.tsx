@@ -81,8 +81,8 @@ export default function DashboardPage() {
     try {
       const [accountRes, invoicesRes, analyticsRes, feedbackRes] = await Promise.all([
         api.get(`/dashboard/account?user_email=${email}`).catch(() => ({ data: null })),
-        api.get(`/dashboard/invoices?user_email=${email}`).catch(() => ({ data: [] })),
-        api.get(`/dashboard/analytics?user_email=${email}`).catch(() => ({ data: null })),
+        api.get('/dashboard/invoices').catch(() => ({ data: [] })),
+        api.get('/dashboard/analytics').catch(() => ({ data: null })),
         api.get(`/dashboard/feedback?user_email=${email}`).catch(() => ({ data: [] }))
       ])
       